@@ -1,22 +1,791 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import random
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import ssl
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bisect import bisect_left
+from itertools import groupby, islice
+from operator import itemgetter, length_hint
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import copy
+from types import MappingProxyType
+import pickle
+from urllib.parse import urlsplit
 from datetime import datetime, timedelta
 import math
 
+import numpy as np
+
 # ThingSpeak settings
 API_KEY = """[YOUR_API_KEY]"""
 BASE_URL = 'https://api.thingspeak.com/update'
+CHANNEL_ID = """[YOUR_CHANNEL_ID]"""
+BULK_URL = 'https://api.thingspeak.com/channels/{channel_id}/bulk_update.json'
+MAX_BULK_SIZE = 960         # Readings per bulk-update request accepted by ThingSpeak
+UPLOAD_BATCH_SIZE = 60      # Readings per request in accelerated and fast runs
+UPLOAD_TIMEOUT = (5, 15)    # Connect and read timeouts in seconds
+UPLOAD_MAX_BUFFER = 100000  # Readings kept in memory while ThingSpeak is unreachable
+CHANNEL_MIN_INTERVAL = 15   # Seconds between requests ThingSpeak accepts per channel
+CHANNEL_BURST = 1           # Requests a channel may send back to back after being idle
+
+# Outbox settings
+OUTBOX_DIR = 'outbox'
+OUTBOX_SEGMENT_RECORDS = 100000  # Readings per segment file
+OUTBOX_SYNC_EVERY = 1000         # fsync after this many appended readings...
+OUTBOX_SYNC_INTERVAL = 1.0       # ...or this many seconds, whichever comes first
+
+# Metrics
+METRICS_PORT = 9108          # Local Prometheus scrape port used by --metrics
+METRICS_LOG_INTERVAL = 60    # Seconds between summary log lines
+
+# Event journal
+JOURNAL_BUFFER_RECORDS = 4096  # Records held in memory before they are written in one block
+JOURNAL_FLUSH_INTERVAL = 1.0   # Seconds after which buffered records are written anyway
+JOURNAL_DTYPE = np.dtype([
+    ('level', np.uint8),
+    ('kind', np.uint8),         # EventJournal.EVENT_START, EVENT_END, UPLOAD, DELIVERY or SINK
+    ('code', np.int16),         # Index into EVENT_REGISTRY.events, HTTP status of an upload, or a DELIVERY code
+    ('hive', np.int32),         # -1 for uploads, deliveries and sink errors
+    ('start', 'datetime64[s]'), # Simulated time
+    ('end', 'datetime64[s]'),   # Event end, exclusive
+    ('duration', np.int32)      # Minutes, or readings in an upload, delivery or failed sink write
+])
+EVENT_INDEX_DTYPE = np.dtype([
+    ('code', np.int16),         # Index into EVENT_REGISTRY.events
+    ('hive', np.int32),
+    ('start', 'datetime64[s]'), # Simulated time
+    ('end', 'datetime64[s]'),   # Exclusive
+    ('open', np.bool_)          # Still active when the index was saved, end is the save time
+])
+
+# Columnar series store
+STORE_OPEN_DAYS = 2  # Day files kept mapped for writing; readings may straddle midnight
+
+# Output sinks
+SINK_BATCH_SIZE = 10000                # Readings buffered before a sink formats and writes them
+SINK_ROTATE_BYTES = 100 * 1024 * 1024  # File sinks move on to a new file beyond this size
+SINK_DATAGRAM_BYTES = 1400             # Largest UDP datagram, below a typical Ethernet MTU
+SINK_MEASUREMENT = 'beehive'           # Line protocol measurement name
+
+# Sharded fleet
+SHARD_PORT = 9110     # Coordinator port for --coordinator and --worker
+SHARD_MAX_SKEW = 0    # Ticks a worker may run ahead of the slowest one, 0 is lock-step
+
+# Load generator
+LOAD_RATE = 50000          # Target readings per second
+LOAD_HIVES = 10000         # Virtual hives the readings come from
+LOAD_DURATION = 60         # Seconds of load
+LOAD_BATCH_SIZE = 100      # Readings per request
+LOAD_CONNECTIONS = 64      # Keep-alive connections to the endpoint
+LOAD_MAX_IN_FLIGHT = 1000  # Requests outstanding before new ones are counted as overload errors
+LOAD_PERCENTILES = (50, 90, 99, 99.9)
+
+# Rolling aggregates
+AGGREGATE_BUFFER = 4096  # Readings buffered before they are folded into the per-hive windows
+
+# Streaming API
+STREAM_BLOCK_TICKS = 60  # Ticks per block yielded by stream_blocks()
+
+# Regional weather
+WEATHER_CORRELATION_KM = 50       # Distance over which local weather offsets decorrelate
+WEATHER_LOCAL_MINUTES = 180       # Time scale of local offsets
+WEATHER_LOCAL_TEMP_SD = 1.5       # Spread of local temperature offsets in degrees C
+WEATHER_LOCAL_HUMIDITY_SD = 5     # Spread of local humidity offsets in percent
+
+# Checkpoints
+CHECKPOINT_EVERY = 60  # Ticks between snapshots
+
+# Adaptive time steps
+ADAPTIVE_TOLERANCE = 1.0  # Largest change in a reading (degrees C, percent or kg) a step may skip over
+ADAPTIVE_MAX_STEP = 240   # Longest step in minutes, so quiet stretches still report now and then
+
+# Monte Carlo runs
+MONTE_CARLO_STEPS = 525600              # One year of minute ticks per run
+MONTE_CARLO_MAX_CHUNK = 16              # Most runs handed to a worker process at once
+MONTE_CARLO_PERCENTILES = (5, 25, 50, 75, 95)
+
+def copy_attributes(obj, skip=()):
+    """Shallow copy of every attribute of obj except skip, the snapshot of a plain state object"""
+    return {name: copy.copy(value) for name, value in vars(obj).items() if name not in skip}
+
+def restore_attributes(obj, state):
+    """Set attributes from copy_attributes(), copied again so a snapshot can be restored many times"""
+    for name, value in state.items():
+        setattr(obj, name, copy.copy(value))
+
+class SimulationClock:
+    """Source of simulated time shared by the whole simulator"""
+    REALTIME = 'realtime'
+    ACCELERATED = 'accelerated'
+    FAST = 'fast'  # As fast as possible, no sleeping
+    # What to do after falling a tick or more behind the wall-clock schedule
+    CATCH_UP = 'catch_up'  # Run the missed ticks back to back until the schedule is met again
+    SKIP = 'skip'          # Jump simulated time over the missed ticks
+
+    def __init__(self, mode=REALTIME, speed=1, start=None, tick_minutes=1, missed=CATCH_UP):
+        if mode not in (SimulationClock.REALTIME, SimulationClock.ACCELERATED, SimulationClock.FAST):
+            raise ValueError(f"Unknown clock mode: {mode}")
+        if speed <= 0:
+            raise ValueError("Clock speed must be positive")
+        if missed not in (SimulationClock.CATCH_UP, SimulationClock.SKIP):
+            raise ValueError(f"Unknown missed-tick policy: {missed}")
+        self.mode = mode
+        self.speed = speed if mode == SimulationClock.ACCELERATED else 1
+        self.tick_minutes = tick_minutes
+        self.missed = missed
+        self.current_time = start if start is not None else datetime.now()
+        self.ticks = 0
+        self.skipped_ticks = 0
+        # (monotonic seconds, simulated time) the wall-clock schedule is anchored to
+        self.origin = None
+
+    def now(self):
+        """Current simulated time"""
+        return self.current_time
+
+    def advance(self, minutes=None):
+        """Move simulated time forward without waiting"""
+        if minutes is None:
+            minutes = self.tick_minutes
+        self.current_time += timedelta(minutes=minutes)
+        self.ticks += max(1, round(minutes / self.tick_minutes))  # A longer step counts as the ticks it covers
+
+    def wall_seconds_per_tick(self):
+        """Real seconds one tick takes in the current mode"""
+        if self.mode == SimulationClock.FAST:
+            return 0
+        return self.tick_minutes * 60 / self.speed
+
+    def start(self):
+        """Anchor the wall-clock schedule: the current simulated time is due now"""
+        self.origin = (time.monotonic(), self.current_time)
+
+    def deadline(self):
+        """Monotonic time at which the current simulated time is due"""
+        if self.origin is None:
+            self.start()
+        wall, simulated = self.origin
+        return wall + (self.current_time - simulated).total_seconds() / self.speed
+
+    def wait_time(self):
+        """Seconds until the current tick is due, after applying the missed-tick policy"""
+        if self.mode == SimulationClock.FAST:
+            return 0
+        late = time.monotonic() - self.deadline()
+        tick_seconds = self.wall_seconds_per_tick()
+        if late >= tick_seconds and self.missed == SimulationClock.SKIP:
+            behind = int(late // tick_seconds)
+            self.current_time += timedelta(minutes=self.tick_minutes * behind)
+            self.ticks += behind
+            self.skipped_ticks += behind
+            late -= behind * tick_seconds
+            if metrics:
+                metrics.inc('beehive_ticks_skipped_total', behind)
+        return max(0, -late)
+
+    def record_lateness(self):
+        """Report how late the current tick starts against its deadline"""
+        if self.mode == SimulationClock.FAST:
+            return
+        late = time.monotonic() - self.deadline()
+        metrics.observe('beehive_tick_jitter_seconds', max(0, late))
+        metrics.set('beehive_tick_drift_seconds', late)
+
+    def tick(self, minutes=None):
+        """Advance simulated time by one tick, or by minutes, and sleep until its deadline
+
+        Deadlines come from the monotonic clock, so the time spent simulating and uploading
+        does not push later ticks back.
+        """
+        self.advance(minutes)
+        wait = self.wait_time()
+        if wait > 0:
+            time.sleep(wait)
+        if metrics:
+            self.record_lateness()
+
+    def get_state(self):
+        return {'current_time': self.current_time, 'ticks': self.ticks}
+
+    def set_state(self, state, keep_time=False):
+        """Resume from get_state(); keep_time leaves simulated time alone, as the realtime clock needs"""
+        if not keep_time:
+            self.current_time = state['current_time']
+        self.ticks = state['ticks']
+        self.origin = None  # Schedule restarts from the restored time
+
+# Simulation clock, replaced in main() according to the command line
+clock = SimulationClock()
+
+class Metrics:
+    """Counters, gauges and latency histograms, rendered in the Prometheus text format"""
+    # Upper bounds in seconds, from a microsecond tick stage to a slow HTTP call
+    BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+               0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    HELP = {
+        'beehive_stage_seconds': ('histogram', "Time spent in each stage of a tick or upload"),
+        'beehive_ticks_total': ('counter', "Hive ticks simulated"),
+        'beehive_uploads_total': ('counter', "Upload requests by result"),
+        'beehive_readings_uploaded_total': ('counter', "Readings accepted by ThingSpeak"),
+        'beehive_rate_limited_total': ('counter', "Requests answered with HTTP 429"),
+        'beehive_queue_depth': ('gauge', "Readings waiting to be uploaded"),
+        'beehive_tick_drift_seconds': ('gauge', "How far the latest tick started after its deadline"),
+        'beehive_tick_jitter_seconds': ('histogram', "Lateness of each tick against its deadline"),
+        'beehive_ticks_skipped_total': ('counter', "Ticks skipped to catch up with the wall clock"),
+        'beehive_active_events': ('gauge', "Events active in a hive")
+    }
+
+    def __init__(self, log_interval=METRICS_LOG_INTERVAL):
+        self.log_interval = log_interval
+        self.last_log = time.monotonic()
+        # Keyed by (name, labels) with labels a tuple of (label, value) pairs
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}  # Per-bucket counts, then +Inf count, sum and total count
+        self.stage_keys = {}
+        self.server = None
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = Metrics.key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        self.gauges[Metrics.key(name, labels)] = value
+
+    def observe_key(self, key, value):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(Metrics.BUCKETS) + 3)
+        histogram[bisect_left(Metrics.BUCKETS, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def observe(self, name, value, **labels):
+        self.observe_key(Metrics.key(name, labels), value)
+
+    def stage(self, stage, started):
+        """Record the time since started for a stage and return the current time for the next one"""
+        now = time.perf_counter()
+        key = self.stage_keys.get(stage)
+        if key is None:
+            key = self.stage_keys[stage] = Metrics.key('beehive_stage_seconds', {'stage': stage})
+        self.observe_key(key, now - started)
+        return now
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = labels + tuple(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{label}="{value}"' for label, value in pairs) + '}'
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        samples = {}
+        for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+            samples.setdefault(name, []).append(f"{name}{Metrics.format_labels(labels)} {value}")
+        for (name, labels), histogram in list(self.histograms.items()):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(Metrics.BUCKETS + ('+Inf',), histogram):
+                cumulative += count
+                lines.append(f"{name}_bucket{Metrics.format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{Metrics.format_labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_count{Metrics.format_labels(labels)} {histogram[-1]}")
+        output = []
+        for name in sorted(samples):
+            kind, text = Metrics.HELP.get(name, ('untyped', name))
+            output.append(f"# HELP {name} {text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(samples[name])
+        return '\n'.join(output) + '\n'
+
+    @staticmethod
+    def quantile(histogram, q):
+        """Upper bucket bound below which a fraction q of the observations fall"""
+        target = q * histogram[-1]
+        cumulative = 0
+        for bound, count in zip(Metrics.BUCKETS, histogram):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return math.inf
+
+    def summary(self):
+        """One line with stage latencies, uploads, queue depth and drift"""
+        parts = []
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name == 'beehive_stage_seconds' and histogram[-1]:
+                parts.append(f"{dict(labels)['stage']} p50<={Metrics.quantile(histogram, 0.5) * 1e6:g}us "
+                             f"p99<={Metrics.quantile(histogram, 0.99) * 1e6:g}us")
+        uploads = {dict(labels).get('result'): value for (name, labels), value in self.counters.items()
+                   if name == 'beehive_uploads_total'}
+        parts.append(f"uploads ok={uploads.get('success', 0)} failed={uploads.get('failure', 0)}")
+        parts.append(f"queue={self.gauges.get(('beehive_queue_depth', ()), 0)}")
+        drift = self.gauges.get(('beehive_tick_drift_seconds', ()))
+        if drift is not None:
+            parts.append(f"drift={drift:.3f}s")
+        jitter = self.histograms.get(('beehive_tick_jitter_seconds', ()))
+        if jitter:
+            parts.append(f"jitter p99<={Metrics.quantile(jitter, 0.99) * 1e3:g}ms")
+        return ', '.join(parts)
+
+    def maybe_log(self):
+        """Print the summary line once every log_interval seconds"""
+        now = time.monotonic()
+        if now - self.last_log >= self.log_interval:
+            self.last_log = now
+            print(f"Metrics: {self.summary()}")
+
+    def serve(self, port=METRICS_PORT, host='127.0.0.1'):
+        """Expose /metrics over HTTP from a background thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are too frequent to log
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+# Metrics registry, None while instrumentation is disabled so every probe costs one test
+metrics = None
+
+class EventJournal:
+    """Append-only binary journal of events, uploads and delivery problems, buffered and written in blocks
+
+    The file starts with one JSON header line naming the event types, followed by fixed-size
+    JOURNAL_DTYPE records. Records at or above console_level are also printed. A background thread
+    writes the buffer once it is flush_interval seconds old, so a quiet run does not hold records back.
+    """
+    DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+    LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+    EVENT_START, EVENT_END, UPLOAD, DELIVERY, SINK = 1, 2, 3, 4, 5
+    KINDS = {EVENT_START: 'event_start', EVENT_END: 'event_end', UPLOAD: 'upload', DELIVERY: 'delivery', SINK: 'sink'}
+    # Codes of DELIVERY records: readings replayed from the outbox, left in it for later, or lost
+    REPLAYED, KEPT, DROPPED = 1, 2, 3
+
+    def __init__(self, path=None, level=INFO, console_level=WARNING, buffer_records=JOURNAL_BUFFER_RECORDS,
+                 flush_interval=JOURNAL_FLUSH_INTERVAL):
+        self.path = path
+        self.level = level
+        self.console_level = console_level
+        self.min_level = min(level, console_level) if path else console_level
+        self.buffer_records = buffer_records
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.lock = threading.Lock()  # Shared with the flush thread
+        self.last_flush = time.monotonic()
+        self.file = None
+        self.flusher = None
+        self.closed = threading.Event()
+        self.index = None  # EventIndex also given every event end
+        if path:
+            header = {'journal': 1, 'events': list(EVENT_REGISTRY.events)}
+            if os.path.exists(path) and os.path.getsize(path):
+                existing = EventJournal.read_header(path)
+                if existing['events'] != header['events']:
+                    raise ValueError(f"Journal {path} was written with different event types")
+                self.file = open(path, 'ab', buffering=0)
+            else:
+                self.file = open(path, 'wb', buffering=0)
+                self.file.write(json.dumps(header).encode() + b'\n')
+            self.flusher = threading.Thread(target=self.flush_periodically, daemon=True)
+            self.flusher.start()
+
+    @staticmethod
+    def read_header(path):
+        with open(path, 'rb') as f:
+            return json.loads(f.readline())
+
+    @staticmethod
+    def read(path, kind=None, hive_id=None, level=None):
+        """Records as a JOURNAL_DTYPE array, optionally only one kind, hive or minimum level"""
+        with open(path, 'rb') as f:
+            f.readline()
+            records = np.fromfile(f, dtype=JOURNAL_DTYPE)
+        if kind is not None:
+            records = records[records['kind'] == kind]
+        if hive_id is not None:
+            records = records[records['hive'] == hive_id]
+        if level is not None:
+            records = records[records['level'] >= level]
+        return records
+
+    def record(self, level, kind, code, hive_id, start, end, duration, message):
+        if level < self.min_level:
+            return
+        if self.file and level >= self.level:
+            with self.lock:
+                self.buffer.append((level, kind, code, -1 if hive_id is None else hive_id, start, end, duration))
+                full = len(self.buffer) >= self.buffer_records
+            if full:
+                self.flush()
+        if level >= self.console_level:
+            print(message())  # Formatted only when it is shown
+
+    def records_events(self):
+        """Whether event starts and ends go anywhere, so vectorized callers can skip building them"""
+        return self.index is not None or self.min_level <= EventJournal.INFO
+
+    def event_start(self, hive_id, event, start, duration):
+        """An event drawn to last duration minutes, recorded with the end event_end() will give it
+
+        HiveEvent.update() removes an event before the reading of its last minute, so it is active
+        from start up to, not including, start + duration - 1 minutes.
+        """
+        active = duration - 1
+        self.record(EventJournal.INFO, EventJournal.EVENT_START, EVENT_REGISTRY.events.index(event), hive_id,
+                    start, start + timedelta(minutes=active), active,
+                    lambda: f"{start:%Y-%m-%d %H:%M} hive {hive_id}: New event started: {event} (Duration: {active} minutes)")
+
+    def event_end(self, hive_id, event, start, end):
+        """An event that was active from start up to, not including, end"""
+        duration = (end - start) // timedelta(minutes=1)
+        if self.index:
+            self.index.add(hive_id, event, start, end)
+        self.record(EventJournal.INFO, EventJournal.EVENT_END, EVENT_REGISTRY.events.index(event), hive_id,
+                    start, end, duration,
+                    lambda: f"{end:%Y-%m-%d %H:%M} hive {hive_id}: Event ended: {event} after {duration} minutes")
+
+    def upload(self, status, readings, now, error=None):
+        """One upload request; status 0 means no response, error says why"""
+        accepted = status in (200, 202)
+        level = EventJournal.DEBUG if accepted else EventJournal.WARNING if status else EventJournal.ERROR
+        def message():
+            if accepted:
+                return f"Data sent successfully: {readings} readings up to {now:%Y-%m-%d %H:%M}"
+            if status:
+                return f"Failed to send data: {status}"
+            return f"Error sending data: {error}"
+        self.record(level, EventJournal.UPLOAD, status, None, now, now, readings, message)
+
+    def delivery(self, code, readings, message):
+        """Readings replayed from the outbox (REPLAYED), left in it for a later try (KEPT) or lost (DROPPED)"""
+        level = {EventJournal.REPLAYED: EventJournal.INFO, EventJournal.KEPT: EventJournal.WARNING}.get(
+            code, EventJournal.ERROR)
+        now = clock.now()
+        self.record(level, EventJournal.DELIVERY, code, None, now, now, readings, message)
+
+    def sink_error(self, sink, readings, error):
+        """A batch of readings an output could not write"""
+        now = clock.now()
+        self.record(EventJournal.WARNING, EventJournal.SINK, 0, None, now, now, readings,
+                    lambda: f"Error writing to {sink}: {error}")
+
+    def flush(self):
+        with self.lock:
+            if self.buffer and self.file:
+                self.file.write(np.array(self.buffer, dtype=JOURNAL_DTYPE).tobytes())
+            self.buffer = []
+            self.last_flush = time.monotonic()
+
+    def flush_periodically(self):
+        while not self.closed.wait(self.flush_interval / 4):
+            if self.buffer and time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+
+    def close(self):
+        self.closed.set()
+        if self.flusher:
+            self.flusher.join()
+            self.flusher = None
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+class EventIndex:
+    """Intervals during which events were active, sorted by start per event type for time-range queries
+
+    Each event type keeps its intervals in start order together with the longest interval, so an
+    interval overlapping [start, end) can only begin between start minus that length and end:
+    queries look at that slice only. Intervals of events still active when the index is saved are
+    stored as open; loading for further recording drops them, since the run continuing them records
+    the whole interval when the event ends.
+    """
+    def __init__(self, path=None, intervals=None):
+        self.path = path
+        self.pending = []  # (event code, hive, start, end) added since the last query
+        self.by_event = {}  # Event code -> EVENT_INDEX_DTYPE array sorted by start
+        self.max_length = {}  # Event code -> longest interval
+        if intervals is not None:
+            self.extend(intervals)
+
+    @staticmethod
+    def load(path, keep_open=True):
+        """Index saved by save(); keep_open=False drops the intervals of events active at the time"""
+        with np.load(path) as saved:
+            if list(saved['events']) != list(EVENT_REGISTRY.events):
+                raise ValueError(f"Event index {path} was written with different event types")
+            intervals = saved['intervals']
+        if not keep_open:
+            intervals = intervals[~intervals['open']]
+        return EventIndex(path, intervals)
+
+    @staticmethod
+    def from_journal(path):
+        """Index of the events ended in an EventJournal file"""
+        records = EventJournal.read(path, kind=EventJournal.EVENT_END)
+        intervals = np.zeros(len(records), dtype=EVENT_INDEX_DTYPE)
+        for name in ('code', 'hive', 'start', 'end'):
+            intervals[name] = records[name]
+        return EventIndex(intervals=intervals)
+
+    def add(self, hive_id, event, start, end):
+        """An event active from start up to, not including, end"""
+        self.pending.append((EVENT_REGISTRY.events.index(event), -1 if hive_id is None else hive_id, start, end, False))
+
+    def extend(self, intervals):
+        """Merge an EVENT_INDEX_DTYPE array into the sorted intervals"""
+        for code in np.unique(intervals['code']).tolist():
+            added = intervals[intervals['code'] == code]
+            merged = np.concatenate([self.by_event[code], added]) if code in self.by_event else added
+            merged = merged[np.argsort(merged['start'], kind='stable')]
+            self.by_event[code] = merged
+            self.max_length[code] = (merged['end'] - merged['start']).max()
+
+    def build(self):
+        if self.pending:
+            pending, self.pending = self.pending, []
+            self.extend(np.array(pending, dtype=EVENT_INDEX_DTYPE))
+
+    def intervals(self, event, start=None, end=None):
+        """EVENT_INDEX_DTYPE intervals of one event overlapping [start, end), all of them without bounds"""
+        self.build()
+        code = EVENT_REGISTRY.events.index(event)
+        intervals = self.by_event.get(code)
+        if intervals is None:
+            return np.zeros(0, dtype=EVENT_INDEX_DTYPE)
+        starts = intervals['start']
+        first = 0 if start is None else np.searchsorted(starts, np.datetime64(start, 's') - self.max_length[code])
+        last = len(starts) if end is None else np.searchsorted(starts, np.datetime64(end, 's'))
+        found = intervals[first:last]
+        if start is not None:
+            found = found[found['end'] > np.datetime64(start, 's')]
+        return found
+
+    def active_at(self, event, when):
+        """Hives in which an event was active at one moment"""
+        return np.unique(self.intervals(event, when, np.datetime64(when, 's') + np.timedelta64(1, 's'))['hive'])
+
+    def hives(self, events, start=None, end=None):
+        """Hives in which any of the events was active at some time in [start, end)"""
+        found = [self.intervals(event, start, end)['hive'] for event in events]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int32)
+
+    def overlapping(self, event, other, start=None, end=None):
+        """Hives in which two events were active at the same time, at some time in [start, end)
+
+        Intervals of one event in one hive never overlap each other, so for each interval of
+        event it is enough to check the last interval of other in the same hive that starts
+        before it ends. Both overlap [start, end), so any time they share does too.
+        """
+        first = self.intervals(event, start, end)
+        second = self.intervals(other, start, end)
+        if not len(first) or not len(second):
+            return np.zeros(0, dtype=np.int32)
+        order = np.lexsort((second['start'], second['hive']))
+        second = second[order]
+        # Searching (hive, time) pairs as one sorted key
+        seconds = second['start'].astype(np.int64)
+        span = int(max(seconds.max(), first['end'].astype(np.int64).max())) + 1
+        keys = second['hive'].astype(np.int64) * span + seconds
+        pos = np.searchsorted(keys, first['hive'].astype(np.int64) * span + first['end'].astype(np.int64)) - 1
+        candidate = second[np.maximum(pos, 0)]
+        both = (pos >= 0) & (candidate['hive'] == first['hive']) & (candidate['end'] > first['start'])
+        return np.unique(first['hive'][both])
+
+    def save(self, hives=(), path=None):
+        """Write every interval, plus those of hives' events active now as open intervals up to now
+
+        path defaults to the path the index was created with or loaded from.
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("Event index has no path to save to, give one")
+        self.build()
+        now = clock.now()
+        active = [(EVENT_REGISTRY.events.index(event), hive.hive_id, now - timedelta(minutes=hive.events.event_times[event]),
+                   now, True) for hive in hives for event in hive.events.current_events]
+        intervals = np.concatenate(list(self.by_event.values()) + [np.array(active, dtype=EVENT_INDEX_DTYPE)])
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, events=np.array(EVENT_REGISTRY.events), intervals=intervals)
+        os.replace(path + '.tmp', path)
+
+# Event journal; without --journal only its console view is active
+journal = EventJournal()
+
+class RandomStream:
+    """Reproducible random stream with the random-module API, drawing uniforms from NumPy in blocks"""
+    BLOCK_SIZE = 1024
+
+    def __init__(self, seed_sequence):
+        self.seed_sequence = seed_sequence
+        self.generator = np.random.Generator(np.random.PCG64(seed_sequence))
+        self.block = iter(())
+        self.block_state = None  # Generator state the current block was drawn from
+        self.resume = 0          # Uniforms of the next block used up before a restore
+
+    def next_block(self):
+        self.block_state = self.generator.bit_generator.state
+        self.block = iter(self.generator.random(RandomStream.BLOCK_SIZE).tolist())
+        if self.resume:
+            next(islice(self.block, self.resume, self.resume), None)
+            self.resume = 0
+
+    def random(self):
+        """Uniform float in [0, 1)"""
+        try:
+            return next(self.block)
+        except StopIteration:
+            self.next_block()
+            return next(self.block)
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def randint(self, a, b):
+        """Integer in [a, b], both ends included"""
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    def skip(self, n):
+        """Move on as if n uniforms had been drawn, jumping whole blocks without generating them"""
+        left = length_hint(self.block)
+        n += self.resume
+        self.resume = 0
+        if n > left:
+            n -= left
+            self.generator.bit_generator.advance(n - n % RandomStream.BLOCK_SIZE)  # One step per uniform
+            self.next_block()
+            n %= RandomStream.BLOCK_SIZE
+        next(islice(self.block, n, n), None)
+
+    def spawn(self, n):
+        """Independent child streams"""
+        return [RandomStream(child) for child in self.seed_sequence.spawn(n)]
+
+    def get_state(self):
+        """Generator state at the start of the current block and the position in it, a few hundred bytes"""
+        left = length_hint(self.block)
+        if not left:  # No block drawn yet, or all of it used
+            return {'bit_generator': self.generator.bit_generator.state, 'offset': self.resume}
+        return {'bit_generator': self.block_state, 'offset': RandomStream.BLOCK_SIZE - left}
+
+    def set_state(self, state):
+        """The block is drawn again on the next use rather than here, so restoring thousands of hives is quick"""
+        self.generator.bit_generator.state = state['bit_generator']
+        self.block = iter(())
+        self.resume = state['offset']
+
+def stable_id(hive_id):
+    """Non-negative integer for a hive id that is the same in every process"""
+    if isinstance(hive_id, int) and hive_id >= 0:
+        return hive_id
+    return zlib.crc32(str(hive_id).encode())
+
+class RandomStreams:
+    """Independent random streams for each subsystem of one hive, keyed by seed and hive id"""
+    SUBSYSTEMS = ('weather_pattern', 'weather_trend', 'weather', 'events', 'sensors')
+
+    def __init__(self, seed=None, hive_id=0):
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        # Keyed by hive id rather than by spawn order, so a hive draws the same numbers
+        # no matter which process or shard simulates it
+        for i, subsystem in enumerate(RandomStreams.SUBSYSTEMS):
+            seed_sequence = np.random.SeedSequence(self.seed, spawn_key=(stable_id(hive_id), i))
+            setattr(self, subsystem, RandomStream(seed_sequence))
+
+    def get_state(self):
+        return {subsystem: getattr(self, subsystem).get_state() for subsystem in RandomStreams.SUBSYSTEMS}
+
+    def set_state(self, state):
+        for subsystem in RandomStreams.SUBSYSTEMS:
+            getattr(self, subsystem).set_state(state[subsystem])
+
+class CounterRandom:
+    """Counter-based uniforms for a fleet, a pure function of (seed, hive id, tick, slot)
+
+    Every hive gets the same numbers however the fleet is split into shards or processes.
+    """
+    GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+    def __init__(self, seed=None, hive_ids=()):
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        seed_key = np.random.SeedSequence(self.seed).generate_state(1, np.uint64)[0]
+        ids = np.array([stable_id(hive_id) for hive_id in hive_ids], dtype=np.uint64)
+        self.keys = CounterRandom.mix(ids * CounterRandom.GOLDEN ^ seed_key)
+
+    @staticmethod
+    def mix(x):
+        """SplitMix64 finalizer, wrapping uint64 arithmetic"""
+        x = x + CounterRandom.GOLDEN
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+    def random(self, tick, slots, rows=None):
+        """Uniforms in [0, 1), shape (hives,) for one slot or (hives, slots) for a slot array"""
+        keys = self.keys if rows is None else self.keys[rows]
+        # One-element arrays keep numpy from warning about the intended uint64 wraparound
+        counter = np.array([tick], dtype=np.uint64) * np.uint64(0xD1B54A32D192ED03) + np.asarray(slots, dtype=np.uint64)
+        if np.ndim(slots):
+            keys = keys[:, None]
+        bits = CounterRandom.mix(keys ^ CounterRandom.mix(counter))
+        return (bits >> np.uint64(11)) * (1.0 / (1 << 53))
 
 class WeatherPattern:
     CLEAR = 'clear'
     CLOUDY = 'cloudy'
     RAINY = 'rainy'
     STORMY = 'stormy'
+    PATTERNS = (CLEAR, CLOUDY, RAINY, STORMY)
+    EFFECTS = {
+        CLEAR: {'temp_mod': 1, 'humidity_mod': -5},
+        CLOUDY: {'temp_mod': 0, 'humidity_mod': 0},
+        RAINY: {'temp_mod': -2, 'humidity_mod': 15},
+        STORMY: {'temp_mod': -4, 'humidity_mod': 25}
+    }
 
-    def __init__(self):
+    def __init__(self, rng=None):
+        self.rng = rng or random
         self.current_pattern = WeatherPattern.CLEAR
-        self.pattern_duration = random.randint(360, 720)  # 6-12 hours
+        self.pattern_duration = self.rng.randint(360, 720)  # 6-12 hours
         self.pattern_time = 0
         self.next_patterns = {
             WeatherPattern.CLEAR: [WeatherPattern.CLEAR, WeatherPattern.CLOUDY],
@@ -30,49 +799,50 @@ class WeatherPattern:
         self.pattern_time += 1
         if self.pattern_time >= self.pattern_duration:
             self.pattern_time = 0
-            self.pattern_duration = random.randint(360, 720)
-            self.current_pattern = random.choice(self.next_patterns[self.current_pattern])
+            self.pattern_duration = self.rng.randint(360, 720)
+            self.current_pattern = self.rng.choice(self.next_patterns[self.current_pattern])
             
     def get_pattern_effects(self):
         """Get current weather pattern effects"""
-        effects = {
-            WeatherPattern.CLEAR: {'temp_mod': 1, 'humidity_mod': -5},
-            WeatherPattern.CLOUDY: {'temp_mod': 0, 'humidity_mod': 0},
-            WeatherPattern.RAINY: {'temp_mod': -2, 'humidity_mod': 15},
-            WeatherPattern.STORMY: {'temp_mod': -4, 'humidity_mod': 25}
-        }
-        return effects[self.current_pattern]
+        return WeatherPattern.EFFECTS[self.current_pattern]
+
+    def get_state(self):
+        return copy_attributes(self, skip=('rng',))
+
+    def set_state(self, state):
+        restore_attributes(self, state)
 
 class WeatherTrend:
-    def __init__(self):
-        self.trend_duration = random.randint(180, 360)  # 3-6 hours
+    def __init__(self, rng=None):
+        self.rng = rng or random
+        self.trend_duration = self.rng.randint(180, 360)  # 3-6 hours
         self.trend_time = 0
-        self.temp_trend = random.uniform(-3, 3)
-        self.humidity_trend = random.uniform(-10, 10)
-        self.wind_speed = random.uniform(0, 15)  # km/h
-        self.wind_direction = random.uniform(0, 360)  # degrees
-        self.pressure = random.uniform(995, 1025)  # hPa
-        self.pressure_trend = random.uniform(-1, 1)
+        self.temp_trend = self.rng.uniform(-3, 3)
+        self.humidity_trend = self.rng.uniform(-10, 10)
+        self.wind_speed = self.rng.uniform(0, 15)  # km/h
+        self.wind_direction = self.rng.uniform(0, 360)  # degrees
+        self.pressure = self.rng.uniform(995, 1025)  # hPa
+        self.pressure_trend = self.rng.uniform(-1, 1)
         
     def update(self):
         """Update trend progress and create new trend if needed"""
         self.trend_time += 1
         if self.trend_time >= self.trend_duration:
-            self.trend_duration = random.randint(180, 360)
+            self.trend_duration = self.rng.randint(180, 360)
             self.trend_time = 0
             
             # Smooth transitions for new trends
-            self.temp_trend = random.uniform(-3, 3)
-            self.humidity_trend = random.uniform(-10, 10)
+            self.temp_trend = self.rng.uniform(-3, 3)
+            self.humidity_trend = self.rng.uniform(-10, 10)
             
             # Update wind conditions
-            self.wind_speed = max(0, min(30, self.wind_speed + random.uniform(-5, 5)))
-            self.wind_direction = (self.wind_direction + random.uniform(-45, 45)) % 360
+            self.wind_speed = max(0, min(30, self.wind_speed + self.rng.uniform(-5, 5)))
+            self.wind_direction = (self.wind_direction + self.rng.uniform(-45, 45)) % 360
             
             # Update pressure trends
             self.pressure += self.pressure_trend
             self.pressure = max(985, min(1035, self.pressure))
-            self.pressure_trend = random.uniform(-1, 1)
+            self.pressure_trend = self.rng.uniform(-1, 1)
             
     def get_trend_factor(self):
         """Get current trend influence (0-1)"""
@@ -90,21 +860,30 @@ class WeatherTrend:
             'pressure_trend': self.pressure_trend
         }
 
+    def get_state(self):
+        return copy_attributes(self, skip=('rng',))
+
+    def set_state(self, state):
+        restore_attributes(self, state)
+
 class WeatherConditions:
-    def __init__(self):
+    def __init__(self, rng=None, pattern_rng=None, trend_rng=None, start=None):
+        # start is the simulated time of the first tick (default: the clock's time)
+        now = start or clock.now()
+        self.rng = rng or random
         self.current_temp = 20
         self.current_humidity = 65
         self.target_temp = 20
         self.target_humidity = 65
-        self.last_target_update = datetime.now()
+        self.last_target_update = now
         self.update_interval = 30
-        self.weather_trend = WeatherTrend()
-        self.weather_pattern = WeatherPattern()
-        self.last_rain = datetime.now() - timedelta(days=1)
+        self.weather_trend = WeatherTrend(trend_rng or self.rng)
+        self.weather_pattern = WeatherPattern(pattern_rng or self.rng)
+        self.last_rain = now - timedelta(days=1)
         
-    def update_targets(self, base_temp, base_humidity, time_factor):
+    def update_targets(self, base_temp, base_humidity, time_factor, ctx=None):
         """Update target values periodically"""
-        now = datetime.now()
+        now = ctx.now if ctx else clock.now()
         minutes_passed = (now - self.last_target_update).total_seconds() / 60
         
         if minutes_passed >= self.update_interval:
@@ -116,7 +895,8 @@ class WeatherConditions:
             trends = self.weather_trend.get_trends()
             
             # Calculate temperature variations
-            daily_temp_variation = 6 if Season.get_current_season() == Season.WINTER else 10
+            season = ctx.season if ctx else Season.get_current_season(now)
+            daily_temp_variation = 6 if season == Season.WINTER else 10
             wind_chill = 0.5 * trends['wind_speed'] if trends['wind_speed'] > 10 else 0
             pressure_effect = (trends['pressure'] - 1013) / 100  # Slight effect from pressure
             
@@ -128,7 +908,7 @@ class WeatherConditions:
                 trends['temperature'] -
                 wind_chill +
                 pressure_effect +
-                random.uniform(-0.5, 0.5)
+                self.rng.uniform(-0.5, 0.5)
             )
             
             # Calculate humidity variations
@@ -146,7 +926,7 @@ class WeatherConditions:
                 pattern_effects['humidity_mod'] +
                 trends['humidity'] +
                 rain_effect +
-                random.uniform(-1, 1)
+                self.rng.uniform(-1, 1)
             )
             
             # Ensure values stay within realistic bounds
@@ -172,6 +952,121 @@ class WeatherConditions:
             'trends': self.weather_trend.get_trends()
         }
 
+    def approach(self, minutes):
+        """Move current values as minutes calls of get_current_conditions() would, in closed form"""
+        transition_speed = 0.05 if self.weather_pattern.current_pattern == WeatherPattern.STORMY else 0.02
+        remaining = (1 - transition_speed) ** minutes  # Share of the gap to the targets left afterwards
+        self.current_temp = self.target_temp + (self.current_temp - self.target_temp) * remaining
+        self.current_humidity = self.target_humidity + (self.current_humidity - self.target_humidity) * remaining
+
+    def get_state(self):
+        state = copy_attributes(self, skip=('rng', 'weather_trend', 'weather_pattern'))
+        state['weather_trend'] = self.weather_trend.get_state()
+        state['weather_pattern'] = self.weather_pattern.get_state()
+        return state
+
+    def set_state(self, state):
+        state = dict(state)
+        self.weather_trend.set_state(state.pop('weather_trend'))
+        self.weather_pattern.set_state(state.pop('weather_pattern'))
+        restore_attributes(self, state)
+
+class RegionalWeather:
+    """Weather of a set of apiary regions: one shared sky plus spatially correlated local offsets
+
+    Advanced once per tick no matter how many hives read it; hives hold a RegionWeather view.
+    """
+
+    def __init__(self, regions, seed=None, correlation_km=WEATHER_CORRELATION_KM, start=None):
+        # regions maps a region id to its (x, y) position in km
+        self.region_ids = list(regions)
+        self.index = {region_id: i for i, region_id in enumerate(self.region_ids)}
+        self.streams = RandomStreams(seed, 'regional_weather')
+        self.sky = WeatherConditions(self.streams.weather, self.streams.weather_pattern, self.streams.weather_trend,
+                                     start)
+        # Normal draws for the local offsets, a stream next to the sky's
+        self.noise = np.random.Generator(np.random.PCG64(np.random.SeedSequence(
+            self.streams.seed, spawn_key=(stable_id('regional_weather'), len(RandomStreams.SUBSYSTEMS)))))
+        
+        # Offsets are AR(1) in time and exponentially correlated in space
+        positions = np.array([regions[region_id] for region_id in self.region_ids], dtype=float).reshape(-1, 2)
+        distances = np.linalg.norm(positions[:, None] - positions[None], axis=2)
+        self.cholesky = np.linalg.cholesky(np.exp(-distances / correlation_km) + 1e-9 * np.eye(len(positions)))
+        self.persistence = math.exp(-1 / WEATHER_LOCAL_MINUTES)
+        self.offsets = self.cholesky @ self.noise.standard_normal((len(positions), 2))
+        
+        self.last_time = None
+        self.advances = 0
+        self.conditions = {}  # Region id -> read-only conditions of the current tick
+        self.state_cache = (None, None)
+
+    def advance(self, ctx=None):
+        """Move the sky and the local offsets one tick forward, once per simulated minute"""
+        ctx = ctx or TickContext()
+        if ctx.now == self.last_time:
+            return
+        self.last_time = ctx.now
+        self.advances += 1
+        self.sky.update_targets(ctx.base_temp, ctx.base_humidity, ctx.time_factor, ctx)
+        sky = self.sky.get_current_conditions()
+        innovation = self.cholesky @ self.noise.standard_normal((len(self.region_ids), 2))
+        self.offsets = self.persistence * self.offsets + math.sqrt(1 - self.persistence ** 2) * innovation
+        
+        trends = MappingProxyType(sky['trends'])
+        temperatures = sky['temperature'] + WEATHER_LOCAL_TEMP_SD * self.offsets[:, 0]
+        humidities = np.clip(sky['humidity'] + WEATHER_LOCAL_HUMIDITY_SD * self.offsets[:, 1], 0, 100)
+        self.conditions = {
+            region_id: MappingProxyType({
+                'temperature': float(temperatures[i]),
+                'humidity': float(humidities[i]),
+                'pattern': sky['pattern'],
+                'trends': trends
+            })
+            for i, region_id in enumerate(self.region_ids)
+        }
+
+    def region(self, region_id):
+        return RegionWeather(self, region_id)
+
+    def get_state(self):
+        """Snapshot, the same object until the next advance so hives sharing the weather share it too"""
+        if self.state_cache[0] != self.advances:
+            state = copy_attributes(self, skip=('region_ids', 'index', 'streams', 'sky', 'noise', 'cholesky',
+                                                'persistence', 'conditions', 'state_cache'))
+            state['streams'] = self.streams.get_state()
+            state['sky'] = self.sky.get_state()
+            state['noise'] = self.noise.bit_generator.state
+            self.state_cache = (self.advances, state)
+        return self.state_cache[1]
+
+    def set_state(self, state):
+        state = dict(state)
+        if 'streams' in state:  # Missing from snapshots of older versions
+            self.streams.set_state(state.pop('streams'))
+        self.sky.set_state(state.pop('sky'))
+        self.noise.bit_generator.state = state.pop('noise')
+        restore_attributes(self, state)
+        self.state_cache = (None, None)
+
+class RegionWeather:
+    """A hive's read-only view of its region in a RegionalWeather, usable wherever WeatherConditions is"""
+
+    def __init__(self, field, region_id):
+        self.field = field
+        self.region_id = region_id
+
+    def update_targets(self, base_temp, base_humidity, time_factor, ctx=None):
+        self.field.advance(ctx)  # No-op for every hive after the first in a tick
+
+    def get_current_conditions(self):
+        return self.field.conditions[self.region_id]
+
+    def get_state(self):
+        return self.field.get_state()
+
+    def set_state(self, state):
+        self.field.set_state(state)
+
 class Season:
     WINTER = 'winter'
     SPRING = 'spring'
@@ -179,8 +1074,8 @@ class Season:
     FALL = 'fall'
 
     @staticmethod
-    def get_current_season():
-        month = datetime.now().month
+    def get_current_season(now=None):
+        month = (now or clock.now()).month
         if month in [12, 1, 2]:
             return Season.WINTER
         elif month in [3, 4, 5]:
@@ -191,10 +1086,11 @@ class Season:
             return Season.FALL
 
     @staticmethod
-    def get_season_progress():
+    def get_season_progress(now=None):
         """Calculate progress through current season (0-1)"""
-        month = datetime.now().month
-        day = datetime.now().day
+        now = now or clock.now()
+        month = now.month
+        day = now.day
         
         # Calculate days into current season
         if month in [12, 1, 2]:  # Winter
@@ -207,83 +1103,147 @@ class Season:
             
         return days / 90  # Approximate season length
 
+def half_sine(progress):
+    """sin(progress * pi) of a float, or of every hive's progress as a NumPy array"""
+    if isinstance(progress, np.ndarray):
+        return np.sin(progress * math.pi)
+    return math.sin(progress * math.pi)
+
+def first_half(progress):
+    """progress up to halfway and 1 after that, of a float or of a NumPy array"""
+    if isinstance(progress, np.ndarray):
+        return np.where(progress < 0.5, progress, 1)
+    return progress if progress < 0.5 else 1
+
 class HiveEvent:
-    def __init__(self):
+    # Define incompatible event combinations
+    incompatible_events = {
+        'swarming': ['winter_cluster', 'honey_harvesting', 'robbing', 'queen_mating'],
+        'winter_cluster': ['swarming', 'nectar_flow', 'queen_mating', 'pollen_collection', 'propolis_collection'],
+        'queen_mating': ['winter_cluster', 'swarming', 'honey_harvesting'],
+        'honey_harvesting': ['swarming', 'queen_mating', 'nectar_flow'],
+        'robbing': ['swarming', 'nectar_flow'],
+        'ventilation': []  # Compatible with all
+    }
+    
+    # Define event synergies (events that enhance each other's effects)
+    event_synergies = {
+        'nectar_flow': {
+            'pollen_collection': {'weight_mod': 1.2},  # 20% bonus to weight gain
+            'ventilation': {'inside_humidity_mod': 1.5}  # 50% more effective humidity reduction
+        },
+        'brood_rearing': {
+            'pollen_collection': {'inside_temp_mod': 1.3},  # 30% more heat generation
+            'nectar_flow': {'weight_mod': 1.2}  # 20% more weight gain
+        },
+        'ventilation': {
+            'propolis_collection': {'inside_humidity_mod': 1.2}  # 20% more effective humidity control
+        }
+    }
+
+    # Active events that make other events more likely
+    probability_boosts = {
+        'nectar_flow': {
+            'pollen_collection': 1.5,  # More likely during nectar flow
+            'ventilation': 1.3  # More ventilation needed
+        },
+        'brood_rearing': {
+            'pollen_collection': 1.4,  # More pollen needed for brood
+            'nectar_flow': 1.2  # More nectar needed
+        }
+    }
+
+    # Event duration ranges (in minutes)
+    event_duration_ranges = {
+        'swarming': (120, 240),             # 2-4 hours
+        'nectar_flow': (720, 2880),         # 12-48 hours
+        'queen_mating': (30, 60),           # 30-60 minutes
+        'brood_rearing': (4320, 5760),      # 3-4 days
+        'honey_harvesting': (180, 360),     # 3-6 hours
+        'winter_cluster': (43200, 86400),   # 30-60 days
+        'spring_buildup': (20160, 40320),   # 14-28 days
+        'pollen_collection': (360, 720),    # 6-12 hours
+        'propolis_collection': (180, 360),  # 3-6 hours
+        'ventilation': (20, 40),            # 20-40 minutes
+        'robbing': (120, 360),              # 2-6 hours
+        'varroa_infestation': (10080, 20160),  # 7-14 days
+        'nosema': (4320, 8640)              # 3-6 days
+    }
+
+    # Sensor effects of each event as a function of its progress (0-1):
+    # (inside_temp_mod, inside_humidity_mod, weight_mod). HiveFleet passes every hive's progress
+    # as one NumPy array, so the functions only use arithmetic, half_sine() and first_half()
+    event_effects = {
+        'swarming': lambda progress: (4 * half_sine(progress),
+                                      -5 * half_sine(progress),
+                                      -3 * first_half(progress)),
+        'nectar_flow': lambda progress: (1, 3, 0.05 * progress),
+        'queen_mating': lambda progress: (2 * half_sine(progress), 0, 0),
+        'brood_rearing': lambda progress: (2, 5, -0.01),
+        'honey_harvesting': lambda progress: (1, -3, -0.1 * progress),
+        'winter_cluster': lambda progress: (-5, 8, -0.02 * progress),
+        'spring_buildup': lambda progress: (progress * 3, 2, 0.03 * progress),
+        'pollen_collection': lambda progress: (0.5, 0, 0.01),
+        'propolis_collection': lambda progress: (0.5, 0, 0.01),
+        'ventilation': lambda progress: (-2 * half_sine(progress),
+                                         -8 * half_sine(progress),
+                                         0),
+        'robbing': lambda progress: (2, 0, -0.05 * progress),
+        'varroa_infestation': lambda progress: (0, 5, -0.02 * progress),
+        'nosema': lambda progress: (0, 8, -0.03 * progress)
+    }
+
+    def __init__(self, registry=None, rng=None, hive_id=None, start=None):
+        self.registry = registry or EVENT_REGISTRY
+        self.rng = rng or random
+        self.hive_id = hive_id  # Only used to label journal records
         self.current_events = []  # Allow multiple concurrent events
+        self.active_mask = 0  # Bitmask of current_events in registry order
         self.event_durations = {}
         self.event_times = {}
         self.last_season = None
-        self.season_started = datetime.now()
+        self.season_started = start or clock.now()
         self.daily_event_checks = {
             'nectar_flow': False,
             'pollen_collection': False,
             'propolis_collection': False
         }
-        
-        # Define incompatible event combinations
-        self.incompatible_events = {
-            'swarming': ['winter_cluster', 'honey_harvesting', 'robbing', 'queen_mating'],
-            'winter_cluster': ['swarming', 'nectar_flow', 'queen_mating', 'pollen_collection', 'propolis_collection'],
-            'queen_mating': ['winter_cluster', 'swarming', 'honey_harvesting'],
-            'honey_harvesting': ['swarming', 'queen_mating', 'nectar_flow'],
-            'robbing': ['swarming', 'nectar_flow'],
-            'ventilation': []  # Compatible with all
-        }
-        
-        # Define event synergies (events that enhance each other's effects)
-        self.event_synergies = {
-            'nectar_flow': {
-                'pollen_collection': {'weight_mod': 1.2},  # 20% bonus to weight gain
-                'ventilation': {'humidity_mod': 1.5}  # 50% more effective humidity reduction
-            },
-            'brood_rearing': {
-                'pollen_collection': {'inside_temp_mod': 1.3},  # 30% more heat generation
-                'nectar_flow': {'weight_mod': 1.2}  # 20% more weight gain
-            },
-            'ventilation': {
-                'propolis_collection': {'inside_humidity_mod': 1.2}  # 20% more effective humidity control
-            }
-        }
+        # Minutes until the next random event fires, None when it must be sampled again
+        self.minutes_to_next_event = None
+        self.candidates = ()
 
-    def reset_daily_checks(self):
+    def reset_daily_checks(self, ctx=None):
         """Reset daily event checks at midnight"""
-        current_hour = datetime.now().hour
-        if current_hour == 0:
+        current_hour = ctx.hour if ctx else clock.now().hour
+        if current_hour == 0 and any(self.daily_event_checks.values()):
             self.daily_event_checks = {k: False for k in self.daily_event_checks}
+            self.minutes_to_next_event = None
 
-    def check_seasonal_transition(self):
+    def check_seasonal_transition(self, ctx=None):
         """Check if season has changed and trigger relevant events"""
-        current_season = Season.get_current_season()
+        ctx = ctx or TickContext()
+        current_season = ctx.season
         if current_season != self.last_season:
             self.last_season = current_season
-            self.season_started = datetime.now()
+            self.season_started = ctx.now
+            self.minutes_to_next_event = None
             
             # Trigger seasonal events
             if current_season == Season.SPRING:
-                if random.random() < 0.3:  # 30% chance of swarming in spring
-                    self.add_event('swarming')
-                self.add_event('spring_buildup')
+                if self.rng.random() < 0.3:  # 30% chance of swarming in spring
+                    self.add_event('swarming', ctx.now)
+                self.add_event('spring_buildup', ctx.now)
             elif current_season == Season.WINTER:
-                self.add_event('winter_cluster')
+                self.add_event('winter_cluster', ctx.now)
 
     def is_event_compatible(self, new_event):
         """Check if a new event is compatible with current events"""
-        if new_event not in self.incompatible_events:
-            return True
-            
-        for current_event in self.current_events:
-            if current_event in self.incompatible_events[new_event]:
-                return False
-        return True
+        return not self.registry.incompatible_masks.get(new_event, 0) & self.active_mask
 
-    def check_for_new_event(self):
-        """Check for new events based on season and conditions"""
-        self.reset_daily_checks()
-        self.check_seasonal_transition()
-        current_season = Season.get_current_season()
-        
-        # Define event probabilities based on season (chance per minute)
-        base_probabilities = {
+    @staticmethod
+    def get_base_probabilities(current_season):
+        """Event probabilities for a season (chance per minute)"""
+        return {
             'swarming': 0.000001 if current_season == Season.SPRING else 0,
             'nectar_flow': 0.001 if current_season in [Season.SPRING, Season.SUMMER] else 0,
             'queen_mating': 0.000001 if current_season == Season.SPRING else 0,
@@ -297,149 +1257,187 @@ class HiveEvent:
             'nosema': 0.000005 if current_season in [Season.WINTER, Season.SPRING] else 0
         }
 
-        # Adjust probabilities based on current events
-        if 'nectar_flow' in self.current_events:
-            base_probabilities['pollen_collection'] *= 1.5  # More likely during nectar flow
-            base_probabilities['ventilation'] *= 1.3  # More ventilation needed
+    def check_for_new_event(self, ctx=None):
+        """Check for new events based on season and conditions"""
+        ctx = ctx or TickContext()
+        self.reset_daily_checks(ctx)
+        self.check_seasonal_transition(ctx)
         
-        if 'brood_rearing' in self.current_events:
-            base_probabilities['pollen_collection'] *= 1.4  # More pollen needed for brood
-            base_probabilities['nectar_flow'] *= 1.2  # More nectar needed
-
-        # Check for new events
-        for event, probability in base_probabilities.items():
-            # Skip if event check already done today or event is already active
-            if (event in self.daily_event_checks and self.daily_event_checks[event]) or event in self.current_events:
+        # Instead of one coin flip per event per minute, wait for the first minute in which
+        # any of them fires; sampled again whenever the season or the active events change
+        if self.minutes_to_next_event is None:
+            blocked = [event for event, checked in self.daily_event_checks.items() if checked]
+            self.candidates, hazard = self.registry.get_candidates(
+                ctx.season, self.active_mask, self.registry.mask_of(blocked)
+            )
+            self.minutes_to_next_event = self.registry.sample_wait(hazard, self.rng.random())
+        
+        self.minutes_to_next_event -= 1
+        if self.minutes_to_next_event > 0:
+            return
+        
+        # This minute at least one coin flip succeeds: pick the first success in event order,
+        # then flip the remaining coins as usual
+        candidates = self.candidates
+        first = self.registry.pick_first(candidates, self.rng.random())
+        for i in range(first, len(candidates)):
+            event, probability = candidates[i]
+            if i > first and self.rng.random() >= probability:
                 continue
-                
-            if random.random() < probability and self.is_event_compatible(event):
-                self.add_event(event)
+            if self.is_event_compatible(event):
+                self.add_event(event, ctx.now)
                 if event in self.daily_event_checks:
                     self.daily_event_checks[event] = True
+        self.minutes_to_next_event = None
 
-    def add_event(self, event):
+    def add_event(self, event, now=None):
         """Add a new event with appropriate duration"""
         if event not in self.current_events:
             self.current_events.append(event)
+            self.active_mask |= self.registry.bits.get(event, 0)
+            self.minutes_to_next_event = None
             
-            # Set event duration (in minutes)
-            durations = {
-                'swarming': random.randint(120, 240),          # 2-4 hours
-                'nectar_flow': random.randint(720, 2880),      # 12-48 hours
-                'queen_mating': random.randint(30, 60),        # 30-60 minutes
-                'brood_rearing': random.randint(4320, 5760),   # 3-4 days
-                'honey_harvesting': random.randint(180, 360),  # 3-6 hours
-                'winter_cluster': random.randint(43200, 86400),# 30-60 days
-                'spring_buildup': random.randint(20160, 40320),# 14-28 days
-                'pollen_collection': random.randint(360, 720), # 6-12 hours
-                'propolis_collection': random.randint(180, 360),# 3-6 hours
-                'ventilation': random.randint(20, 40),         # 20-40 minutes
-                'robbing': random.randint(120, 360),          # 2-6 hours
-                'varroa_infestation': random.randint(10080, 20160), # 7-14 days
-                'nosema': random.randint(4320, 8640)          # 3-6 days
-            }
-            
-            self.event_durations[event] = durations.get(event, 60)
+            duration_range = self.registry.duration_ranges.get(event)
+            self.event_durations[event] = self.rng.randint(*duration_range) if duration_range else 60
             self.event_times[event] = 0
-            print(f"\nNew event started: {event} (Duration: {self.event_durations[event]} minutes)")
+            journal.event_start(self.hive_id, event, now or clock.now(), self.event_durations[event])
 
-    def update(self):
+    def update(self, ctx=None):
         """Update all current events"""
         for event in list(self.current_events):  # Create a copy to allow modification during iteration
             self.event_times[event] += 1
             if self.event_times[event] >= self.event_durations[event]:
-                print(f"\nEvent ended: {event}")
+                # Ends before this tick's reading, so it shows in the event_times - 1 readings before it
+                end = ctx.now if ctx else clock.now()
+                journal.event_end(self.hive_id, event, end - timedelta(minutes=self.event_times[event] - 1), end)
                 self.current_events.remove(event)
+                self.active_mask &= ~self.registry.bits.get(event, 0)
+                self.minutes_to_next_event = None
                 del self.event_durations[event]
                 del self.event_times[event]
 
-    def get_event_effects(self):
-        """Return combined modifications to sensor values based on all current events"""
-        effects = {
-            'inside_temp_mod': 0,
-            'inside_humidity_mod': 0,
-            'weight_mod': 0
-        }
-
-        # Calculate base effects for each event
+    def get_event_effects(self, elapsed=0):
+        """Return combined modifications to sensor values based on all current events, elapsed minutes from now"""
+        temp = humidity = weight = 0
+        registry = self.registry
         for event in self.current_events:
-            progress = self.event_times[event] / self.event_durations[event]
+            effect = registry.effects.get(event)
+            if effect is None:
+                continue
+            event_temp, event_humidity, event_weight = effect((self.event_times[event] + elapsed) / self.event_durations[event])
             
-            # Store individual event effects for potential synergy calculations
-            event_effects = {
-                'inside_temp_mod': 0,
-                'inside_humidity_mod': 0,
-                'weight_mod': 0
-            }
-
-            if event == 'swarming':
-                event_effects['inside_temp_mod'] = 4 * math.sin(progress * math.pi)
-                event_effects['inside_humidity_mod'] = -5 * math.sin(progress * math.pi)
-                event_effects['weight_mod'] = -3 * (progress if progress < 0.5 else 1)
-
-            elif event == 'nectar_flow':
-                event_effects['inside_temp_mod'] = 1
-                event_effects['inside_humidity_mod'] = 3
-                event_effects['weight_mod'] = 0.05 * progress
-
-            elif event == 'queen_mating':
-                event_effects['inside_temp_mod'] = 2 * math.sin(progress * math.pi)
-
-            elif event == 'brood_rearing':
-                event_effects['inside_temp_mod'] = 2
-                event_effects['inside_humidity_mod'] = 5
-                event_effects['weight_mod'] = -0.01
-
-            elif event == 'honey_harvesting':
-                event_effects['inside_temp_mod'] = 1
-                event_effects['inside_humidity_mod'] = -3
-                event_effects['weight_mod'] = -0.1 * progress
+            # Apply synergy effects if applicable
+            for other_bit, temp_mult, humidity_mult, weight_mult in registry.synergies.get(event, ()):
+                if self.active_mask & other_bit:
+                    event_temp *= temp_mult
+                    event_humidity *= humidity_mult
+                    event_weight *= weight_mult
+            
+            temp += event_temp
+            humidity += event_humidity
+            weight += event_weight
 
-            elif event == 'winter_cluster':
-                event_effects['inside_temp_mod'] = -5
-                event_effects['inside_humidity_mod'] = 8
-                event_effects['weight_mod'] = -0.02 * progress
+        return {
+            'inside_temp_mod': temp,
+            'inside_humidity_mod': humidity,
+            'weight_mod': weight
+        }
 
-            elif event == 'spring_buildup':
-                event_effects['inside_temp_mod'] = progress * 3
-                event_effects['inside_humidity_mod'] = 2
-                event_effects['weight_mod'] = 0.03 * progress
+    def get_state(self):
+        """Active events with elapsed minutes and durations, daily checks and the pending event wait"""
+        return copy_attributes(self, skip=('registry', 'rng', 'hive_id'))
 
-            elif event in ['pollen_collection', 'propolis_collection']:
-                event_effects['inside_temp_mod'] = 0.5
-                event_effects['weight_mod'] = 0.01
+    def set_state(self, state):
+        restore_attributes(self, state)
 
-            elif event == 'ventilation':
-                event_effects['inside_temp_mod'] = -2 * math.sin(progress * math.pi)
-                event_effects['inside_humidity_mod'] = -8 * math.sin(progress * math.pi)
+class EventRegistry:
+    """HiveEvent tables compiled into bitmasks, per-season probabilities and effect functions"""
 
-            elif event == 'robbing':
-                event_effects['inside_temp_mod'] = 2
-                event_effects['weight_mod'] = -0.05 * progress
+    def __init__(self, tables=HiveEvent):
+        self.events = tuple(tables.event_duration_ranges)
+        self.bits = {event: 1 << i for i, event in enumerate(self.events)}
+        self.duration_ranges = dict(tables.event_duration_ranges)
+        self.effects = dict(tables.event_effects)
+        self.incompatible_masks = {event: self.mask_of(others) for event, others in tables.incompatible_events.items()}
+        self.probabilities = {
+            season: tuple(tables.get_base_probabilities(season).items())
+            for season in (Season.WINTER, Season.SPRING, Season.SUMMER, Season.FALL)
+        }
+        self.boosts = {self.bits[event]: targets for event, targets in tables.probability_boosts.items()}
+        
+        # Synergies as (partner bit, temp, humidity, weight multipliers)
+        self.synergies = {}
+        for event, partners in tables.event_synergies.items():
+            for other_event, synergy in partners.items():
+                self.synergies.setdefault(event, []).append((
+                    self.bits[other_event],
+                    synergy.get('inside_temp_mod', 1),
+                    synergy.get('inside_humidity_mod', 1),
+                    synergy.get('weight_mod', 1)
+                ))
+        self.candidate_cache = {}
 
-            elif event == 'varroa_infestation':
-                event_effects['inside_humidity_mod'] = 5
-                event_effects['weight_mod'] = -0.02 * progress
+    def mask_of(self, events):
+        mask = 0
+        for event in events:
+            mask |= self.bits[event]
+        return mask
 
-            elif event == 'nosema':
-                event_effects['inside_humidity_mod'] = 8
-                event_effects['weight_mod'] = -0.03 * progress
+    def get_candidates(self, season, active_mask, blocked_mask):
+        """Events that may start now with their per-minute probabilities, and the chance any starts"""
+        key = (season, active_mask, blocked_mask)
+        if key not in self.candidate_cache:
+            candidates = []
+            none_fires = 1
+            for event, probability in self.probabilities[season]:
+                # Active, already checked today and incompatible events can never start
+                bit = self.bits[event]
+                if (probability == 0 or (active_mask | blocked_mask) & bit or
+                        self.incompatible_masks.get(event, 0) & active_mask):
+                    continue
+                for booster_bit, targets in self.boosts.items():
+                    if active_mask & booster_bit:
+                        probability *= targets.get(event, 1)
+                candidates.append((event, probability))
+                none_fires *= 1 - probability
+            self.candidate_cache[key] = (tuple(candidates), 1 - none_fires)
+        return self.candidate_cache[key]
 
-            # Apply synergy effects if applicable
-            if event in self.event_synergies:
-                for other_event in self.current_events:
-                    if other_event in self.event_synergies[event]:
-                        synergy = self.event_synergies[event][other_event]
-                        for mod_type, multiplier in synergy.items():
-                            event_effects[mod_type] *= multiplier
+    @staticmethod
+    def sample_wait(hazard, u):
+        """Minutes until the first success of a per-minute chance (geometric distribution, at least 1)"""
+        if hazard <= 0:
+            return math.inf
+        return max(1, math.ceil(math.log(1 - u) / math.log1p(-hazard)))
 
-            # Add event effects to total effects
-            for key in effects:
-                effects[key] += event_effects[key]
+    @staticmethod
+    def pick_first(candidates, u):
+        """Index of the first candidate to succeed, given that at least one does"""
+        weights = []
+        none_yet = 1
+        for event, probability in candidates:
+            weights.append(none_yet * probability)
+            none_yet *= 1 - probability
+        target = u * sum(weights)
+        for i, weight in enumerate(weights):
+            target -= weight
+            if target < 0:
+                return i
+        return len(candidates) - 1
 
-        return effects
+# Compiled tables shared by every HiveEvent
+EVENT_REGISTRY = EventRegistry()
 
 class HiveWeight:
+    # Daily food consumption in kg, per season and in a winter cluster
+    consumption_rates = {
+        Season.WINTER: 0.03,  # 30g per day
+        Season.SPRING: 0.1,   # 100g per day (high due to brood rearing)
+        Season.SUMMER: 0.08,  # 80g per day
+        Season.FALL: 0.05     # 50g per day
+    }
+    cluster_consumption = 0.05  # 50g per day in winter cluster
+
     def __init__(self):
         self.base_weight = 30  # Base hive weight in kg
         self.honey_stores = 15  # Initial honey stores in kg
@@ -451,15 +1449,8 @@ class HiveWeight:
     def calculate_daily_consumption(self, season, is_winter_cluster):
         """Calculate daily food consumption"""
         if is_winter_cluster:
-            return 0.05  # 50g per day in winter cluster
-        
-        consumption_rates = {
-            Season.WINTER: 0.03,  # 30g per day
-            Season.SPRING: 0.1,   # 100g per day (high due to brood rearing)
-            Season.SUMMER: 0.08,  # 80g per day
-            Season.FALL: 0.05     # 50g per day
-        }
-        return consumption_rates[season]
+            return HiveWeight.cluster_consumption
+        return HiveWeight.consumption_rates[season]
     
     def update_weight(self, events, weather_pattern, time_factor, season):
         """Update hive weight based on various factors"""
@@ -536,20 +1527,87 @@ class HiveWeight:
         
         return total_weight
 
-def get_time_factor():
-    """Calculate time-based factors for daily cycles (0.0 to 1.0)"""
-    current_time = datetime.now()
-    hour = current_time.hour + current_time.minute / 60.0
-    
-    # Adjust peak time and daylight hours based on season
-    season = Season.get_current_season()
-    season_progress = Season.get_season_progress()
-    
+    def starved(self):
+        """Brood rearing and spring buildup stop while honey or pollen is used up"""
+        return self.honey_stores == 0 or self.pollen_stores == 0
+
+    def store_losses(self, events, season):
+        """Honey and pollen used per minute by consumption, brood rearing, buildup and degradation"""
+        honey = self.calculate_daily_consumption(season, 'winter_cluster' in events) / 1440
+        pollen = 0.00001
+        if not self.starved():
+            if 'brood_rearing' in events:
+                honey += 0.0003
+                pollen += 0.00015
+            if 'spring_buildup' in events:
+                honey += 0.0002
+                pollen += 0.0001
+        return honey, pollen
+
+    def linear_minutes(self, events, season, night=math.inf):
+        """Minutes over which update_weight() changes every store at a fixed rate per minute or unit of daylight
+
+        Zero with honey harvesting or swarming active. Otherwise the time before any store could
+        drop below what brood rearing and spring buildup need, or for a starved hive the night
+        minutes left before an empty store could fill again. Daylight gains always outweigh the
+        losses, so within all daylight or all night minutes each limit is reached only once.
+        """
+        if 'honey_harvesting' in events or 'swarming' in events:
+            return 0
+        if self.starved():
+            if ((self.honey_stores == 0 and 'nectar_flow' in events) or
+                    (self.pollen_stores == 0 and 'pollen_collection' in events)):
+                return night
+            return math.inf
+        honey_loss, pollen_loss = self.store_losses(events, season)
+        return max(0, math.floor(min((self.honey_stores - 0.11) / honey_loss,
+                                     (self.pollen_stores - 0.06) / pollen_loss)))
+
+    def max_rate(self, events, season):
+        """Most the total weight can move per minute within linear_minutes(), counting gains and losses apart"""
+        honey_loss, pollen_loss = self.store_losses(events, season)
+        rate = honey_loss + pollen_loss + 0.0001 + 0.00009 + 0.001  # Bees, brood and moisture at their fastest
+        if 'nectar_flow' in events:
+            rate += 0.002
+        if 'pollen_collection' in events:
+            rate += 0.001
+        return rate
+
+    def advance(self, events, weather_pattern, season, minutes, daylight):
+        """update_weight() repeated for minutes within linear_minutes() that are all daylight or all night
+
+        daylight is the sum of their time factors.
+        """
+        honey_loss, pollen_loss = self.store_losses(events, season)
+        honey_gain = 0.002 * daylight if 'nectar_flow' in events else 0
+        pollen_gain = 0.001 * daylight if 'pollen_collection' in events else 0
+        growing = not self.starved()
+        self.honey_stores = min(25, max(0, self.honey_stores + honey_gain - honey_loss * minutes))
+        self.pollen_stores = min(5, max(0, self.pollen_stores + pollen_gain - pollen_loss * minutes))
+        if 'spring_buildup' in events and growing:
+            self.bee_population = min(2, self.bee_population + 0.00008 * minutes)  # Growth net of mortality
+        else:
+            self.bee_population = max(0.5, self.bee_population - 0.00002 * minutes)
+        if 'brood_rearing' in events and growing:
+            self.brood_mass = min(1, self.brood_mass + 0.00009 * minutes)
+        if weather_pattern in [WeatherPattern.RAINY, WeatherPattern.STORMY]:
+            self.moisture_content = min(0.5, self.moisture_content + 0.001 * minutes)
+        else:
+            self.moisture_content = max(0, self.moisture_content - 0.0005 * minutes)
+        return (self.base_weight + self.honey_stores + self.pollen_stores + self.bee_population +
+                self.brood_mass + self.moisture_content)
+
+    def get_state(self):
+        return copy_attributes(self)
+
+    def set_state(self, state):
+        restore_attributes(self, state)
+
+def get_daylight(season, season_progress):
+    """Sunrise hour and day length for a point in the season"""
     if season == Season.SUMMER:
-        peak_hour = 14
         day_length = 15  # Longer summer days
     elif season == Season.WINTER:
-        peak_hour = 12
         day_length = 9   # Shorter winter days
     else:
         # Spring and Fall: interpolate between summer and winter
@@ -557,12 +1615,20 @@ def get_time_factor():
             progress_factor = season_progress
         else:  # FALL
             progress_factor = 1 - season_progress
-            
-        peak_hour = 12 + (2 * progress_factor)
         day_length = 9 + (6 * progress_factor)
     
-    # Calculate sunrise and sunset times
+    # Calculate sunrise time
     sunrise = (24 - day_length) / 2
+    return sunrise, day_length
+
+def get_time_factor(now=None):
+    """Calculate time-based factors for daily cycles (0.0 to 1.0)"""
+    current_time = now or clock.now()
+    hour = current_time.hour + current_time.minute / 60.0
+    
+    # Adjust daylight hours based on season
+    sunrise, day_length = get_daylight(Season.get_current_season(current_time),
+                                       Season.get_season_progress(current_time))
     sunset = sunrise + day_length
     
     # Calculate time factor
@@ -573,10 +1639,11 @@ def get_time_factor():
         day_progress = (hour - sunrise) / day_length
         return math.sin(day_progress * math.pi) * 0.5 + 0.5
 
-def get_seasonal_base_values():
+def get_seasonal_base_values(now=None):
     """Get base values adjusted for current season in Bulgaria"""
-    season = Season.get_current_season()
-    season_progress = Season.get_season_progress()
+    now = now or clock.now()
+    season = Season.get_current_season(now)
+    season_progress = Season.get_season_progress(now)
     
     if season == Season.WINTER:
         base_temp = 0 + (5 * season_progress)  # Gradually warming
@@ -596,15 +1663,91 @@ def get_seasonal_base_values():
         'humidity': humidity
     }
 
-def simulate_sensors(hive_event):
-    """Simulate beehive sensor readings"""
-    time_factor = get_time_factor()
+class AnnualTables:
+    """Season, seasonal base values and time factor precomputed for every day and minute of a year"""
+
+    def __init__(self, year):
+        self.year = year
+        first_day = datetime(year, 1, 1)
+        self.first_ordinal = first_day.toordinal()
+        days = datetime(year + 1, 1, 1).toordinal() - self.first_ordinal
+        
+        # Per-day values only depend on the date
+        self.seasons = []
+        self.season_progress = []
+        self.base_temps = []
+        self.base_humidities = []
+        sunrises = np.empty(days)
+        day_lengths = np.empty(days)
+        for day in range(days):
+            date = first_day + timedelta(days=day)
+            season = Season.get_current_season(date)
+            progress = Season.get_season_progress(date)
+            base = get_seasonal_base_values(date)
+            self.seasons.append(season)
+            self.season_progress.append(progress)
+            self.base_temps.append(base['temp'])
+            self.base_humidities.append(base['humidity'])
+            sunrises[day], day_lengths[day] = get_daylight(season, progress)
+        
+        # Per-minute time factor, same formula as get_time_factor()
+        minutes = np.arange(1440)
+        hours = (minutes // 60) + (minutes % 60) / 60.0
+        sunrises = sunrises[:, None]
+        day_lengths = day_lengths[:, None]
+        daylight = (hours >= sunrises) & (hours <= sunrises + day_lengths)
+        time_factors = np.where(daylight, np.sin((hours - sunrises) / day_lengths * math.pi) * 0.5 + 0.5, 0)
+        self.time_factors = time_factors.ravel()
+        self.time_factors.flags.writeable = False  # Shared by every hive
+        # Running sum, so the daylight of any span of minutes is one subtraction
+        self.cumulative_time_factors = np.concatenate(([0], np.cumsum(self.time_factors)))
+        self.cumulative_time_factors.flags.writeable = False
+        # First minute of each day with a time factor above 0, and the first one after it with 0 again
+        self.sunrise_minutes = daylight.argmax(axis=1).tolist()
+        self.sunset_minutes = (1440 - daylight[:, ::-1].argmax(axis=1)).tolist()
+
+    def minute_of_year(self, now):
+        return (now.toordinal() - self.first_ordinal) * 1440 + now.hour * 60 + now.minute
+
+# AnnualTables by year, built on first use
+annual_tables = {}
+
+def get_annual_tables(year):
+    """Shared, read-only AnnualTables for a year"""
+    if year not in annual_tables:
+        annual_tables[year] = AnnualTables(year)
+    return annual_tables[year]
+
+class TickContext:
+    """Simulated time and the values derived from it, built once per tick and shared by all consumers"""
+
+    def __init__(self, now=None):
+        self.now = now or clock.now()
+        tables = get_annual_tables(self.now.year)
+        day = self.now.toordinal() - tables.first_ordinal
+        self.hour = self.now.hour
+        self.season = tables.seasons[day]
+        self.season_progress = tables.season_progress[day]
+        self.base_temp = tables.base_temps[day]
+        self.base_humidity = tables.base_humidities[day]
+        self.time_factor = float(tables.time_factors[day * 1440 + self.hour * 60 + self.now.minute])
+
+def simulate_sensors(hive_event, hive_weather=None, weight_model=None, ctx=None, rng=None):
+    """Simulate beehive sensor readings (defaults to the module-level weather and hive weight)"""
+    rng = rng or random
+    hive_weather = hive_weather or weather
+    weight_model = weight_model or hive_weight
+    ctx = ctx or TickContext()
+    time_factor = ctx.time_factor
     event_effects = hive_event.get_event_effects()
-    seasonal_base = get_seasonal_base_values()
     
     # Update weather conditions
-    weather.update_targets(seasonal_base['temp'], seasonal_base['humidity'], time_factor)
-    current_weather = weather.get_current_conditions()
+    if metrics:
+        started = time.perf_counter()
+    hive_weather.update_targets(ctx.base_temp, ctx.base_humidity, time_factor, ctx)
+    current_weather = hive_weather.get_current_conditions()
+    if metrics:
+        metrics.stage('weather', started)
     
     # Get weather details
     outside_temp = current_weather['temperature']
@@ -623,20 +1766,24 @@ def simulate_sensors(hive_event):
     inside_temp = (base_inside_temp + 
                   event_effects['inside_temp_mod'] + 
                   (0.1 * trends['wind_speed'] if weather_pattern in [WeatherPattern.STORMY, WeatherPattern.RAINY] else 0) +
-                  random.uniform(-0.3, 0.3))
+                  rng.uniform(-0.3, 0.3))
     
     inside_humidity = (60 + 
                       event_effects['inside_humidity_mod'] +
                       (5 if weather_pattern in [WeatherPattern.RAINY, WeatherPattern.STORMY] else 0) +
-                      random.uniform(-0.5, 0.5))
+                      rng.uniform(-0.5, 0.5))
     
     # Calculate weight using the new weight management system
-    weight = hive_weight.update_weight(
+    if metrics:
+        started = time.perf_counter()
+    weight = weight_model.update_weight(
         hive_event.current_events,
         weather_pattern,
         time_factor,
-        Season.get_current_season()
+        ctx.season
     )
+    if metrics:
+        metrics.stage('weight', started)
     
     # Ensure values stay within realistic bounds
     inside_humidity = max(40, min(90, inside_humidity))
@@ -651,36 +1798,3185 @@ def simulate_sensors(hive_event):
         'field5': round(weight, 2)
     }
 
-def send_to_thingspeak(data):
-    """Send data to ThingSpeak"""
-    params = {
-        'api_key': API_KEY,
-        **data
-    }
-    try:
-        response = requests.get(BASE_URL, params=params)
-        if response.status_code == 200:
-            print(f"Data sent successfully: {data}")
+Reading = namedtuple('Reading', ['hive_id', 'created_at', 'data'])
+
+class Hive:
+    """One simulated hive with its own events and weight, and its own or its region's weather"""
+
+    def __init__(self, hive_id, channel_id=CHANNEL_ID, api_key=API_KEY, seed=None, weather=None, start=None):
+        # start is the simulated time of the first tick, needed when it is not the global clock's time
+        self.hive_id = hive_id
+        self.channel_id = channel_id
+        self.api_key = api_key
+        self.streams = RandomStreams(seed, hive_id)
+        self.events = HiveEvent(rng=self.streams.events, hive_id=hive_id, start=start)
+        self.weight = HiveWeight()
+        self.weather = weather or WeatherConditions(self.streams.weather, self.streams.weather_pattern,
+                                                    self.streams.weather_trend, start)
+
+    def tick(self, ctx=None):
+        """Advance events by one minute and return the new reading"""
+        ctx = ctx or TickContext()
+        if metrics:
+            started = time.perf_counter()
+        self.events.check_for_new_event(ctx)
+        self.events.update(ctx)
+        if metrics:
+            metrics.stage('events', started)
+            metrics.set('beehive_active_events', len(self.events.current_events), hive=self.hive_id)
+        data = simulate_sensors(self.events, self.weather, self.weight, ctx, self.streams.sensors)
+        if metrics:
+            metrics.stage('tick', started)
+            metrics.inc('beehive_ticks_total')
+        return Reading(self.hive_id, ctx.now, data)
+
+    def get_state(self):
+        """Events, weight, weather and random streams, enough to continue exactly where the hive stopped"""
+        return {
+            'events': self.events.get_state(),
+            'weight': self.weight.get_state(),
+            'weather': self.weather.get_state(),
+            'streams': self.streams.get_state()
+        }
+
+    def set_state(self, state, weather=True):
+        # weather=False leaves weather shared with hives restored earlier alone
+        self.events.set_state(state['events'])
+        self.weight.set_state(state['weight'])
+        if weather:
+            self.weather.set_state(state['weather'])
+        self.streams.set_state(state['streams'])
+
+class AdaptiveStepper:
+    """Advances one hive through quiet stretches many minutes at a time, and minute by minute otherwise
+
+    A step skips over minutes in which no event starts or ends and the day does not change, then
+    ticks its last minute as usual. The skipped minutes are advanced in closed form: the weather
+    approaches its targets geometrically between target updates, the stores change at fixed rates
+    per minute and unit of daylight, and the sensor noise stream jumps over the draws those
+    minutes would have taken. The hive therefore follows the same path as with one-minute ticks,
+    up to rounding.
+
+    A step also ends before the noise-free readings of the minutes it skips and of the minute
+    before them spread by more than tolerance, in degrees C, percent and kg alike, so holding each
+    reading until the next one is off by no more than tolerance plus sensor noise.
+    """
+    # Events with weight changes faster than a fixed rate; while one is active the hive ticks every minute
+    MINUTE_EVENTS = frozenset(('swarming', 'honey_harvesting'))
+    # Events with effects that peak halfway through rather than follow their progress linearly,
+    # ticked every minute too unless the tolerance is infinite and only the hive's state matters
+    CURVED_EVENTS = frozenset(('queen_mating', 'ventilation'))
+
+    def __init__(self, hive, tolerance=ADAPTIVE_TOLERANCE, max_step=ADAPTIVE_MAX_STEP):
+        if isinstance(hive.weather, RegionWeather):
+            raise ValueError("Adaptive steps need a hive with its own weather, not a shared region")
+        if tolerance < 0 or max_step < 1:
+            raise ValueError("Tolerance must not be negative and steps must be at least one minute")
+        self.hive = hive
+        self.tolerance = tolerance
+        self.max_step = max_step
+        self.minute_events = AdaptiveStepper.MINUTE_EVENTS
+        if tolerance < math.inf:
+            self.minute_events |= AdaptiveStepper.CURVED_EVENTS
+        self.steps = 0
+        self.minutes = 0
+
+    def quiet_minutes(self, now, limit):
+        """Minutes from now in which nothing but the weather and the stores may change"""
+        events = self.hive.events
+        if events.minutes_to_next_event is None or self.minute_events.intersection(events.current_events):
+            return 0
+        minute_of_day = now.hour * 60 + now.minute
+        if minute_of_day < 60 and any(events.daily_event_checks.values()):
+            return 0  # Daily checks are reset in every minute of this hour
+        # The next event fires and the season changes on ticks, never on skipped minutes
+        minutes = min(limit, events.minutes_to_next_event - 1, 1440 - minute_of_day)
+        for event in events.current_events:
+            minutes = min(minutes, events.event_durations[event] - events.event_times[event] - 1)
+        tables = get_annual_tables(now.year)
+        day = now.toordinal() - tables.first_ordinal
+        sunrise = tables.sunrise_minutes[day]
+        if minute_of_day < sunrise:
+            night = sunrise - minute_of_day
         else:
-            print(f"Failed to send data: {response.status_code}")
-    except Exception as e:
-        print(f"Error sending data: {e}")
+            night = 0 if minute_of_day < tables.sunset_minutes[day] else minutes
+        return min(minutes, self.hive.weight.linear_minutes(events.current_events, tables.seasons[day], night))
 
-def main():
-    print("Starting BeeHive Simulator...")
-    print("Press Ctrl+C to stop")
-    
-    global weather, hive_weight
-    weather = WeatherConditions()
-    hive_weight = HiveWeight()
-    hive_event = HiveEvent()
-    
-    while True:
-        hive_event.check_for_new_event()
-        hive_event.update()
-        data = simulate_sensors(hive_event)
-        send_to_thingspeak(data)
-        time.sleep(60)  # Wait for 1 minute
+    @staticmethod
+    def approach_limit(value, target, remaining, low, high):
+        """Minutes value may approach target, keeping a share remaining of the gap per minute, inside [low, high]"""
+        bound = high if target > high else low if target < low else None
+        if bound is None:
+            return math.inf
+        return math.floor(math.log((target - bound) / (target - value)) / math.log(remaining))
+
+    @staticmethod
+    def linear_limit(value, slope, low, high):
+        """Minutes value may move by slope per minute inside [low, high]"""
+        if slope > 0:
+            return math.floor((high - value) / slope)
+        if slope < 0:
+            return math.floor((low - value) / slope)
+        return math.inf
+
+    def skip(self, now, minutes):
+        """Advance the hive over up to minutes from now without readings, returns the minutes skipped"""
+        if minutes <= 0:
+            return 0
+        hive = self.hive
+        events, weather, weight = hive.events, hive.weather, hive.weight
+        tables = get_annual_tables(now.year)
+        first = tables.minute_of_year(now)
+        day = first // 1440
+        season = tables.seasons[day]
+        start_of_day = day * 1440
+        sunrise, sunset = start_of_day + tables.sunrise_minutes[day], start_of_day + tables.sunset_minutes[day]
+        cumulative = tables.cumulative_time_factors
+        active = events.current_events
+        tolerance = self.tolerance
+        limited = tolerance < math.inf
+        end = first + minutes
+        if limited:
+            # Weight spread, counted from its fastest rate with gains and losses alike
+            end = min(end, first + math.floor(tolerance / weight.max_rate(active, season)))
+            # Inside values move linearly with the progress of the active events
+            effects = events.get_event_effects()
+            effects_after = events.get_event_effects(minutes)
+            temp_mod, humidity_mod = effects['inside_temp_mod'], effects['inside_humidity_mod']
+            temp_slope = (effects_after['inside_temp_mod'] - temp_mod) / minutes
+            humidity_slope = (effects_after['inside_humidity_mod'] - humidity_mod) / minutes
+        
+        # Lowest and highest inside temperature, inside humidity, outside temperature and outside humidity so far
+        lows = highs = None
+        since_update = (now - weather.last_target_update).total_seconds() / 60
+        at = first
+        while at < end:
+            if since_update >= weather.update_interval:
+                ctx = TickContext(now + timedelta(minutes=at - first))
+                weather.update_targets(ctx.base_temp, ctx.base_humidity, ctx.time_factor, ctx)
+                since_update = 0
+            pattern = weather.weather_pattern.current_pattern
+            # Up to the next target update, which may also change the weather pattern, sunrise or sunset
+            n = min(end - at, math.ceil(weather.update_interval - since_update),
+                    (sunrise if at < sunrise else sunset if at < sunset else start_of_day + 1440) - at)
+            if limited:
+                wet = pattern in [WeatherPattern.RAINY, WeatherPattern.STORMY]
+                inside_temp = 35 + temp_mod + (0.1 * weather.weather_trend.wind_speed if wet else 0)
+                inside_humidity = 60 + humidity_mod + (5 if wet else 0)
+                values = (inside_temp, inside_humidity, weather.current_temp, weather.current_humidity)
+                if lows is None:
+                    lows = highs = values
+                else:
+                    lows = tuple(map(min, lows, values))
+                    highs = tuple(map(max, highs, values))
+                if (highs[0] - lows[0] > tolerance or highs[1] - lows[1] > tolerance or
+                        highs[2] - lows[2] > tolerance or highs[3] - lows[3] > tolerance):
+                    break  # A pattern change at this target update alone moves a reading too far
+                remaining = 0.95 if pattern == WeatherPattern.STORMY else 0.98
+                n = min(
+                    n,
+                    AdaptiveStepper.linear_limit(inside_temp, temp_slope, highs[0] - tolerance, lows[0] + tolerance),
+                    AdaptiveStepper.linear_limit(inside_humidity, humidity_slope,
+                                                 highs[1] - tolerance, lows[1] + tolerance),
+                    AdaptiveStepper.approach_limit(weather.current_temp, weather.target_temp, remaining,
+                                                   highs[2] - tolerance, lows[2] + tolerance),
+                    AdaptiveStepper.approach_limit(weather.current_humidity, weather.target_humidity, remaining,
+                                                   highs[3] - tolerance, lows[3] + tolerance)
+                )
+                if n <= 0:
+                    break
+            
+            weather.approach(n)
+            weight.advance(active, pattern, season, n, float(cumulative[at + n] - cumulative[at]))
+            at += n
+            since_update += n
+            if limited:
+                temp_mod += temp_slope * n
+                humidity_mod += humidity_slope * n
+                values = (inside_temp + temp_slope * n, inside_humidity + humidity_slope * n,
+                          weather.current_temp, weather.current_humidity)
+                lows = tuple(map(min, lows, values))
+                highs = tuple(map(max, highs, values))
+        
+        skipped = at - first
+        for event in active:
+            events.event_times[event] += skipped
+        events.minutes_to_next_event -= skipped
+        hive.streams.sensors.skip(2 * skipped)  # Inside temperature and humidity noise
+        return skipped
+
+    def step(self, now, limit=None):
+        """Advance the hive from now, returns the reading of the step's last minute and the minutes advanced"""
+        limit = self.max_step if limit is None else min(self.max_step, limit)
+        skipped = self.skip(now, self.quiet_minutes(now, limit - 1))
+        reading = self.hive.tick(TickContext(now + timedelta(minutes=skipped)))
+        self.steps += 1
+        self.minutes += skipped + 1
+        return reading, skipped + 1
+
+class HiveFleet:
+    """Many hives advanced together, one array row per hive"""
+    EVENT_TYPES = (
+        'swarming', 'nectar_flow', 'queen_mating', 'brood_rearing', 'honey_harvesting',
+        'pollen_collection', 'propolis_collection', 'ventilation', 'robbing',
+        'varroa_infestation', 'nosema', 'winter_cluster', 'spring_buildup'
+    )
+    EVENT_INDEX = {event: i for i, event in enumerate(EVENT_TYPES)}
+    # Events drawn every tick, in the same order as HiveEvent.get_base_probabilities()
+    RANDOM_EVENTS = tuple(HiveEvent.get_base_probabilities(Season.SPRING))
+    DAILY_EVENTS = ('nectar_flow', 'pollen_collection', 'propolis_collection')
+    DURATION_LOW = np.array([HiveEvent.event_duration_ranges[e][0] for e in EVENT_TYPES])
+    DURATION_HIGH = np.array([HiveEvent.event_duration_ranges[e][1] for e in EVENT_TYPES])
+    # CounterRandom slots: one per random event draw, then the rest of the per-tick draws
+    SLOT_SWARMING = len(RANDOM_EVENTS)
+    SLOT_INSIDE_TEMP = SLOT_SWARMING + 1
+    SLOT_INSIDE_HUMIDITY = SLOT_SWARMING + 2
+    SLOT_DURATIONS = SLOT_SWARMING + 3  # One per entry in EVENT_TYPES
+    # Per-hive state arrays
+    EVENT_STATE = ('active', 'event_times', 'event_durations', 'daily_checked')
+    WEIGHT_STATE = ('base_weight', 'honey_stores', 'pollen_stores', 'bee_population', 'brood_mass', 'moisture_content')
+    # Outside temperature and humidity offsets of each entry in WeatherPattern.PATTERNS, rain included
+    PATTERN_NAMES = np.array(WeatherPattern.PATTERNS)
+    PATTERN_WET = np.isin(PATTERN_NAMES, [WeatherPattern.RAINY, WeatherPattern.STORMY])
+    PATTERN_TEMP_MODS = np.array([WeatherPattern.EFFECTS[p]['temp_mod'] for p in WeatherPattern.PATTERNS])
+    PATTERN_HUMIDITY_MODS = np.array([WeatherPattern.EFFECTS[p]['humidity_mod'] for p in WeatherPattern.PATTERNS]) + 20 * PATTERN_WET
+
+    def __init__(self, n_hives, seed=None, hive_ids=None):
+        self.n_hives = n_hives
+        self.hive_ids = np.arange(n_hives) if hive_ids is None else np.asarray(hive_ids)
+        self.random = CounterRandom(seed, self.hive_ids)
+        self.ticks = 0
+        self.last_season = None
+        self.journal_events = True  # Event starts and ends go to the journal; off for what-if branches
+        self.base_probabilities = {
+            season: np.array(list(HiveEvent.get_base_probabilities(season).values()))
+            for season in (Season.WINTER, Season.SPRING, Season.SUMMER, Season.FALL)
+        }
+        
+        # Event state, one column per entry in EVENT_TYPES
+        shape = (n_hives, len(self.EVENT_TYPES))
+        self.active = np.zeros(shape, dtype=bool)
+        self.event_times = np.zeros(shape, dtype=np.int32)
+        self.event_durations = np.ones(shape, dtype=np.int32)
+        self.daily_checked = np.zeros(shape, dtype=bool)
+        
+        # Incompatibility matrix: row = new event, column = blocking active event
+        self.incompatible = np.zeros((len(self.EVENT_TYPES), len(self.EVENT_TYPES)), dtype=bool)
+        for event, blockers in HiveEvent.incompatible_events.items():
+            for blocker in blockers:
+                self.incompatible[self.EVENT_INDEX[event], self.EVENT_INDEX[blocker]] = True
+        
+        # Weight components, same starting values as HiveWeight
+        self.base_weight = np.full(n_hives, 30.0)
+        self.honey_stores = np.full(n_hives, 15.0)
+        self.pollen_stores = np.full(n_hives, 2.0)
+        self.bee_population = np.full(n_hives, 1.0)
+        self.brood_mass = np.full(n_hives, 0.5)
+        self.moisture_content = np.zeros(n_hives)
+        
+        # Optional per-hive index into WeatherPattern.PATTERNS replacing the shared pattern, -1 keeps it
+        self.weather_override = None
+
+    @staticmethod
+    def from_hive(hive, seed=None):
+        """One-row fleet continuing the event and weight state of a Hive"""
+        fleet = HiveFleet(1, hive.streams.seed if seed is None else seed, [hive.hive_id])
+        events = hive.events
+        for event in events.current_events:
+            column = HiveFleet.EVENT_INDEX[event]
+            fleet.active[0, column] = True
+            fleet.event_times[0, column] = events.event_times[event]
+            fleet.event_durations[0, column] = events.event_durations[event]
+        for event, checked in events.daily_event_checks.items():
+            fleet.daily_checked[0, HiveFleet.EVENT_INDEX[event]] = checked
+        fleet.last_season = events.last_season
+        for name in HiveFleet.WEIGHT_STATE:
+            getattr(fleet, name)[0] = getattr(hive.weight, name)
+        return fleet
+
+    def branch(self, n_variants, row=0, common_random=True):
+        """New fleet of n_variants copies of one hive's row
+
+        With common_random every copy draws the same random numbers, so variants only differ
+        where their overrides make them differ.
+        """
+        hive_ids = np.repeat(self.hive_ids[row:row + 1], n_variants) if common_random else np.arange(n_variants)
+        fleet = HiveFleet(n_variants, self.random.seed, hive_ids)
+        for name in HiveFleet.EVENT_STATE + HiveFleet.WEIGHT_STATE:
+            setattr(fleet, name, np.repeat(getattr(self, name)[row:row + 1], n_variants, axis=0))
+        fleet.ticks = self.ticks
+        fleet.last_season = self.last_season
+        fleet.journal_events = False
+        return fleet
+
+    def add_events(self, event, mask=None, now=None):
+        """Start an event at now on the hives selected by a boolean mask (all hives by default)"""
+        column = self.EVENT_INDEX[event]
+        rows = ~self.active[:, column]
+        if mask is not None:
+            rows &= mask
+        rows = np.flatnonzero(rows)
+        self.active[rows, column] = True
+        self.event_times[rows, column] = 0
+        low, high = self.DURATION_LOW[column], self.DURATION_HIGH[column]
+        draws = self.random.random(self.ticks, self.SLOT_DURATIONS + column, rows)
+        self.event_durations[rows, column] = low + (draws * (high - low + 1)).astype(np.int32)
+        if self.journal_events and journal.records_events():
+            now = now or clock.now()
+            for hive_id, duration in zip(self.hive_ids[rows].tolist(), self.event_durations[rows, column].tolist()):
+                journal.event_start(hive_id, event, now, duration)
+        return rows
+
+    def check_seasonal_transition(self, season, now=None):
+        """Trigger seasonal events for every hive when the season changes"""
+        if season == self.last_season:
+            return
+        self.last_season = season
+        if season == Season.SPRING:
+            swarm = self.random.random(self.ticks, self.SLOT_SWARMING) < 0.3  # 30% chance of swarming in spring
+            self.add_events('swarming', swarm, now)
+            self.add_events('spring_buildup', now=now)
+        elif season == Season.WINTER:
+            self.add_events('winter_cluster', now=now)
+
+    def check_for_new_events(self, ctx=None):
+        """Vectorized HiveEvent.check_for_new_event() for the whole fleet"""
+        ctx = ctx or TickContext()
+        self.ticks += 1
+        if ctx.hour == 0:
+            self.daily_checked[:] = False
+        season = ctx.season
+        self.check_seasonal_transition(season, ctx.now)
+        
+        base = self.base_probabilities[season]
+        # Draws for every event possible this season in one batch, the slot of an event is its index
+        slots = np.flatnonzero(base)
+        draws = self.random.random(self.ticks, slots)
+        # Boosts come from the events active before this tick, as in HiveEvent, not from ones started below
+        active = self.active.copy()
+        
+        for k, j in enumerate(slots):
+            event = self.RANDOM_EVENTS[j]
+            column = self.EVENT_INDEX[event]
+            
+            # Same event-dependent multipliers as HiveEvent
+            probability = base[j]
+            for booster, targets in HiveEvent.probability_boosts.items():
+                if event in targets:
+                    probability = probability * np.where(active[:, self.EVENT_INDEX[booster]], targets[event], 1)
+            
+            # Only the few hives that drew a hit need the full checks
+            rows = np.flatnonzero(draws[:, k] < probability)
+            if len(rows) == 0:
+                continue
+            rows = rows[~self.active[rows, column] & ~self.daily_checked[rows, column]]
+            rows = rows[~(self.active[rows] & self.incompatible[column]).any(axis=1)]
+            if len(rows) == 0:
+                continue
+            
+            mask = np.zeros(self.n_hives, dtype=bool)
+            mask[rows] = True
+            self.add_events(event, mask, ctx.now)
+            if event in self.DAILY_EVENTS:
+                self.daily_checked[rows, column] = True
+
+    def update(self, ctx=None):
+        """Advance event timers and end finished events, returns the mask of ended events"""
+        self.event_times += self.active
+        ended = self.active & (self.event_times >= self.event_durations)
+        if self.journal_events and journal.records_events() and ended.any():
+            # Same interval as HiveEvent.update() gives
+            end = ctx.now if ctx else clock.now()
+            for row, column in zip(*np.nonzero(ended)):
+                journal.event_end(self.hive_ids[row].item(), self.EVENT_TYPES[column],
+                                  end - timedelta(minutes=int(self.event_times[row, column]) - 1), end)
+        self.active &= ~ended
+        self.event_times[ended] = 0
+        return ended
+
+    def get_event_effects(self):
+        """Vectorized HiveEvent.get_event_effects(), one value per hive for each modifier"""
+        n = self.n_hives
+        index = self.EVENT_INDEX
+        progress = self.event_times / self.event_durations
+        temp = np.zeros((n, len(self.EVENT_TYPES)))
+        humidity = np.zeros_like(temp)
+        weight = np.zeros_like(temp)
+        
+        # The same effect functions as HiveEvent, given every hive's progress at once
+        for event, effect in HiveEvent.event_effects.items():
+            c = index[event]
+            temp[:, c], humidity[:, c], weight[:, c] = effect(progress[:, c])
+        
+        # Apply synergy effects where both events are active
+        mods = {'inside_temp_mod': temp, 'inside_humidity_mod': humidity, 'weight_mod': weight}
+        for event, partners in HiveEvent.event_synergies.items():
+            for other_event, synergy in partners.items():
+                partner_active = self.active[:, index[other_event]]
+                for mod_type, multiplier in synergy.items():
+                    mods[mod_type][:, index[event]] *= np.where(partner_active, multiplier, 1)
+        
+        return {mod_type: (values * self.active).sum(axis=1) for mod_type, values in mods.items()}
+
+    def update_weight(self, weather_pattern, time_factor, season):
+        """Vectorized HiveWeight.update_weight(), returns total weight per hive"""
+        index = self.EVENT_INDEX
+        active = self.active
+        
+        # Consume stores
+        daily_consumption = np.where(active[:, index['winter_cluster']], HiveWeight.cluster_consumption,
+                                     HiveWeight.consumption_rates[season]) / 1440
+        self.honey_stores = np.maximum(0, self.honey_stores - daily_consumption)
+        
+        # Foraging only during daylight
+        if time_factor > 0:
+            self.honey_stores += 0.002 * time_factor * active[:, index['nectar_flow']]
+            self.pollen_stores += 0.001 * time_factor * active[:, index['pollen_collection']]
+        
+        # Convert food stores to brood mass
+        food_to_brood = 0.0003
+        rearing = (active[:, index['brood_rearing']] &
+                   (self.honey_stores > food_to_brood) & (self.pollen_stores > food_to_brood * 0.5))
+        self.honey_stores -= food_to_brood * rearing
+        self.pollen_stores -= food_to_brood * 0.5 * rearing
+        self.brood_mass += food_to_brood * 0.3 * rearing
+        
+        # Honey harvest leaves 5kg minimum
+        harvesting = active[:, index['honey_harvesting']]
+        self.honey_stores = np.where(harvesting, np.maximum(5, self.honey_stores - 0.05), self.honey_stores)
+        
+        # Swarming halves the bee population
+        swarming = active[:, index['swarming']] & (self.bee_population > 0.5)
+        self.bee_population = np.where(swarming, self.bee_population * 0.5, self.bee_population)
+        
+        # Spring buildup grows the population from stores
+        growing = active[:, index['spring_buildup']] & (self.honey_stores > 0.1) & (self.pollen_stores > 0.05)
+        population_growth = 0.0001 * growing
+        self.bee_population += population_growth
+        self.honey_stores -= population_growth * 2
+        self.pollen_stores -= population_growth
+        
+        # Weather effects, weather_pattern may be one pattern or one per hive
+        wet = np.isin(weather_pattern, [WeatherPattern.RAINY, WeatherPattern.STORMY])
+        self.moisture_content = np.where(
+            wet, np.minimum(0.5, self.moisture_content + 0.001), np.maximum(0, self.moisture_content - 0.0005)
+        )
+        
+        # Natural losses and realistic limits
+        self.bee_population = np.clip(self.bee_population - 0.00002, 0.5, 2)
+        self.pollen_stores = np.clip(self.pollen_stores - 0.00001, 0, 5)
+        self.honey_stores = np.minimum(25, self.honey_stores)
+        self.brood_mass = np.minimum(1, self.brood_mass)
+        
+        return (self.base_weight + self.honey_stores + self.pollen_stores +
+                self.bee_population + self.brood_mass + self.moisture_content)
+
+    def simulate_sensors(self, weather, ctx=None):
+        """Vectorized simulate_sensors() for every hive under one shared sky"""
+        ctx = ctx or TickContext()
+        time_factor = ctx.time_factor
+        event_effects = self.get_event_effects()
+        
+        weather.update_targets(ctx.base_temp, ctx.base_humidity, time_factor, ctx)
+        current_weather = weather.get_current_conditions()
+        weather_pattern = current_weather['pattern']
+        wet = weather_pattern in [WeatherPattern.RAINY, WeatherPattern.STORMY]
+        outside_temp = round(current_weather['temperature'], 2)
+        outside_humidity = round(current_weather['humidity'], 2)
+        
+        if self.weather_override is not None:
+            # Overridden hives swap the shared pattern's offsets (and rain) for their own
+            shared = WeatherPattern.PATTERNS.index(weather_pattern)
+            codes = np.where(self.weather_override >= 0, self.weather_override, shared)
+            weather_pattern = self.PATTERN_NAMES[codes]
+            wet = self.PATTERN_WET[codes]
+            temp_mods = self.PATTERN_TEMP_MODS
+            humidity_mods = self.PATTERN_HUMIDITY_MODS
+            outside_temp = np.round(current_weather['temperature'] + temp_mods[codes] - temp_mods[shared], 2)
+            outside_humidity = np.round(np.clip(current_weather['humidity'] + humidity_mods[codes] - humidity_mods[shared],
+                                                30, 95), 2)
+        
+        inside_temp = (35 +
+                       event_effects['inside_temp_mod'] +
+                       0.1 * current_weather['trends']['wind_speed'] * wet +
+                       self.random.random(self.ticks, self.SLOT_INSIDE_TEMP) * 0.6 - 0.3)
+        inside_humidity = (60 +
+                           event_effects['inside_humidity_mod'] +
+                           5 * wet +
+                           self.random.random(self.ticks, self.SLOT_INSIDE_HUMIDITY) - 0.5)
+        weight = self.update_weight(weather_pattern, time_factor, ctx.season)
+        
+        return {
+            'field1': np.round(np.clip(inside_temp, 25, 40), 2),
+            'field2': np.round(np.clip(inside_humidity, 40, 90), 2),
+            'field3': outside_temp,
+            'field4': outside_humidity,
+            'field5': np.round(np.clip(weight, 20, 50), 2)
+        }
+
+    def event_masks(self):
+        """Active events of every hive as EVENT_REGISTRY bitmasks"""
+        bits = np.array([EVENT_REGISTRY.bits[event] for event in HiveFleet.EVENT_TYPES], dtype=np.uint32)
+        return (self.active * bits).sum(axis=1, dtype=np.uint32)
+
+    def get_state(self):
+        """Copies of the state arrays; the random numbers only depend on the seed and the tick count"""
+        state = copy_attributes(self, skip=('random', 'base_probabilities', 'incompatible'))
+        state['seed'] = self.random.seed
+        return state
+
+    def set_state(self, state):
+        state = dict(state)
+        seed = state.pop('seed')
+        restore_attributes(self, state)
+        if seed != self.random.seed or len(self.random.keys) != len(self.hive_ids):
+            self.random = CounterRandom(seed, self.hive_ids)
+
+    def step(self, weather, ctx=None):
+        """Advance every hive by one tick, same order as the main loop"""
+        ctx = ctx or TickContext()
+        self.check_for_new_events(ctx)
+        self.update(ctx)
+        return self.simulate_sensors(weather, ctx)
+
+# One what-if variant: events forced as (when, event) and weather forced as (start, end, pattern);
+# when=None starts the event at the first step
+Variant = namedtuple('Variant', ['name', 'events', 'weather'], defaults=((), ()))
+
+class ScenarioBranches:
+    """What-if variants forked from one starting state and advanced together as the rows of a HiveFleet"""
+
+    def __init__(self, base, variants, weather=None, start=None, row=0, common_random=True):
+        self.variants = list(variants)
+        self.names = [variant.name for variant in self.variants]
+        if isinstance(base, Hive):
+            # Continue the hive's own sky from its current random stream positions
+            streams = RandomStreams(base.streams.seed, base.hive_id)
+            streams.set_state(base.streams.get_state())
+            weather = weather or base.weather
+            base = HiveFleet.from_hive(base)
+        else:
+            if weather is None:
+                raise ValueError("Branching a HiveFleet needs the WeatherConditions it runs under")
+            streams = RandomStreams(base.random.seed, 'scenarios')
+        if isinstance(weather, RegionWeather):
+            weather = weather.field.sky  # Variants branch off the shared sky
+        self.fleet = base.branch(len(self.variants), row, common_random)
+        self.weather = WeatherConditions(streams.weather, streams.weather_pattern, streams.weather_trend)
+        self.weather.set_state(weather.get_state())
+        self.now = start or clock.now()
+        
+        # Forced events in time order as (when, variant, event)
+        self.pending_events = sorted(
+            ((when or datetime.min, i, event) for i, variant in enumerate(self.variants) for when, event in variant.events),
+            key=lambda item: (item[0], item[1])
+        )
+        self.weather_windows = [(begin, end, i, WeatherPattern.PATTERNS.index(pattern))
+                                for i, variant in enumerate(self.variants) for begin, end, pattern in variant.weather]
+
+    def step(self):
+        """Apply due overrides and advance every variant by one minute, returns HiveFleet.step() output"""
+        ctx = TickContext(self.now)
+        n = len(self.variants)
+        while self.pending_events and self.pending_events[0][0] <= self.now:
+            _, i, event = self.pending_events.pop(0)
+            mask = np.zeros(n, dtype=bool)
+            mask[i] = True
+            self.fleet.add_events(event, mask)
+        override = None
+        for begin, end, i, code in self.weather_windows:
+            if begin <= self.now < end:
+                if override is None:
+                    override = np.full(n, -1, dtype=np.int8)
+                override[i] = code
+        self.fleet.weather_override = override
+        readings = self.fleet.step(self.weather, ctx)
+        self.now += timedelta(minutes=1)
+        return readings
+
+    def run(self, steps):
+        """Advance steps minutes, returns each field as a float32 array of (variants, steps)"""
+        series = {field: np.empty((len(self.variants), steps), dtype=np.float32) for field in SeriesStore.FIELDS}
+        for t in range(steps):
+            readings = self.step()
+            for field, values in readings.items():
+                series[field][:, t] = values
+        return series
+
+# Outcome of one Monte Carlo run, sent back from worker processes as a plain tuple
+RunSummary = namedtuple('RunSummary', ['run', 'honey_end_of_summer', 'swarms', 'winter_cluster_minutes', 'final_weight'])
+
+def simulate_runs(first_run, count, steps, start, seed, adaptive=False):
+    """Simulate runs first_run..first_run+count-1 side by side and return one RunSummary row per run"""
+    if adaptive:
+        return [simulate_adaptive_run(run, steps, start, seed) for run in range(first_run, first_run + count)]
+    hives = [Hive(run, seed=seed, start=start) for run in range(first_run, first_run + count)]
+    honey = [math.nan] * count
+    swarms = [0] * count
+    cluster_minutes = [0] * count
+    readings = [None] * count
+    now = start
+    step = timedelta(minutes=1)
+    # Runs share one TickContext per tick; each hive still draws from its own streams,
+    # so a run's outcome does not depend on how the runs were chunked
+    for _ in range(steps):
+        ctx = TickContext(now)
+        summer = ctx.season == Season.SUMMER
+        for i, hive in enumerate(hives):
+            readings[i] = hive.tick(ctx)
+            events = hive.events
+            if summer:
+                honey[i] = hive.weight.honey_stores  # Last summer value wins
+            if events.event_times.get('swarming') == 1:  # First minute of a swarm
+                swarms[i] += 1
+            if 'winter_cluster' in events.event_times:
+                cluster_minutes[i] += 1
+        now += step
+    return [(first_run + i, honey[i], swarms[i], cluster_minutes[i],
+             readings[i].data['field5'] if readings[i] else math.nan) for i in range(count)]
+
+def simulate_adaptive_run(run, steps, start, seed):
+    """One run of simulate_runs() in AdaptiveStepper steps
+
+    A run only keeps the hive's state, which the stepper advances exactly, so the readings need no
+    tolerance and the steps are as long as the events allow.
+    """
+    hive = Hive(run, seed=seed, start=start)
+    stepper = AdaptiveStepper(hive, tolerance=math.inf)
+    honey = math.nan
+    swarms = 0
+    cluster_minutes = 0
+    reading = None
+    now = start
+    elapsed = 0
+    while elapsed < steps:
+        clustered = 'winter_cluster' in hive.events.event_times  # Events never start or end in skipped minutes
+        reading, minutes = stepper.step(now, steps - elapsed)
+        events = hive.events
+        if Season.get_current_season(reading.created_at) == Season.SUMMER:
+            honey = hive.weight.honey_stores  # Last summer step wins
+        if events.event_times.get('swarming') == 1:  # Swarms are ticked minute by minute
+            swarms += 1
+        cluster_minutes += (minutes - 1 if clustered else 0) + ('winter_cluster' in events.event_times)
+        now += timedelta(minutes=minutes)
+        elapsed += minutes
+    return run, honey, swarms, cluster_minutes, reading.data['field5'] if reading else math.nan
+
+def summarize_runs(records, percentiles=MONTE_CARLO_PERCENTILES):
+    """Mean and percentiles of every RunSummary metric, skipping runs where it is undefined"""
+    summary = {}
+    for field in RunSummary._fields[1:]:
+        values = np.array([getattr(record, field) for record in records], dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            summary[field] = None
+            continue
+        summary[field] = {'runs': len(values), 'mean': float(values.mean())}
+        for p, value in zip(percentiles, np.percentile(values, percentiles)):
+            summary[field][f'p{p}'] = float(value)
+    return summary
+
+class MonteCarloRunner:
+    """Many independent single-hive runs spread over a process pool in chunks"""
+
+    def __init__(self, runs, steps=MONTE_CARLO_STEPS, start=None, seed=None, processes=None, chunk_size=None,
+                 adaptive=False):
+        if runs <= 0:
+            raise ValueError("Number of runs must be positive")
+        self.runs = runs
+        self.steps = steps
+        self.adaptive = adaptive
+        self.start = start or datetime(datetime.now().year, 1, 1)
+        # One seed for every worker, so runs are keyed by (seed, run) and can be repeated
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.processes = processes or os.cpu_count() or 1
+        # About four chunks per process keeps every core busy until the end
+        self.chunk_size = chunk_size or max(1, min(MONTE_CARLO_MAX_CHUNK, -(-runs // (self.processes * 4))))
+
+    def chunks(self):
+        for first_run in range(0, self.runs, self.chunk_size):
+            yield first_run, min(self.chunk_size, self.runs - first_run)
+
+    def results(self):
+        """Yield RunSummary records as chunks finish, in completion order"""
+        if self.processes == 1:
+            for first_run, count in self.chunks():
+                yield from map(RunSummary._make, simulate_runs(first_run, count, self.steps, self.start, self.seed,
+                                                               self.adaptive))
+            return
+        with ProcessPoolExecutor(self.processes) as pool:
+            futures = [pool.submit(simulate_runs, first_run, count, self.steps, self.start, self.seed, self.adaptive)
+                       for first_run, count in self.chunks()]
+            for future in as_completed(futures):
+                yield from map(RunSummary._make, future.result())
+
+    def run(self):
+        """All RunSummary records in run order and their summary statistics"""
+        started = time.monotonic()
+        records = sorted(self.results())
+        elapsed = time.monotonic() - started
+        print(f"Simulated {self.runs} runs of {self.steps} minutes in {elapsed:.1f}s "
+              f"on {self.processes} processes (seed {self.seed})")
+        return records, summarize_runs(records)
+
+class TokenBucket:
+    """Allows rate requests per second on average, and up to burst at once after being idle"""
+
+    def __init__(self, rate, burst=CHANNEL_BURST):
+        if rate <= 0 or burst < 1:
+            raise ValueError("Token bucket needs a positive rate and a burst of at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a request is allowed, 0 when one is allowed now"""
+        self.refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Spend one request; tokens may go negative, later requests then wait longer"""
+        self.refill()
+        self.tokens -= 1
+
+    def settle(self):
+        """Count the interval from now instead of from when the last request was sent
+
+        Called once a response arrives: a request slowed down on its way, e.g. by opening the
+        connection, would otherwise leave the next one arriving too soon after it.
+        """
+        self.updated = time.monotonic()
+
+    def hold(self, seconds):
+        """Allow nothing for the next seconds, after the server asked us to slow down"""
+        self.refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+Channel = namedtuple('Channel', ['channel_id', 'api_key'])
+
+class ChannelRegistry:
+    """ThingSpeak channel and write key of every hive, with a rate limiter per channel and per account"""
+
+    def __init__(self, channels=(), default=None, interval=CHANNEL_MIN_INTERVAL, burst=CHANNEL_BURST,
+                 account_rate=None, account_burst=CHANNEL_BURST):
+        self.default = default or Channel(CHANNEL_ID, API_KEY)
+        self.interval = interval
+        self.burst = burst
+        self.by_hive = {}
+        self.shared = []  # Channels without a hive list, hives not listed anywhere are spread over them
+        self.buckets = {}
+        for entry in channels:
+            channel = Channel(str(entry['channel_id']), entry['api_key'])
+            if 'hives' in entry:
+                for hive_id in entry['hives']:
+                    self.by_hive[hive_id] = channel
+            else:
+                self.shared.append(channel)
+            self.buckets[channel] = TokenBucket(1 / entry.get('interval', interval), entry.get('burst', burst))
+        self.account = TokenBucket(account_rate, account_burst) if account_rate else None
+
+    @staticmethod
+    def load(path, interval=CHANNEL_MIN_INTERVAL):
+        """Registry from a JSON file with a "channels" list and optional default and account limits"""
+        with open(path) as f:
+            config = json.load(f)
+        return ChannelRegistry(config.get('channels', []), interval=config.get('interval', interval),
+                               burst=config.get('burst', CHANNEL_BURST), account_rate=config.get('account_rate'),
+                               account_burst=config.get('account_burst', CHANNEL_BURST))
+
+    def channel(self, hive_id):
+        """Channel a hive reports to"""
+        if hive_id in self.by_hive:
+            return self.by_hive[hive_id]
+        if self.shared:
+            return self.shared[hive_id % len(self.shared)]
+        return self.default
+
+    def bucket(self, channel):
+        """Rate limiter of a channel, channels not in the registry get the default limit"""
+        bucket = self.buckets.get(channel)
+        if bucket is None:
+            bucket = self.buckets[channel] = TokenBucket(1 / self.interval, self.burst)
+        return bucket
+
+    def delay(self, channel):
+        """Seconds until both the channel and the account allow a request"""
+        delay = self.bucket(channel).delay()
+        if self.account:
+            delay = max(delay, self.account.delay())
+        return delay
+
+    def take(self, channel):
+        self.bucket(channel).take()
+        if self.account:
+            self.account.take()
+
+    def hold(self, channel, seconds):
+        self.bucket(channel).hold(seconds)
+
+    async def ready(self, channel):
+        """Sleep until the channel and the account allow a request"""
+        while True:
+            delay = self.delay(channel)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def acquire(self, channel):
+        """Wait for a request and spend it"""
+        await self.ready(channel)
+        self.take(channel)
+
+    @staticmethod
+    def retry_after(headers, default):
+        """Seconds from a Retry-After header given in seconds, or default"""
+        try:
+            return max(0, float(headers.get('retry-after', default)))
+        except ValueError:
+            return default
+
+def send_to_thingspeak(data, api_key=API_KEY):
+    """Send data to ThingSpeak"""
+    params = {
+        'api_key': api_key,
+        **data
+    }
+    started = time.perf_counter()
+    try:
+        response = requests.get(BASE_URL, params=params, timeout=UPLOAD_TIMEOUT)
+        journal.upload(response.status_code, 1, clock.now())
+    except Exception as e:
+        journal.upload(0, 1, clock.now(), e)
+        response = None
+    if metrics:
+        metrics.stage('upload', started)
+        metrics.inc('beehive_uploads_total', result='success' if response is not None and response.status_code == 200 else 'failure')
+
+class Outbox:
+    """Append-only, segmented on-disk spool of readings that have not been delivered yet"""
+    CURSOR_FILE = 'cursor'
+
+    def __init__(self, path=OUTBOX_DIR, segment_records=OUTBOX_SEGMENT_RECORDS,
+                 sync_every=OUTBOX_SYNC_EVERY, sync_interval=OUTBOX_SYNC_INTERVAL):
+        self.path = path
+        self.segment_records = segment_records
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        os.makedirs(path, exist_ok=True)
+        
+        # Every record below the cursor has been delivered
+        self.cursor = 0
+        cursor_path = os.path.join(path, Outbox.CURSOR_FILE)
+        if os.path.exists(cursor_path):
+            with open(cursor_path) as f:
+                self.cursor = int(f.read().strip() or 0)
+        self.acked = set()  # Delivered records above the cursor
+        
+        # Segments are named after their first sequence number
+        self.segments = sorted(int(name[:-4]) for name in os.listdir(path) if name.endswith('.seg'))
+        self.next_seq = self.cursor
+        if self.segments:
+            last = None
+            for last in self.read_segment(self.segments[-1]):
+                pass
+            self.next_seq = max(self.cursor, last[0] + 1 if last else self.segments[-1])
+        
+        # Never append to a segment left by an earlier run, its tail may be torn
+        self.file = None
+        self.segment_count = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def segment_path(self, first_seq):
+        return os.path.join(self.path, f'{first_seq:012d}.seg')
+
+    def read_segment(self, first_seq):
+        """Yield (seq, reading) records of one segment, skipping a torn last line"""
+        with open(self.segment_path(first_seq)) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                yield record['seq'], Reading(record['hive_id'], datetime.fromisoformat(record['created_at']),
+                                             record['data'])
+
+    def append(self, reading):
+        """Spool one reading, returns its sequence number"""
+        if self.file is None or self.segment_count >= self.segment_records:
+            self.roll()
+        seq = self.next_seq
+        self.next_seq += 1
+        self.file.write(json.dumps({'seq': seq, 'hive_id': reading.hive_id,
+                                    'created_at': reading.created_at.isoformat(),
+                                    'data': reading.data}) + '\n')
+        self.segment_count += 1
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+        return seq
+
+    def roll(self):
+        """Seal the current segment and start a new one"""
+        if self.file:
+            self.sync()
+            self.file.close()
+        self.segments.append(self.next_seq)
+        self.file = open(self.segment_path(self.next_seq), 'a', buffering=1 << 16)
+        self.segment_count = 0
+
+    def sync(self):
+        """Make appended records and the cursor durable, then drop delivered segments"""
+        if self.file and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.compact()
+
+    def ack(self, seqs):
+        """Mark records as delivered and advance the cursor past every contiguous delivered record"""
+        self.acked.update(seqs)
+        while self.cursor in self.acked:
+            self.acked.remove(self.cursor)
+            self.cursor += 1
+
+    def compact(self):
+        """Persist the cursor and delete sealed segments that are fully delivered"""
+        cursor_path = os.path.join(self.path, Outbox.CURSOR_FILE)
+        with open(cursor_path + '.tmp', 'w') as f:
+            f.write(str(self.cursor))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(cursor_path + '.tmp', cursor_path)
+        
+        # A segment ends where the next one starts, a sealed last segment at next_seq; the open one is never removed
+        ends = self.segments[1:] + ([] if self.file else [self.next_seq])
+        for end in ends:
+            if end > self.cursor:
+                break
+            os.remove(self.segment_path(self.segments.pop(0)))
+
+    def pending(self, skip=()):
+        """Yield undelivered (seq, reading) records in order"""
+        if self.file:
+            self.file.flush()
+        for first_seq in list(self.segments):
+            if not os.path.exists(self.segment_path(first_seq)):
+                continue  # Compacted while iterating
+            for seq, reading in self.read_segment(first_seq):
+                if seq >= self.cursor and seq not in self.acked and seq not in skip:
+                    yield seq, reading
+
+    def pending_count(self):
+        return self.next_seq - self.cursor - len(self.acked)
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+        else:
+            self.compact()
+
+class SeriesStore:
+    """Sensor readings and active events stored column by column, one memory-mappable .npy file per column per day"""
+    COLUMNS = {
+        'field1': np.float32,  # Inside temperature
+        'field2': np.float32,  # Inside humidity
+        'field3': np.float32,  # Outside temperature
+        'field4': np.float32,  # Outside humidity
+        'field5': np.float32,  # Weight
+        'events': np.uint32    # Active events as an EVENT_REGISTRY bitmask
+    }
+    FIELDS = ('field1', 'field2', 'field3', 'field4', 'field5')
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, path, hive_ids=None):
+        self.path = path
+        index_path = os.path.join(path, SeriesStore.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            if hive_ids is not None and list(hive_ids) != index['hive_ids']:
+                raise ValueError(f"Store {path} was created for different hives")
+            if index['events'] != list(EVENT_REGISTRY.events):
+                raise ValueError(f"Store {path} was written with different event types")
+            self.hive_ids = index['hive_ids']
+            self.days = index['days']  # Day -> minutes written, counted from midnight
+        elif hive_ids is None:
+            raise FileNotFoundError(f"No series store at {path}")
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.hive_ids = list(hive_ids)
+            self.days = {}
+        # Every day file has one row per hive and one column per minute
+        self.rows = {hive_id: row for row, hive_id in enumerate(self.hive_ids)}
+        self.open_days = {}  # Day -> column memmaps being written
+        self.last_date = None
+        self.last_day = None
+
+    def write_index(self):
+        index_path = os.path.join(self.path, SeriesStore.INDEX_FILE)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump({'hive_ids': self.hive_ids, 'events': list(EVENT_REGISTRY.events), 'days': self.days}, f)
+        os.replace(index_path + '.tmp', index_path)
+
+    def column_path(self, day, column):
+        return os.path.join(self.path, day, f'{column}.npy')
+
+    def day_columns(self, date):
+        """Column memmaps of a day, created on first write"""
+        if date == self.last_date:
+            return self.open_days[self.last_day]
+        day = date.isoformat()
+        if day not in self.open_days:
+            while len(self.open_days) >= STORE_OPEN_DAYS:
+                self.close_day(min(self.open_days))
+            os.makedirs(os.path.join(self.path, day), exist_ok=True)
+            columns = {}
+            for column, dtype in SeriesStore.COLUMNS.items():
+                column_path = self.column_path(day, column)
+                if os.path.exists(column_path):
+                    columns[column] = np.load(column_path, mmap_mode='r+')
+                    continue
+                columns[column] = np.lib.format.open_memmap(column_path, 'w+', dtype, (len(self.hive_ids), 1440))
+                if column != 'events':
+                    columns[column][:] = np.nan  # Minutes never written read back as NaN
+            self.open_days[day] = columns
+            self.days.setdefault(day, 0)
+            self.write_index()
+        self.last_date = date
+        self.last_day = day
+        return self.open_days[day]
+
+    def append(self, reading, events_mask=0):
+        """Store one Reading and the bitmask of its hive's active events"""
+        now = reading.created_at
+        columns = self.day_columns(now.date())
+        row = self.rows[reading.hive_id]
+        minute = now.hour * 60 + now.minute
+        for field in SeriesStore.FIELDS:
+            columns[field][row, minute] = reading.data[field]
+        columns['events'][row, minute] = events_mask
+        if minute >= self.days[self.last_day]:
+            self.days[self.last_day] = minute + 1
+
+    def append_fleet(self, now, readings, events_masks=None):
+        """Store one tick of HiveFleet.step() output, rows in the store's hive order"""
+        columns = self.day_columns(now.date())
+        minute = now.hour * 60 + now.minute
+        for field in SeriesStore.FIELDS:
+            columns[field][:, minute] = readings[field]
+        columns['events'][:, minute] = 0 if events_masks is None else events_masks
+        if minute >= self.days[self.last_day]:
+            self.days[self.last_day] = minute + 1
+
+    def close_day(self, day):
+        for column in self.open_days.pop(day).values():
+            column.flush()
+        if day == self.last_day:
+            self.last_date = self.last_day = None
+        self.write_index()
+
+    def flush(self):
+        for columns in self.open_days.values():
+            for column in columns.values():
+                column.flush()
+        self.write_index()
+
+    def close(self):
+        for day in list(self.open_days):
+            self.close_day(day)
+
+    def read(self, column, start, end, hive_ids=None):
+        """Values of a column from start up to end as an array of (hives, minutes), memory-mapped day by day"""
+        rows = slice(None) if hive_ids is None else [self.rows[hive_id] for hive_id in hive_ids]
+        n_rows = len(self.hive_ids) if hive_ids is None else len(rows)
+        dtype = SeriesStore.COLUMNS[column]
+        fill = 0 if column == 'events' else np.nan
+        parts = []
+        date = start.date()
+        first = start.hour * 60 + start.minute
+        while datetime.combine(date, datetime.min.time()) < end:
+            midnight = datetime.combine(date + timedelta(days=1), datetime.min.time())
+            last = 1440 if end >= midnight else end.hour * 60 + end.minute
+            day = date.isoformat()
+            if day in self.days and os.path.exists(self.column_path(day, column)):
+                parts.append(np.load(self.column_path(day, column), mmap_mode='r')[rows, first:last])
+            else:
+                parts.append(np.full((n_rows, last - first), fill, dtype=dtype))
+            date += timedelta(days=1)
+            first = 0
+        if not parts:
+            return np.empty((n_rows, 0), dtype=dtype)
+        if len(parts) == 1:
+            return parts[0]  # Still memory-mapped when the range lies within one day
+        return np.concatenate(parts, axis=1)
+
+    def read_hive(self, hive_id, start, end):
+        """Every column of one hive from start up to end, keyed by column name"""
+        return {column: self.read(column, start, end, [hive_id])[0] for column in SeriesStore.COLUMNS}
+
+    def transitions(self, hive_id, start, end):
+        """(time, event, started) for every event that started or ended between start and end"""
+        masks = self.read('events', start - timedelta(minutes=1), end, [hive_id])[0].astype(np.int64)
+        changes = []
+        for i in np.flatnonzero(masks[1:] != masks[:-1]):
+            now = start + timedelta(minutes=int(i))
+            before, after = masks[i], masks[i + 1]
+            for event, bit in EVENT_REGISTRY.bits.items():
+                if (before ^ after) & bit:
+                    changes.append((now, event, bool(after & bit)))
+        return changes
+
+# One buffered batch in columns: times as (time, count) runs in row order, hive ids, and values with one column per field
+SinkBatch = namedtuple('SinkBatch', ['times', 'hive_ids', 'values'])
+
+class Sink:
+    """Buffered output of readings; subclasses format and write a whole batch at once"""
+    FIELDS = SeriesStore.FIELDS
+
+    def __init__(self, batch_size=SINK_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.rows = []     # Readings not turned into a batch yet
+        self.batches = []  # Batches from write_fleet()
+        self.buffered = 0
+        self.written_count = 0
+
+    @staticmethod
+    def from_spec(spec):
+        """Sink from a KIND:TARGET spec: ndjson:PATH, csv:PATH, line:PATH, unix:PATH, tcp:HOST:PORT or udp:HOST:PORT"""
+        kind, _, target = spec.partition(':')
+        if kind in ('tcp', 'udp'):
+            host, _, port = target.rpartition(':')
+            address = (host or '127.0.0.1', int(port))
+        kinds = {
+            'ndjson': lambda: NDJSONSink(target),
+            'csv': lambda: CSVSink(target),
+            'line': lambda: LineProtocolSink(target),
+            'unix': lambda: SocketSink(target),
+            'tcp': lambda: SocketSink(address),
+            'udp': lambda: UDPSink(address)
+        }
+        if kind not in kinds or not target:
+            raise ValueError(f"Unknown sink: {spec}")
+        return kinds[kind]()
+
+    def write(self, reading):
+        self.rows.append(reading)
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def write_fleet(self, now, hive_ids, readings):
+        """Buffer one tick of HiveFleet.step() output without going through Reading tuples"""
+        values = np.empty((len(hive_ids), len(Sink.FIELDS)))
+        for i, field in enumerate(Sink.FIELDS):
+            values[:, i] = readings[field]  # Shared weather columns are scalars
+        self.batches.append(SinkBatch([(now, len(hive_ids))], np.asarray(hive_ids), values))
+        self.buffered += len(hive_ids)
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def take_batch(self):
+        """Everything buffered as one SinkBatch"""
+        batches = self.batches
+        if self.rows:
+            rows = self.rows
+            get_values = itemgetter(*Sink.FIELDS)
+            batches.append(SinkBatch(
+                [(created_at, sum(1 for _ in run)) for created_at, run in groupby(r.created_at for r in rows)],
+                np.array([r.hive_id for r in rows]),
+                np.array([get_values(r.data) for r in rows], dtype=float).reshape(len(rows), len(Sink.FIELDS))
+            ))
+        self.rows = []
+        self.batches = []
+        self.buffered = 0
+        if len(batches) == 1:
+            return batches[0]
+        return SinkBatch([run for batch in batches for run in batch.times],
+                         np.concatenate([batch.hive_ids for batch in batches]),
+                         np.concatenate([batch.values for batch in batches]))
+
+    @staticmethod
+    def runs(times, label):
+        """One label per row from (time, count) runs, label called once per run"""
+        labels = []
+        for t, count in times:
+            labels.extend([label(t)] * count)
+        return labels
+
+    @staticmethod
+    def format_rows(template, columns):
+        """Fill template once per row with a single % call; columns are equal-length, in placeholder order"""
+        n = len(columns[0])
+        table = np.empty((n, len(columns)), dtype=object)
+        for i, column in enumerate(columns):
+            table[:, i] = column
+        return (template * n) % tuple(table.ravel().tolist())
+
+    @staticmethod
+    def format_values(template, labels, values, missing):
+        """format_rows() with the value columns after labels; NaN values are written as missing"""
+        nan = np.isnan(values)
+        if not nan.any():
+            return Sink.format_rows(template, labels + list(values.T))
+        text = np.char.mod('%.2f', values).astype(object)
+        text[nan] = missing
+        return Sink.format_rows(template.replace('%.2f', '%s'), labels + list(text.T))
+
+    @staticmethod
+    def hive_labels(hive_ids, quote):
+        """Hive ids as text, integer ids are converted in bulk and other ids quoted"""
+        if hive_ids.dtype.kind in 'iu':
+            return hive_ids.tolist()
+        return [quote(str(hive_id)) for hive_id in hive_ids.tolist()]
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+    def flush(self):
+        if not self.buffered:
+            return
+        if metrics:
+            started = time.perf_counter()
+        batch = self.take_batch()
+        self.write_batch(batch)
+        self.written_count += len(batch.hive_ids)
+        if metrics:
+            metrics.stage('sink', started)
+
+    def close(self):
+        self.flush()
+
+class FileSink(Sink):
+    """Sink appending each formatted batch to a file in one write, rotated to PATH.1, PATH.2... beyond rotate_bytes"""
+
+    def __init__(self, path, batch_size=SINK_BATCH_SIZE, rotate_bytes=SINK_ROTATE_BYTES):
+        super().__init__(batch_size)
+        self.path = path
+        self.rotate_bytes = rotate_bytes
+        self.rotations = 0
+        while os.path.exists(f'{path}.{self.rotations + 1}'):
+            self.rotations += 1
+        self.file = None
+        self.size = 0
+        self.open_file()
+
+    def header(self):
+        return ''
+
+    def format_batch(self, batch):
+        raise NotImplementedError
+
+    def open_file(self):
+        self.file = open(self.path, 'ab', buffering=0)  # Batches are large, skip the extra copy through a buffer
+        self.size = self.file.seek(0, os.SEEK_END)
+        if not self.size and self.header():
+            self.size += self.file.write(self.header().encode())
+
+    def rotate(self):
+        self.file.close()
+        self.rotations += 1
+        os.replace(self.path, f'{self.path}.{self.rotations}')
+        self.open_file()
+
+    def write_batch(self, batch):
+        data = self.format_batch(batch).encode()
+        if self.size > len(self.header()) and self.size + len(data) > self.rotate_bytes:
+            self.rotate()
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.file.close()
+
+class NDJSONSink(FileSink):
+    """One JSON object per line, missing (NaN) values as null"""
+    TEMPLATE = '{"hive_id":%s,"created_at":"%s",' + ','.join(f'"{field}":%.2f' for field in Sink.FIELDS) + '}\n'
+
+    @staticmethod
+    def labels(batch):
+        return [Sink.hive_labels(batch.hive_ids, json.dumps), Sink.runs(batch.times, datetime.isoformat)]
+
+    def format_batch(self, batch):
+        return Sink.format_values(NDJSONSink.TEMPLATE, NDJSONSink.labels(batch), batch.values, 'null')
+
+class CSVSink(FileSink):
+    """Comma-separated values with a header line in every file, missing (NaN) values as empty fields"""
+    TEMPLATE = '%s,%s,' + ','.join('%.2f' for _ in Sink.FIELDS) + '\n'
+
+    def header(self):
+        return ','.join(('hive_id', 'created_at') + Sink.FIELDS) + '\n'
+
+    @staticmethod
+    def quote(value):
+        return '"' + value.replace('"', '""') + '"'
+
+    @staticmethod
+    def labels(batch):
+        return [Sink.hive_labels(batch.hive_ids, CSVSink.quote), Sink.runs(batch.times, datetime.isoformat)]
+
+    def format_batch(self, batch):
+        return Sink.format_values(CSVSink.TEMPLATE, CSVSink.labels(batch), batch.values, '')
+
+class LineProtocolSink(FileSink):
+    """InfluxDB line protocol, one point per reading tagged with its hive"""
+
+    def __init__(self, path, batch_size=SINK_BATCH_SIZE, rotate_bytes=SINK_ROTATE_BYTES, measurement=SINK_MEASUREMENT):
+        self.measurement = measurement
+        super().__init__(path, batch_size, rotate_bytes)
+
+    @staticmethod
+    def nanoseconds(t):
+        return int(t.timestamp()) * 1000000000 + t.microsecond * 1000
+
+    @staticmethod
+    def escape_tag(value):
+        return value.replace('\\', '\\\\').replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
+    @staticmethod
+    def template(measurement):
+        return (LineProtocolSink.escape_tag(measurement).replace('%', '%%') + ',hive=%s ' +
+                ','.join(f'{field}=%.2f' for field in Sink.FIELDS) + ' %d\n')
+
+    @staticmethod
+    def columns(batch):
+        return ([Sink.hive_labels(batch.hive_ids, LineProtocolSink.escape_tag)] + list(batch.values.T) +
+                [Sink.runs(batch.times, LineProtocolSink.nanoseconds)])
+
+    @staticmethod
+    def format_lines(batch, measurement):
+        return Sink.format_rows(LineProtocolSink.template(measurement), LineProtocolSink.columns(batch))
+
+    def format_batch(self, batch):
+        return LineProtocolSink.format_lines(batch, self.measurement)
+
+class SocketSink(Sink):
+    """Line protocol streamed to a local Unix socket path or a (host, port) TCP address, one sendall per batch"""
+
+    def __init__(self, address, batch_size=SINK_BATCH_SIZE, measurement=SINK_MEASUREMENT):
+        super().__init__(batch_size)
+        self.address = address
+        self.measurement = measurement
+        self.socket = None
+        self.dropped_count = 0
+
+    def connect(self):
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            self.socket.connect(self.address)
+        except OSError:
+            self.socket.close()
+            self.socket = None
+            raise
+
+    def write_batch(self, batch):
+        data = LineProtocolSink.format_lines(batch, self.measurement).encode()
+        try:
+            if self.socket is None:
+                self.connect()
+            self.socket.sendall(data)
+        except OSError as e:
+            # The listener went away, drop this batch and reconnect for the next one
+            journal.sink_error(self.address, len(batch.hive_ids), e)
+            self.dropped_count += len(batch.hive_ids)
+            if self.socket:
+                self.socket.close()
+                self.socket = None
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.socket:
+                self.socket.close()
+
+class UDPSink(Sink):
+    """Fire-and-forget line protocol over UDP, whole lines packed into datagrams of up to max_datagram bytes"""
+
+    def __init__(self, address, batch_size=SINK_BATCH_SIZE, max_datagram=SINK_DATAGRAM_BYTES,
+                 measurement=SINK_MEASUREMENT):
+        super().__init__(batch_size)
+        self.address = address
+        self.max_datagram = max_datagram
+        self.measurement = measurement
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.dropped_count = 0
+
+    def write_batch(self, batch):
+        data = LineProtocolSink.format_lines(batch, self.measurement).encode()
+        view = memoryview(data)
+        start = 0
+        while start < len(data):
+            end = start + self.max_datagram
+            if end < len(data):
+                end = data.rfind(b'\n', start, end) + 1
+                if end <= start:
+                    end = data.index(b'\n', start) + 1  # Line longer than a datagram, send it on its own
+            try:
+                self.socket.sendto(view[start:end], self.address)
+            except OSError:
+                self.dropped_count += data.count(b'\n', start, end)
+            start = end
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.socket.close()
+
+class FanOutSink(Sink):
+    """Several sinks fed from one buffer, each batch is built once and handed to all of them"""
+
+    def __init__(self, sinks, batch_size=SINK_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.sinks = list(sinks)
+
+    def write_batch(self, batch):
+        for sink in self.sinks:
+            try:
+                sink.write_batch(batch)
+                sink.written_count += len(batch.hive_ids)
+            except OSError as e:
+                journal.sink_error(type(sink).__name__, len(batch.hive_ids), e)  # One broken output does not stop the others
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            for sink in self.sinks:
+                sink.close()
+
+# One closed window of one hive: min, max and mean follow RollingAggregates.FIELDS, weight is the last
+# weight in the window and weight_delta its change over the window, event_minutes maps event names to
+# minutes active
+WindowSummary = namedtuple('WindowSummary', ['hive_id', 'window', 'start', 'minutes', 'min', 'max', 'mean',
+                                             'weight', 'weight_delta', 'event_minutes'])
+
+class RollingAggregates:
+    """Hourly and daily statistics per hive, kept up to date as readings arrive
+
+    Readings are buffered and folded into fixed-size per-hive arrays in batches. Readings must
+    arrive in time order; the first one past a window's end closes that window for every hive.
+    """
+    WINDOWS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+    FIELDS = ('field1', 'field2', 'field3', 'field4')  # Inside and outside temperature and humidity
+    GET_VALUES = itemgetter(*FIELDS, 'field5')
+
+    def __init__(self, hive_ids, windows=('hour', 'day'), path=None, buffer_size=AGGREGATE_BUFFER):
+        for window in windows:
+            if window not in RollingAggregates.WINDOWS:
+                raise ValueError(f"Unknown aggregate window: {window}")
+        self.hive_ids = list(hive_ids)
+        self.rows = {hive_id: row for row, hive_id in enumerate(self.hive_ids)}
+        self.windows = {window: None for window in windows}  # Window -> state of the open window
+        self.next_close = None
+        self.last_weight = np.full(len(self.hive_ids), np.nan)  # Latest weight folded in, per hive
+        self.event_shifts = np.arange(len(EVENT_REGISTRY.events), dtype=np.uint32)
+        self.buffer_size = buffer_size
+        self.buffer = []  # (row, values, events mask) not folded in yet
+        self.file = open(path, 'a') if path else None  # Closed windows as NDJSON lines
+
+    @staticmethod
+    def window_start(window, now):
+        if window == 'hour':
+            return now.replace(minute=0, second=0, microsecond=0)
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def open_window(self, window, now):
+        n = len(self.hive_ids)
+        self.windows[window] = {
+            'start': RollingAggregates.window_start(window, now),
+            'count': np.zeros(n, dtype=np.int32),
+            'min': np.full((n, len(RollingAggregates.FIELDS)), np.inf),
+            'max': np.full((n, len(RollingAggregates.FIELDS)), -np.inf),
+            'sum': np.zeros((n, len(RollingAggregates.FIELDS))),
+            'weight_base': self.last_weight.copy(),  # Weight before the window, NaN until known
+            'weight_last': np.full(n, np.nan),
+            'event_minutes': np.zeros((n, len(EVENT_REGISTRY.events)), dtype=np.int32)
+        }
+
+    def summaries(self, window):
+        """WindowSummary records of every hive with readings in a window"""
+        state = self.windows[window]
+        count = state['count']
+        mean = state['sum'] / np.maximum(count, 1)[:, None]
+        delta = state['weight_last'] - state['weight_base']
+        records = []
+        for row in np.flatnonzero(count).tolist():
+            minutes = state['event_minutes'][row]
+            records.append(WindowSummary(
+                self.hive_ids[row], window, state['start'], int(count[row]),
+                tuple(state['min'][row].tolist()), tuple(state['max'][row].tolist()), tuple(mean[row].tolist()),
+                float(state['weight_last'][row]), float(delta[row]),
+                {EVENT_REGISTRY.events[i]: int(minutes[i]) for i in np.flatnonzero(minutes).tolist()}
+            ))
+        return records
+
+    def roll(self, now):
+        """Close the windows that ended before now and open new ones, returns the closed summaries"""
+        self.fold()
+        closed = []
+        for window, state in self.windows.items():
+            if state is None or now >= state['start'] + RollingAggregates.WINDOWS[window]:
+                if state is not None:
+                    closed.extend(self.summaries(window))
+                self.open_window(window, now)
+        self.next_close = min(state['start'] + RollingAggregates.WINDOWS[window] for window, state in self.windows.items())
+        self.write(closed)
+        return closed
+
+    def add(self, hive_id, now, data, active_mask=0):
+        """Count one reading, returns the summaries of windows it closed (usually none)"""
+        closed = self.roll(now) if self.next_close is None or now >= self.next_close else ()
+        self.buffer.append((self.rows[hive_id], RollingAggregates.GET_VALUES(data), active_mask))
+        if len(self.buffer) >= self.buffer_size:
+            self.fold()
+        return closed
+
+    def add_fleet(self, now, readings, events_masks=None):
+        """Count one tick of HiveFleet.step() output, rows in the aggregator's hive order"""
+        closed = self.roll(now) if self.next_close is None or now >= self.next_close else ()
+        n = len(self.hive_ids)
+        values = np.empty((n, len(RollingAggregates.FIELDS) + 1))
+        for i, field in enumerate(RollingAggregates.FIELDS + ('field5',)):
+            values[:, i] = readings[field]
+        self.fold_rows(np.arange(n), values, np.zeros(n, dtype=np.uint32) if events_masks is None else events_masks)
+        return closed
+
+    def fold(self):
+        if not self.buffer:
+            return
+        rows, values, masks = zip(*self.buffer)
+        self.buffer = []
+        self.fold_rows(np.array(rows), np.array(values, dtype=float), np.array(masks, dtype=np.uint32))
+
+    def fold_rows(self, rows, values, masks):
+        """Add readings given as row indexes, (k, 5) values with the weight last, and event masks"""
+        active = ((masks[:, None] >> self.event_shifts) & 1).astype(np.int32)
+        fields = values[:, :-1]
+        weights = values[:, -1]
+        # A hive may appear several times; its first and last reading set the weights
+        first_rows, first = np.unique(rows, return_index=True)
+        last_rows, last = np.unique(rows[::-1], return_index=True)
+        last = len(rows) - 1 - last
+        repeated = len(first_rows) < len(rows)
+        for state in self.windows.values():
+            if repeated:
+                np.add.at(state['count'], rows, 1)
+                np.minimum.at(state['min'], rows, fields)
+                np.maximum.at(state['max'], rows, fields)
+                np.add.at(state['sum'], rows, fields)
+                np.add.at(state['event_minutes'], rows, active)
+            else:  # One reading per hive, as from add_fleet(), plain indexing is much faster
+                state['count'][rows] += 1
+                state['min'][rows] = np.minimum(state['min'][rows], fields)
+                state['max'][rows] = np.maximum(state['max'][rows], fields)
+                state['sum'][rows] += fields
+                state['event_minutes'][rows] += active
+            base = state['weight_base']
+            unknown = np.isnan(base[first_rows])
+            base[first_rows[unknown]] = weights[first[unknown]]
+            state['weight_last'][last_rows] = weights[last]
+        self.last_weight[last_rows] = weights[last]
+
+    @staticmethod
+    def as_reading(summary):
+        """Reading carrying a summary's means and last weight, for uploads and sinks in place of raw readings"""
+        mean = summary.mean
+        return Reading(summary.hive_id, summary.start, {
+            'field1': round(mean[0], 2), 'field2': round(mean[1], 2), 'field3': round(mean[2], 2),
+            'field4': round(mean[3], 2), 'field5': round(summary.weight, 2)
+        })
+
+    def write(self, summaries):
+        if not self.file or not summaries:
+            return
+        lines = []
+        for s in summaries:
+            record = {'hive_id': s.hive_id, 'window': s.window, 'start': s.start.isoformat(), 'minutes': s.minutes}
+            for i, field in enumerate(RollingAggregates.FIELDS):
+                record[field] = {'min': round(s.min[i], 2), 'max': round(s.max[i], 2), 'mean': round(s.mean[i], 2)}
+            record['weight'] = round(s.weight, 2)
+            record['weight_delta'] = round(s.weight_delta, 3)
+            record['event_minutes'] = s.event_minutes
+            lines.append(json.dumps(record))
+        self.file.write('\n'.join(lines) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """Emit the windows still open, possibly partial, and return their summaries"""
+        self.fold()
+        closed = []
+        for window, state in self.windows.items():
+            if state is not None:
+                closed.extend(self.summaries(window))
+        self.write(closed)
+        self.windows = dict.fromkeys(self.windows)
+        self.next_close = None
+        if self.file:
+            self.file.close()
+            self.file = None
+        return closed
+
+# One reading from stream_readings(): simulated time, hive id, field1..field5 and the names of the active events
+StreamReading = namedtuple('StreamReading', ('created_at', 'hive_id') + SeriesStore.FIELDS + ('events',))
+
+# One block from stream_blocks(): times as (ticks,) datetime64[m], the fleet's hive ids, fields mapping
+# field1..field5 to (ticks, hives) float32 arrays, and events as (ticks, hives) EVENT_REGISTRY bitmasks
+ReadingBlock = namedtuple('ReadingBlock', ['times', 'hive_ids', 'fields', 'events'])
+
+def stream_readings(hives=1, start=None, steps=None, seed=None):
+    """Readings of every hive, tick after tick, computed only as they are consumed
+
+    hives is a number of new hives or a list of Hive objects to continue. Runs forever unless
+    bounded by steps or by the consumer, e.g. with itertools.islice. Simulated time starts at
+    start (default: the clock's time) and the global clock is left alone.
+    """
+    now = start or clock.now()
+    if isinstance(hives, int):
+        hives = [Hive(i, seed=seed, start=now) for i in range(hives)]
+    step = timedelta(minutes=1)
+    ticks = 0
+    while steps is None or ticks < steps:
+        ctx = TickContext(now)
+        for hive in hives:
+            data = hive.tick(ctx).data
+            yield StreamReading(now, hive.hive_id, data['field1'], data['field2'], data['field3'], data['field4'],
+                                data['field5'], tuple(hive.events.current_events))
+        now += step
+        ticks += 1
+
+def stream_blocks(hives=1000, block_ticks=STREAM_BLOCK_TICKS, start=None, steps=None, seed=None, weather=None):
+    """Readings of a HiveFleet as ReadingBlock arrays of block_ticks ticks each
+
+    hives is a number of hives or a HiveFleet to continue, all under one weather (default: a new
+    WeatherConditions). Every block is freshly allocated, so consumers may keep it while memory
+    stays bounded by the blocks they keep. The last block is shorter when steps is not a multiple
+    of block_ticks.
+    """
+    fleet = hives if isinstance(hives, HiveFleet) else HiveFleet(hives, seed)
+    now = start or clock.now()
+    if weather is None:
+        streams = RandomStreams(seed, 'stream')
+        weather = WeatherConditions(streams.weather, streams.weather_pattern, streams.weather_trend, now)
+    step = timedelta(minutes=1)
+    ticks = 0
+    while steps is None or ticks < steps:
+        n = block_ticks if steps is None else min(block_ticks, steps - ticks)
+        times = np.datetime64(now, 'm') + np.arange(n)
+        fields = {field: np.empty((n, fleet.n_hives), dtype=np.float32) for field in SeriesStore.FIELDS}
+        events = np.empty((n, fleet.n_hives), dtype=np.uint32)
+        for t in range(n):
+            readings = fleet.step(weather, TickContext(now))
+            for field in SeriesStore.FIELDS:
+                fields[field][t] = readings[field]
+            events[t] = fleet.event_masks()
+            now += step
+        ticks += n
+        yield ReadingBlock(times, fleet.hive_ids, fields, events)
+
+async def astream_readings(hives=1, start=None, steps=None, seed=None, pace=None):
+    """stream_readings() as an async iterator that gives the event loop a turn after every tick
+
+    With a SimulationClock as pace, simulated time starts at the clock's time and each tick waits
+    for its deadline, e.g. one tick per minute for a realtime clock.
+    """
+    if pace:
+        pace.start()
+        start = pace.now()
+    if isinstance(hives, int):
+        hives = [Hive(i, seed=seed, start=start) for i in range(hives)]
+    readings = stream_readings(hives, start, steps, seed)
+    while True:
+        tick = list(islice(readings, len(hives)))
+        if not tick:
+            return
+        for reading in tick:
+            yield reading
+        if pace:
+            pace.advance()
+            await asyncio.sleep(pace.wait_time())
+        else:
+            await asyncio.sleep(0)
+
+async def astream_blocks(hives=1000, block_ticks=STREAM_BLOCK_TICKS, start=None, steps=None, seed=None,
+                         weather=None, pace=None):
+    """stream_blocks() as an async iterator, paced block by block like astream_readings()"""
+    if pace:
+        pace.start()
+        start = pace.now()
+    for block in stream_blocks(hives, block_ticks, start, steps, seed, weather):
+        yield block
+        if pace:
+            pace.advance(len(block.times))
+            await asyncio.sleep(pace.wait_time())
+        else:
+            await asyncio.sleep(0)
+
+class Checkpointer:
+    """Binary snapshots of the simulator state, written by a background thread while the simulation goes on"""
+    VERSION = 2  # Random streams store their position rather than their cached block since version 2
+
+    def __init__(self, path, every=CHECKPOINT_EVERY):
+        self.path = path
+        self.every = every
+        self.writer = None
+        self.saved_count = 0
+        self.skipped_count = 0
+        self.period = None  # clock.ticks // every at the last due() call
+
+    @staticmethod
+    def capture(hives):
+        """Snapshot of the clock and every hive, copied so the simulation can go on at once"""
+        return {'clock': clock.get_state(), 'hives': {hive.hive_id: hive.get_state() for hive in hives}}
+
+    @staticmethod
+    def restore(state, hives, keep_time=False):
+        """Put the clock and the hives back to a captured state, returns the number of hives restored"""
+        clock.set_state(state['clock'], keep_time)
+        restored = 0
+        fields = set()  # Regional weather restored already, once for all the hives sharing it
+        for hive in hives:
+            if hive.hive_id in state['hives']:
+                field = getattr(hive.weather, 'field', None)
+                hive.set_state(state['hives'][hive.hive_id], weather=id(field) not in fields)
+                if field is not None:
+                    fields.add(id(field))
+                restored += 1
+        return restored
+
+    def load(self):
+        """Last saved state, None when there is no checkpoint yet"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot.get('version') != Checkpointer.VERSION:
+            raise ValueError(f"Checkpoint {self.path} has unsupported version {snapshot.get('version')}")
+        return snapshot['state']
+
+    def resume(self, hives, keep_time=False):
+        """Restore hives and clock from the checkpoint if there is one"""
+        state = self.load()
+        if state is None:
+            return False
+        restored = Checkpointer.restore(state, hives, keep_time)
+        print(f"Resumed {restored} hive(s) from {self.path} at {clock.now()}, tick {clock.ticks}")
+        return True
+
+    def due(self):
+        """True once every every ticks, also when a step of several minutes jumps over the exact multiple"""
+        period = clock.ticks // self.every
+        if self.period is None:
+            self.period = period
+            return period * self.every == clock.ticks
+        if period == self.period:
+            return False
+        self.period = period
+        return True
+
+    def save(self, state):
+        """Write a captured state in the background, skipped while the previous write is still running"""
+        if self.writer and self.writer.is_alive():
+            self.skipped_count += 1
+            return False
+        self.writer = threading.Thread(target=self.write, args=(state,), daemon=True)
+        self.writer.start()
+        return True
+
+    def write(self, state):
+        """Serialize and atomically replace the checkpoint file"""
+        data = pickle.dumps({'version': Checkpointer.VERSION, 'state': state}, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.path + '.tmp', 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + '.tmp', self.path)
+        self.saved_count += 1
+
+    def close(self, state=None):
+        """Wait for the background write, then write state if given"""
+        if self.writer:
+            self.writer.join()
+            self.writer = None
+        if state is not None:
+            self.write(state)
+
+class ThingSpeakUploader:
+    """Buffer readings and send them through ThingSpeak's bulk-update endpoint over one pooled session"""
+
+    def __init__(self, api_key=API_KEY, channel_id=CHANNEL_ID, batch_size=UPLOAD_BATCH_SIZE,
+                 url=None, timeout=UPLOAD_TIMEOUT, max_buffer=UPLOAD_MAX_BUFFER, outbox=None, bucket=None,
+                 backoff=1, max_backoff=60):
+        if not 1 <= batch_size <= MAX_BULK_SIZE:
+            raise ValueError(f"Batch size must be between 1 and {MAX_BULK_SIZE}")
+        self.api_key = api_key
+        self.url = url or BULK_URL.format(channel_id=channel_id)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_buffer = max_buffer
+        self.outbox = outbox
+        self.bucket = bucket  # Channel rate limit, readings wait in the buffer until it allows a request
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.delay = backoff  # Seconds to wait after the next failure, doubled by every failure in a row
+        self.retry_at = 0     # Monotonic time before which flushes leave the buffer alone
+        self.buffer = []  # (seq, created_at, data) not yet accepted by the server, seq is None without an outbox
+        self.sent_count = 0
+        self.request_count = 0
+        self.dropped_count = 0
+        
+        # Keep-alive connections are reused across flushes
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def replay(self):
+        """Queue readings left undelivered in the outbox by an earlier run"""
+        if not self.outbox:
+            return 0
+        pending = [(seq, reading.created_at, reading.data) for seq, reading in self.outbox.pending()]
+        self.buffer[:0] = pending
+        if pending:
+            journal.delivery(EventJournal.REPLAYED, len(pending),
+                             lambda: f"Replaying {len(pending)} undelivered readings from {self.outbox.path}")
+        return len(pending)
+
+    def add(self, data, created_at=None):
+        """Buffer one reading, flushing once a full batch is waiting"""
+        created_at = created_at or clock.now()
+        seq = self.outbox.append(Reading(None, created_at, data)) if self.outbox else None
+        self.buffer.append((seq, created_at, data))
+        if len(self.buffer) > self.max_buffer:
+            # Server unreachable for too long, keep the newest readings in memory
+            overflow = len(self.buffer) - self.max_buffer
+            del self.buffer[:overflow]
+            if self.outbox:
+                journal.delivery(EventJournal.KEPT, overflow,
+                                 lambda: f"Upload buffer full, {overflow} oldest readings left in the outbox for the next run")
+            else:
+                self.dropped_count += overflow
+                journal.delivery(EventJournal.DROPPED, overflow,
+                                 lambda: f"Upload buffer full, dropped {overflow} oldest readings")
+        accepted = self.flush() if len(self.buffer) >= self.batch_size else True
+        if metrics:
+            metrics.set('beehive_queue_depth', len(self.buffer))
+        return accepted
+
+    @staticmethod
+    def format_update(created_at, data):
+        """Bulk-update entry for one reading"""
+        return {'created_at': created_at.astimezone().isoformat(), **data}
+
+    def post_batch(self, batch):
+        """Send one batch, returns True when the server accepted it"""
+        payload = {
+            'write_api_key': self.api_key,
+            'updates': [self.format_update(created_at, data) for _, created_at, data in batch]
+        }
+        self.request_count += 1
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            if self.bucket:
+                self.bucket.settle()
+            accepted = response.status_code in (200, 202)
+            if response.status_code == 429:
+                # Too fast for the channel, wait as long as the server asks instead of backing off
+                if self.bucket:
+                    self.bucket.hold(ChannelRegistry.retry_after(response.headers, 1 / self.bucket.rate))
+                else:
+                    self.retry_at = time.monotonic() + ChannelRegistry.retry_after(response.headers, self.delay)
+                if metrics:
+                    metrics.inc('beehive_rate_limited_total')
+            elif not accepted:
+                self.back_off()
+            journal.upload(response.status_code, len(batch), batch[-1][1])
+        except requests.RequestException as e:
+            journal.upload(0, len(batch), batch[-1][1], e)
+            accepted = False
+            self.back_off()
+        if accepted:
+            self.delay = self.backoff
+        if metrics:
+            metrics.stage('upload', started)
+            metrics.inc('beehive_uploads_total', result='success' if accepted else 'failure')
+            if accepted:
+                metrics.inc('beehive_readings_uploaded_total', len(batch))
+        return accepted
+
+    def back_off(self):
+        """Leave the buffer alone for a while after a failed request, longer after every failure in a row"""
+        self.retry_at = time.monotonic() + self.delay * random.uniform(0.5, 1.5)  # Jitter avoids synchronized retries
+        self.delay = min(self.max_backoff, self.delay * 2)
+
+    def flush(self, wait=False):
+        """Send everything buffered in batches, keeping unsent readings for the next flush
+
+        With a rate limit, stops at the first batch the limit does not allow yet unless wait is set.
+        After a failed request, flushes without wait send nothing until the backoff has passed.
+        """
+        if not wait and self.buffer and time.monotonic() < self.retry_at:
+            return False
+        while self.buffer:
+            if self.bucket:
+                delay = self.bucket.delay()
+                if delay > 0:
+                    if not wait:
+                        return True
+                    time.sleep(delay)
+                self.bucket.take()
+            # Readings held back by the rate limit are merged into one bigger request
+            batch = self.buffer[:MAX_BULK_SIZE if self.bucket else self.batch_size]
+            if not self.post_batch(batch):
+                return False
+            del self.buffer[:len(batch)]
+            self.sent_count += len(batch)
+            if self.outbox:
+                self.outbox.ack(seq for seq, _, _ in batch)
+        return True
+
+    def close(self):
+        """Flush remaining readings and release pooled connections"""
+        try:
+            self.flush(wait=True)
+        finally:
+            self.session.close()
+            if self.outbox:
+                self.outbox.close()
+
+class AsyncHTTPClient:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams, one connection per host"""
+
+    def __init__(self, timeout=UPLOAD_TIMEOUT):
+        self.connect_timeout, self.read_timeout = timeout
+        self.connections = {}
+        self.ssl_context = ssl.create_default_context()
+
+    async def connect(self, key):
+        """Reuse the open connection for (scheme, host, port) or open a new one"""
+        if key not in self.connections:
+            scheme, host, port = key
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self.ssl_context if scheme == 'https' else None),
+                self.connect_timeout
+            )
+            writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections[key] = reader, writer
+        return self.connections[key]
+
+    def disconnect(self, key):
+        """Drop a connection that is broken or closed by the server"""
+        connection = self.connections.pop(key, None)
+        if connection:
+            connection[1].close()
+
+    async def read_response(self, reader):
+        """Read status, headers and body of one response"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunk = await reader.readexactly(size + 2)  # Chunk plus trailing CRLF
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            headers['connection'] = 'close'
+        return status, headers, body
+
+    async def post_json(self, url, payload):
+        """POST a JSON payload, returns (status, headers, body)"""
+        return await self.post(url, json.dumps(payload).encode())
+
+    async def post(self, url, body, content_type='application/json'):
+        """POST an encoded body, returns (status, headers, body)"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        request = (
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode() + body
+        
+        for attempt in range(2):  # A kept-alive connection may have gone stale, retry once on a fresh one
+            reader, writer = await self.connect(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, response_body = await asyncio.wait_for(self.read_response(reader), self.read_timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.disconnect(key)
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                self.disconnect(key)
+                raise
+            if headers.get('connection', '').lower() == 'close':
+                self.disconnect(key)
+            return status, headers, response_body
+
+    def close(self):
+        """Close all pooled connections"""
+        for key in list(self.connections):
+            self.disconnect(key)
+
+class AsyncRuntime:
+    """Simulation producer and rate-limited per-channel uploaders joined by a bounded queue"""
+    BLOCK = 'block'              # Producer waits for room, the simulation slows down
+    DROP_OLDEST = 'drop_oldest'  # Oldest queued reading is discarded
+    SPILL = 'spill'              # Reading stays in the outbox and is queued again once there is room
+
+    def __init__(self, hives, workers=4, queue_size=10000, policy=BLOCK, batch_size=UPLOAD_BATCH_SIZE,
+                 url=None, max_retries=5, backoff=1, max_backoff=60, outbox=None, steps=None, store=None,
+                 checkpoint=None, stagger=True, channels=None, sink=None, aggregates=None, summaries=None):
+        if policy not in (AsyncRuntime.BLOCK, AsyncRuntime.DROP_OLDEST, AsyncRuntime.SPILL):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        if policy == AsyncRuntime.SPILL and outbox is None:
+            raise ValueError("The spill policy needs an outbox")
+        self.hives = {hive.hive_id: hive for hive in hives}
+        self.workers = workers
+        self.queue_size = queue_size
+        self.policy = policy
+        self.batch_size = min(batch_size, MAX_BULK_SIZE)
+        self.url = url or BULK_URL
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.outbox = outbox
+        self.steps = steps
+        self.store = store
+        self.sink = sink
+        self.aggregates = aggregates
+        self.summaries = summaries  # Window whose summaries are uploaded instead of raw readings
+        self.checkpoint = checkpoint
+        self.stagger = stagger
+        self.channels = channels or ChannelRegistry()
+        self.final_state = None  # Snapshot taken when the producer finishes its steps
+        self.queue = None
+        self.in_flight = set()  # Outbox sequence numbers currently queued or being uploaded
+        self.backlog = None     # Set when the outbox holds readings that are not queued
+        self.pending = {}       # Channel -> readings taken off the queue, waiting for the channel's rate limit
+        self.ready = {}         # Channel -> event set when a batch is waiting
+        self.senders = {}       # Channel -> its sender task
+        self.pending_count = 0
+        self.room = None        # Set when pending readings drop below queue_size
+        self.clients = None     # Idle HTTP clients, one per worker
+        self.draining = False   # Producer finished, send partial batches
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.spilled_count = 0
+
+    def queue_item(self, seq, reading):
+        if seq is not None:
+            self.in_flight.add(seq)
+        self.queue.put_nowait((seq, reading))
+
+    async def enqueue(self, reading):
+        """Spool a reading and queue it according to the backpressure policy"""
+        seq = self.outbox.append(reading) if self.outbox else None
+        if self.policy == AsyncRuntime.BLOCK:
+            if seq is not None:
+                self.in_flight.add(seq)
+            await self.queue.put((seq, reading))
+            return
+        if self.queue.full():
+            if self.policy == AsyncRuntime.SPILL:
+                self.spilled_count += 1
+                self.backlog.set()
+                return
+            dropped_seq, _ = self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped_count += 1
+            if dropped_seq is not None:
+                self.in_flight.discard(dropped_seq)
+                self.outbox.ack([dropped_seq])  # Dropped on purpose, never replay it
+        self.queue_item(seq, reading)
+
+    async def produce(self):
+        """Tick every hive once per simulated minute and queue the readings"""
+        hives = list(self.hives.values())
+        clock.start()
+        while self.steps is None or clock.ticks < self.steps:
+            ctx = TickContext()
+            # Spread the hives evenly over the interval so their uploads do not all fire at once
+            spacing = clock.wall_seconds_per_tick() / len(hives) if self.stagger else 0
+            due = clock.deadline() if spacing else 0
+            for k, hive in enumerate(hives):
+                if k and spacing:
+                    await asyncio.sleep(max(0, due + k * spacing - time.monotonic()))
+                reading = hive.tick(ctx)
+                if self.store:
+                    self.store.append(reading, hive.events.active_mask)
+                closed = ()
+                if self.aggregates:
+                    closed = self.aggregates.add(reading.hive_id, reading.created_at, reading.data,
+                                                 hive.events.active_mask)
+                if self.summaries:
+                    await self.publish_summaries(closed)
+                else:
+                    await self.publish(reading)
+            clock.advance()
+            if self.checkpoint and self.checkpoint.due():
+                self.checkpoint.save(Checkpointer.capture(self.hives.values()))
+            if metrics:
+                metrics.set('beehive_queue_depth', self.queue.qsize() + self.pending_count)
+                metrics.maybe_log()
+            # Always yield so uploaders run even in fast mode
+            await asyncio.sleep(clock.wait_time())
+            if metrics:
+                clock.record_lateness()
+        if self.summaries:
+            await self.publish_summaries(self.aggregates.close())  # Partial windows of the last hour or day
+        if self.checkpoint:
+            self.final_state = Checkpointer.capture(self.hives.values())
+
+    async def publish(self, reading):
+        if self.sink:
+            self.sink.write(reading)
+        await self.enqueue(reading)
+
+    async def publish_summaries(self, summaries):
+        for summary in summaries:
+            if summary.window == self.summaries:
+                await self.publish(RollingAggregates.as_reading(summary))
+
+    async def replay(self):
+        """Queue undelivered outbox readings, at startup and whenever readings were spilled or given up"""
+        while True:
+            await self.backlog.wait()
+            self.backlog.clear()
+            replayed = 0
+            for seq, reading in self.outbox.pending(skip=self.in_flight):
+                if reading.hive_id not in self.hives:
+                    continue  # Hive no longer simulated here, keep it for a run that has it
+                self.in_flight.add(seq)
+                await self.queue.put((seq, reading))
+                replayed += 1
+            if replayed:
+                journal.delivery(EventJournal.REPLAYED, replayed,
+                                 lambda: f"Replayed {replayed} undelivered readings from {self.outbox.path}")
+
+    async def send(self, client, channel, items):
+        """Upload one channel's batch within its rate limit, with retry and exponential backoff"""
+        channel_id, api_key = channel
+        payload = {
+            'write_api_key': api_key,
+            'updates': [ThingSpeakUploader.format_update(r.created_at, r.data) for _, r in items]
+        }
+        url = self.url.format(channel_id=channel_id)
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            await self.channels.acquire(channel)
+            started = time.perf_counter()
+            try:
+                status, headers, _ = await client.post_json(url, payload)
+                self.channels.bucket(channel).settle()
+                journal.upload(status, len(items), items[-1][1].created_at)
+                if metrics:
+                    metrics.stage('upload', started)
+                    metrics.inc('beehive_uploads_total', result='success' if status in (200, 202) else 'failure')
+                if status in (200, 202):
+                    self.sent_count += len(items)
+                    if metrics:
+                        metrics.inc('beehive_readings_uploaded_total', len(items))
+                    if self.outbox:
+                        self.outbox.ack(seq for seq, _ in items)
+                    return True
+                error = f"HTTP {status}"
+                if status == 429:
+                    # Too fast for the channel, the limiter holds off until the server allows more
+                    self.channels.hold(channel, ChannelRegistry.retry_after(headers, delay))
+                    if metrics:
+                        metrics.inc('beehive_rate_limited_total')
+                    continue
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                error = repr(e)
+                journal.upload(0, len(items), items[-1][1].created_at, error)
+                if metrics:
+                    metrics.stage('upload', started)
+                    metrics.inc('beehive_uploads_total', result='failure')
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))  # Jitter avoids synchronized retries
+                delay = min(self.max_backoff, delay * 2)
+        if self.outbox:
+            journal.delivery(EventJournal.KEPT, len(items),
+                             lambda: f"Giving up on {len(items)} readings for channel {channel_id} for now: {error}")
+            asyncio.get_running_loop().call_later(self.max_backoff, self.backlog.set)
+        else:
+            journal.delivery(EventJournal.DROPPED, len(items),
+                             lambda: f"Giving up on {len(items)} readings for channel {channel_id}: {error}")
+            self.dropped_count += len(items)
+        return False
+
+    def dispatch_item(self, item):
+        hive = self.hives[item[1].hive_id]
+        channel = Channel(hive.channel_id, hive.api_key)
+        pending = self.pending.get(channel)
+        if pending is None:
+            pending = self.pending[channel] = []
+            self.ready[channel] = asyncio.Event()
+            self.senders[channel] = asyncio.create_task(self.channel_sender(channel))
+        pending.append(item)
+        self.pending_count += 1
+        if len(pending) >= self.batch_size or self.draining:
+            self.ready[channel].set()
+
+    async def dispatch(self):
+        """Move queued readings to their channel's pending batch"""
+        while True:
+            self.dispatch_item(await self.queue.get())
+            while self.pending_count >= self.queue_size:
+                # Channels are behind their rate limits, leave readings on the queue so backpressure applies
+                self.room.clear()
+                self.flush_partial()
+                await self.room.wait()
+
+    async def channel_sender(self, channel):
+        """Send a channel's pending readings whenever its rate limit allows, merged into bulk requests"""
+        pending = self.pending[channel]
+        ready = self.ready[channel]
+        while True:
+            await ready.wait()
+            await self.channels.ready(channel)  # Readings arriving meanwhile join this request
+            client = await self.clients.get()
+            try:
+                items = pending[:MAX_BULK_SIZE]
+                del pending[:len(items)]
+                if len(pending) < self.batch_size and not self.draining:
+                    ready.clear()
+                await self.send(client, channel, items)
+            finally:
+                self.clients.put_nowait(client)
+            for seq, _ in items:
+                self.in_flight.discard(seq)
+                self.queue.task_done()
+            self.pending_count -= len(items)
+            self.room.set()
+            if not pending:
+                ready.clear()
+
+    def flush_partial(self):
+        """Let every channel send what it has, even less than a batch"""
+        for channel, pending in self.pending.items():
+            if pending:
+                self.ready[channel].set()
+
+    def drain(self):
+        """Send partial batches from now on, the producer has finished"""
+        self.draining = True
+        self.flush_partial()
+
+    async def run(self):
+        """Run producer and uploaders until the producer stops and every reading is sent or given up"""
+        self.queue = asyncio.Queue(self.queue_size)
+        self.backlog = asyncio.Event()
+        self.room = asyncio.Event()
+        self.clients = asyncio.Queue()
+        for _ in range(self.workers):
+            self.clients.put_nowait(AsyncHTTPClient())
+        tasks = [asyncio.create_task(self.dispatch())]
+        if self.outbox:
+            self.backlog.set()  # Deliver what earlier runs left behind
+            tasks.append(asyncio.create_task(self.replay()))
+        try:
+            await self.produce()
+            self.drain()
+            await self.queue.join()
+            if self.outbox and self.spilled_count:
+                # Give spilled readings one last pass before stopping
+                self.backlog.set()
+                await asyncio.sleep(0)
+                await self.queue.join()
+        finally:
+            tasks.extend(self.senders.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            while not self.clients.empty():
+                self.clients.get_nowait().close()
+            if self.outbox:
+                self.outbox.close()
+            if self.store:
+                self.store.close()
+            if self.aggregates:
+                self.aggregates.close()
+            if self.sink:
+                self.sink.close()
+            if self.checkpoint:
+                self.checkpoint.close(self.final_state)
+        print(f"Uploaded {self.sent_count} readings, dropped {self.dropped_count}, spilled {self.spilled_count}")
+
+class ShardLink:
+    """Length-prefixed pickled messages over a TCP connection, for hosts that trust each other"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    async def connect(host, port):
+        return ShardLink(*await asyncio.open_connection(host, port))
+
+    def send(self, *message):
+        data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        self.writer.write(len(data).to_bytes(8, 'big') + data)
+
+    async def receive(self):
+        """Next message as a tuple; raises IncompleteReadError once the other side is gone"""
+        size = int.from_bytes(await self.reader.readexactly(8), 'big')
+        return pickle.loads(await self.reader.readexactly(size))
+
+    async def drain(self):
+        await self.writer.drain()
+
+    def close(self):
+        self.writer.close()
+
+class ShardWorker:
+    """Advances the hives a ShardCoordinator assigns to it, as many ticks as it is allowed at a time
+
+    Every worker keeps its own copy of the regional weather. The copies start from the same seed
+    and advance once per tick, so they stay identical without being sent around; the coordinator
+    compares them every tick to make sure.
+    """
+
+    def __init__(self, host='127.0.0.1', port=SHARD_PORT, name=None, sink=None):
+        self.host = host
+        self.port = port
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.sink = sink
+        self.link = None
+        self.config = None   # Seed and regions, sent by the coordinator
+        self.weather = None  # This worker's RegionalWeather copy, starting at the clock's time
+        self.hives = {}
+        self.epoch = 0       # Bumped by the coordinator whenever it rolls the fleet back
+        self.leaving = False
+
+    def configure(self, config):
+        self.config = config
+        self.weather = None  # Built with the first hive, once the clock has been set
+
+    def add_hive(self, hive_id, state=None):
+        if self.weather is None:
+            regions = self.config['regions']
+            self.weather = RegionalWeather({region: (region * self.config['region_spacing'], 0)
+                                            for region in range(regions)}, seed=self.config['seed'])
+        hive = Hive(hive_id, seed=self.config['seed'], weather=self.weather.region(hive_id % self.config['regions']))
+        if state is not None:
+            hive.set_state(state)
+        self.hives[hive_id] = hive
+
+    def digest(self):
+        """This tick's regional weather, None while this worker holds no hives and skips advancing it"""
+        if not self.hives:
+            return None
+        return tuple((c['temperature'], c['humidity'], c['pattern']) for c in self.weather.conditions.values())
+
+    def tick(self):
+        ctx = TickContext()
+        for hive in self.hives.values():
+            reading = hive.tick(ctx)
+            if self.sink:
+                self.sink.write(reading)
+        clock.advance()
+
+    def leave(self):
+        """Ask the coordinator to move this worker's hives elsewhere and let it go"""
+        if not self.leaving:
+            self.leaving = True
+            print(f"Worker {self.name} leaving, handing its hives over")
+            self.link.send('leave')
+
+    async def run(self):
+        self.link = await ShardLink.connect(self.host, self.port)
+        self.link.send('join', self.name)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.leave)
+        print(f"Worker {self.name} joined the coordinator at {self.host}:{self.port}")
+        try:
+            while True:
+                try:
+                    message = await self.link.receive()
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    print(f"Worker {self.name}: coordinator went away")
+                    break
+                kind = message[0]
+                if kind == 'config':
+                    self.configure(message[1])
+                elif kind == 'assign':
+                    _, self.epoch, clock_state, states, replace = message
+                    if replace:
+                        # Rolled back: hives that start afresh need the weather from the start too
+                        self.hives = {}
+                        self.configure(self.config)
+                    clock.set_state(clock_state)
+                    for hive_id, state in states.items():
+                        self.add_hive(hive_id, state)
+                elif kind == 'advance':
+                    _, epoch, upto = message
+                    while epoch == self.epoch and clock.ticks < upto:
+                        self.tick()
+                        self.link.send('done', self.epoch, clock.ticks, self.digest())
+                        await self.link.drain()
+                        await asyncio.sleep(0)  # Lets a leave request through between ticks
+                elif kind == 'release':
+                    self.link.send('states', self.epoch, {hive_id: self.hives.pop(hive_id).get_state()
+                                                          for hive_id in message[1]})
+                elif kind == 'snapshot':
+                    self.link.send('states', self.epoch, {hive_id: hive.get_state() for hive_id, hive in self.hives.items()})
+                elif kind == 'stop':
+                    break
+                await self.link.drain()
+        finally:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signum)
+            self.link.close()
+            if self.sink:
+                self.sink.close()
+        print(f"Worker {self.name} stopped at tick {clock.ticks}")
+
+class ShardCoordinator:
+    """Splits a fleet of hives over ShardWorker processes and keeps them within max_skew ticks of each other
+
+    Hives go to workers by rendezvous hashing of hive id and worker name, so the assignment does
+    not depend on join order and a join or leave only moves the hives that worker wins or loses.
+    Joins and leaves take effect at a barrier: no worker is allowed past the furthest tick reached,
+    and once all are there the moving hives' states are collected and handed to their new owners.
+    Every snapshot_every ticks the coordinator collects the state of all hives; when a worker
+    disappears without leaving, the others roll back to that snapshot and share its hives.
+    """
+
+    def __init__(self, n_hives, seed=None, regions=1, region_spacing=10, steps=None, max_skew=SHARD_MAX_SKEW,
+                 host='127.0.0.1', port=SHARD_PORT, min_workers=1, snapshot_every=CHECKPOINT_EVERY, checkpoint=None,
+                 keep_time=False):
+        self.hive_ids = np.arange(n_hives)
+        self.config = {'seed': seed, 'regions': regions, 'region_spacing': region_spacing}
+        self.steps = steps
+        self.max_skew = max_skew
+        self.host = host
+        self.port = port
+        self.min_workers = min_workers
+        self.snapshot_every = snapshot_every
+        self.checkpoint = checkpoint
+        self.workers = {}     # Name -> ShardLink of the workers holding hives
+        self.assignment = {}  # Name -> hive ids
+        self.ticks = {}       # Name -> last tick finished
+        self.granted = {}     # Name -> tick the worker may advance to
+        self.joining = {}     # Name -> ShardLink, waiting for the next barrier
+        self.leaving = set()
+        self.lost = False     # A worker disappeared, roll back to the snapshot
+        self.epoch = 0        # Bumped by every rollback, older messages are ignored
+        self.digests = {}     # Tick -> regional weather reported by the first worker there
+        self.states = {}      # Hive states being collected
+        self.waiting = set()  # Workers whose states are still due
+        self.inbox = None
+        self.readers = set()  # Tasks reading the workers' connections
+        self.paced_from = None  # (monotonic time, tick) the clock's pacing counts from
+        self.rollbacks = 0
+        snapshot = checkpoint.load() if checkpoint else None
+        if snapshot:
+            clock.set_state(snapshot['clock'], keep_time)
+            print(f"Resuming {len(snapshot['hives'])} hive(s) from {checkpoint.path} at {clock.now()}, tick {clock.ticks}")
+        self.snapshot = {'clock': clock.get_state(), 'hives': snapshot['hives'] if snapshot else {}}
+        self.snapshot_tick = clock.ticks
+        self.pool = dict(self.snapshot['hives'])  # States of hives no worker holds; missing ones start afresh
+        self.tick = clock.ticks  # Tick of the last barrier
+
+    @staticmethod
+    def scores(hive_ids, name):
+        """Pseudo-random uint64 per hive for one worker name, SplitMix64 of hive id and name"""
+        with np.errstate(over='ignore'):
+            x = hive_ids.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) ^ np.uint64(stable_id(name))
+            x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            return x ^ (x >> np.uint64(31))
+
+    @staticmethod
+    def assign(hive_ids, names):
+        """Hive ids per worker name; each hive goes to the name that gives it the highest score"""
+        names = sorted(names)
+        if not names:
+            return {}
+        owner = np.argmax(np.stack([ShardCoordinator.scores(hive_ids, name) for name in names]), axis=0)
+        return {name: hive_ids[owner == i] for i, name in enumerate(names)}
+
+    async def accept(self, reader, writer):
+        """Read one worker's messages into the inbox until it disconnects"""
+        link = ShardLink(reader, writer)
+        try:
+            kind, name = await link.receive()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            link.close()
+            return
+        if kind != 'join' or name in self.workers or name in self.joining:
+            print(f"Refusing worker {name}: name already in use")
+            link.close()
+            return
+        self.inbox.put_nowait((name, ('join', link)))
+        self.readers.add(asyncio.current_task())
+        try:
+            while True:
+                self.inbox.put_nowait((name, await link.receive()))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.inbox.put_nowait((name, ('lost', link)))
+        finally:
+            self.readers.discard(asyncio.current_task())
+
+    def handle(self, name, message):
+        kind = message[0]
+        if kind == 'join':
+            self.joining[name] = message[1]
+            message[1].send('config', self.config)
+            print(f"Worker {name} joined, rebalancing at the next barrier")
+        elif kind == 'leave':
+            if name in self.workers:
+                self.leaving.add(name)
+        elif kind == 'lost':
+            if self.joining.get(name) is message[1]:
+                del self.joining[name]
+            elif self.workers.get(name) is message[1]:
+                print(f"Worker {name} lost at tick {self.ticks[name]}")
+                self.drop(name)
+                self.lost = True
+        elif kind == 'done':
+            _, epoch, tick, digest = message
+            if epoch != self.epoch or name not in self.workers:
+                return  # Sent before a rollback
+            self.ticks[name] = tick
+            if digest is not None and self.digests.setdefault(tick, digest) != digest:
+                raise RuntimeError(f"Worker {name} has different regional weather at tick {tick}")
+        elif kind == 'states':
+            _, epoch, states = message
+            if epoch == self.epoch and name in self.waiting:
+                self.states.update(states)
+                self.waiting.discard(name)
+
+    def drop(self, name):
+        self.workers.pop(name).close()
+        self.leaving.discard(name)
+        self.waiting.discard(name)
+        for mapping in (self.assignment, self.ticks, self.granted):
+            mapping.pop(name, None)
+
+    def barrier(self):
+        """Tick at which every worker has stopped, None while some are still advancing"""
+        ticks = set(self.ticks.values())
+        if len(ticks) != 1 or set(self.granted.values()) != ticks:
+            return None
+        return ticks.pop()
+
+    def limit(self):
+        """Furthest tick the workers may advance to now"""
+        slowest = min(self.ticks.values())
+        limit = slowest + 1 + self.max_skew
+        if self.joining or self.leaving:
+            limit = max(self.ticks.values())  # Nobody goes further until the hives have moved
+        limit = min(limit, (slowest // self.snapshot_every + 1) * self.snapshot_every)
+        if self.steps is not None:
+            limit = min(limit, self.steps)
+        seconds = clock.wall_seconds_per_tick()
+        if seconds:
+            started, tick = self.paced_from
+            limit = min(limit, tick + int((time.monotonic() - started) / seconds) + 1)
+        return limit
+
+    def grant(self):
+        limit = self.limit()
+        for name, link in self.workers.items():
+            if self.granted[name] < limit:
+                link.send('advance', self.epoch, limit)
+                self.granted[name] = limit
+        slowest = min(self.ticks.values())
+        for tick in [tick for tick in self.digests if tick < slowest]:
+            del self.digests[tick]
+
+    async def collect(self, requests):
+        """Send each named worker its request and wait for the hive states they answer with"""
+        self.states = {}
+        self.waiting = set(requests)
+        for name, request in requests.items():
+            self.workers[name].send(*request)
+        while self.waiting and not self.lost:
+            self.handle(*await self.inbox.get())
+        return self.states
+
+    def start_pacing(self):
+        self.paced_from = (time.monotonic(), self.tick)
+
+    async def rebalance(self):
+        """Move hives to and from the workers joining and leaving, returns False while too few have joined"""
+        names = sorted((set(self.workers) - self.leaving) | set(self.joining))
+        if not self.workers and len(names) < self.min_workers:
+            return False
+        assignment = ShardCoordinator.assign(self.hive_ids, names)
+        releases = {name: np.setdiff1d(ids, assignment.get(name, ()), assume_unique=True)
+                    for name, ids in self.assignment.items()}
+        states = await self.collect({name: ('release', ids.tolist()) for name, ids in releases.items() if len(ids)})
+        if self.lost:
+            return True
+        states.update(self.pool)
+        self.pool = {}
+        for name in list(self.leaving):
+            self.workers[name].send('stop')
+            self.drop(name)
+            print(f"Worker {name} left at tick {self.tick}")
+        for name in names:
+            joined = name in self.joining
+            if joined:
+                self.workers[name] = self.joining.pop(name)
+                self.assignment[name] = self.hive_ids[:0]
+            added = np.setdiff1d(assignment[name], self.assignment[name], assume_unique=True).tolist()
+            if joined or added:
+                self.workers[name].send('assign', self.epoch, clock.get_state(),
+                                        {hive_id: states.get(hive_id) for hive_id in added}, False)
+            self.assignment[name] = assignment[name]
+            self.ticks[name] = self.granted[name] = self.tick
+        if not names:
+            self.pool = states  # Everyone left, hold the hives until a worker joins
+        self.start_pacing()
+        moved = sum(len(ids) for ids in releases.values())
+        print(f"Tick {self.tick}: {len(names)} worker(s), {moved} hive(s) moved "
+              f"({', '.join(f'{name}: {len(ids)}' for name, ids in assignment.items())})")
+        return True
+
+    async def take_snapshot(self):
+        states = await self.collect({name: ('snapshot',) for name in self.workers})
+        if self.lost:
+            return
+        self.snapshot = {'clock': clock.get_state(), 'hives': states}
+        self.snapshot_tick = self.tick
+        if self.checkpoint:
+            self.checkpoint.save(self.snapshot)
+        print(f"Tick {self.tick} ({clock.now():%Y-%m-%d %H:%M}): snapshot of {len(states)} hive(s) "
+              f"on {len(self.workers)} worker(s)")
+
+    def rollback(self):
+        """Restart every worker from the last snapshot after one was lost"""
+        self.lost = False
+        self.epoch += 1
+        self.rollbacks += 1
+        self.digests = {}
+        clock.set_state(self.snapshot['clock'])
+        self.tick = clock.ticks
+        self.workers.update(self.joining)
+        self.joining = {}
+        hives = self.snapshot['hives']
+        self.assignment = ShardCoordinator.assign(self.hive_ids, self.workers)
+        for name, ids in self.assignment.items():
+            self.workers[name].send('assign', self.epoch, clock.get_state(),
+                                    {hive_id: hives.get(hive_id) for hive_id in ids.tolist()}, True)
+            self.ticks[name] = self.granted[name] = self.tick
+        self.pool = {} if self.workers else dict(hives)
+        self.start_pacing()
+        print(f"Rolled back to tick {self.tick} with {len(self.workers)} worker(s)")
+
+    async def run(self):
+        """Coordinate workers until they all reach steps, or forever without steps"""
+        self.inbox = asyncio.Queue()
+        server = await asyncio.start_server(self.accept, self.host, self.port)
+        print(f"Coordinator for {len(self.hive_ids)} hives listening on {self.host}:{self.port}, "
+              f"waiting for {self.min_workers} worker(s)")
+        try:
+            while True:
+                if self.lost:
+                    self.rollback()
+                tick = self.barrier() if self.workers else self.tick
+                if tick is not None:
+                    self.tick = tick
+                    while clock.ticks < tick:
+                        clock.advance()
+                    if self.joining or self.leaving:
+                        if await self.rebalance():
+                            continue
+                    elif self.workers and tick % self.snapshot_every == 0 and tick != self.snapshot_tick:
+                        await self.take_snapshot()
+                        continue
+                    elif self.workers and self.steps is not None and tick >= self.steps:
+                        break
+                if self.workers:
+                    self.grant()
+                try:
+                    message = await asyncio.wait_for(self.inbox.get(), clock.wall_seconds_per_tick() or None)
+                except asyncio.TimeoutError:
+                    continue  # Paced, the next tick may be due
+                self.handle(*message)
+            if self.checkpoint:
+                if self.snapshot_tick != self.tick:
+                    await self.take_snapshot()
+                self.checkpoint.close(None if self.lost else self.snapshot)
+        finally:
+            for link in list(self.workers.values()) + list(self.joining.values()):
+                link.send('stop')
+                link.close()
+            server.close()
+            await asyncio.gather(*self.readers, return_exceptions=True)
+        print(f"Finished {len(self.hive_ids)} hives at tick {self.tick} ({clock.now():%Y-%m-%d %H:%M}), "
+              f"{self.rollbacks} rollback(s)")
+
+class LoadGenerator:
+    """Open-loop load test of an ingestion endpoint with bulk requests of realistic readings
+
+    Request bodies are formatted from a HiveFleet as they are needed. Each request is due when
+    the readings before it add up to the target rate, whether or not earlier requests have been
+    answered, and its latency counts from that due time. A slow server therefore shows up in the
+    latencies instead of quietly lowering the load (no coordinated omission).
+    """
+    # Format name -> (content type, body prefix, row template, suffix replacing the last row's separator)
+    FORMATS = {
+        'thingspeak': ('application/json', '{"write_api_key":%s,"updates":[',
+                       '{"created_at":"%s",' + ','.join(f'"{field}":%.2f' for field in Sink.FIELDS) + '},', ']}'),
+        'ndjson': ('application/x-ndjson', '', NDJSONSink.TEMPLATE, '\n'),
+        'line': ('text/plain', '', LineProtocolSink.template(SINK_MEASUREMENT), '\n')
+    }
+
+    def __init__(self, url, rate=LOAD_RATE, hives=LOAD_HIVES, duration=LOAD_DURATION, batch_size=LOAD_BATCH_SIZE,
+                 connections=LOAD_CONNECTIONS, max_in_flight=LOAD_MAX_IN_FLIGHT, payload_format='thingspeak',
+                 seed=None, start=None, api_key=API_KEY, timeout=UPLOAD_TIMEOUT):
+        if payload_format not in LoadGenerator.FORMATS:
+            raise ValueError(f"Unknown load format: {payload_format}")
+        if rate <= 0 or batch_size < 1:
+            raise ValueError("Load rate must be positive and batch size at least 1")
+        self.url = url.format(channel_id=CHANNEL_ID) if '{channel_id}' in url else url
+        self.rate = rate
+        self.hives = hives
+        self.duration = duration
+        self.batch_size = batch_size
+        self.connections = connections
+        self.max_in_flight = max_in_flight
+        self.payload_format = payload_format
+        self.seed = seed
+        self.start = start
+        self.api_key = api_key
+        self.timeout = timeout
+        self.clients = None
+        self.in_flight = 0
+        self.requests = 0
+        self.readings = 0          # Readings in answered 2xx requests
+        self.latencies = []        # Seconds from due time to answer, every answered request
+        self.errors = {}           # Reason -> requests
+        self.max_lag = 0           # Seconds the generator itself started a request late
+
+    def bodies(self):
+        """(body, readings) of up to batch_size readings each, formatted only when requested"""
+        content_type, prefix, template, suffix = LoadGenerator.FORMATS[self.payload_format]
+        if self.payload_format == 'thingspeak':
+            prefix = prefix % json.dumps(self.api_key)
+            columns_of = lambda batch: [Sink.runs(batch.times, datetime.isoformat)] + list(batch.values.T)
+        elif self.payload_format == 'ndjson':
+            columns_of = lambda batch: NDJSONSink.labels(batch) + list(batch.values.T)  # Fleet values are never NaN
+        else:
+            columns_of = LineProtocolSink.columns
+        fleet = HiveFleet(self.hives, self.seed)
+        block_ticks = -(-self.batch_size // self.hives)  # Enough ticks for at least one full request
+        for block in stream_blocks(fleet, block_ticks, self.start, seed=self.seed):
+            ticks = len(block.times)
+            batch = SinkBatch([(t, self.hives) for t in block.times.tolist()], np.tile(block.hive_ids, ticks),
+                              np.column_stack([block.fields[field].ravel() for field in Sink.FIELDS]))
+            columns = columns_of(batch)
+            rows = ticks * self.hives
+            for i in range(0, rows, self.batch_size):
+                j = min(rows, i + self.batch_size)
+                body = prefix + Sink.format_rows(template, [column[i:j] for column in columns])[:-1] + suffix
+                yield body.encode(), j - i
+
+    def fail(self, reason):
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    async def request(self, body, readings, due, content_type):
+        client = await self.clients.get()  # Waiting for a free connection counts towards latency
+        try:
+            status, _, _ = await client.post(self.url, body, content_type)
+            self.latencies.append(time.monotonic() - due)
+            if 200 <= status < 300:
+                self.readings += readings
+            else:
+                self.fail(f"HTTP {status}")
+            if metrics:
+                metrics.inc('beehive_uploads_total', result='success' if 200 <= status < 300 else 'failure')
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            self.fail(type(e).__name__)
+            if metrics:
+                metrics.inc('beehive_uploads_total', result='failure')
+        finally:
+            self.clients.put_nowait(client)
+            self.in_flight -= 1
+
+    async def run(self):
+        """Send load for duration seconds, wait for outstanding answers and return report()"""
+        content_type = LoadGenerator.FORMATS[self.payload_format][0]
+        self.clients = asyncio.Queue()
+        for _ in range(self.connections):
+            self.clients.put_nowait(AsyncHTTPClient(self.timeout))
+        bodies = self.bodies()
+        tasks = set()
+        scheduled = 0  # Readings in requests already due
+        started = time.monotonic()
+        try:
+            while scheduled < self.rate * self.duration:
+                body, readings = next(bodies)
+                due = started + scheduled / self.rate
+                scheduled += readings
+                wait = due - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                else:
+                    self.max_lag = max(self.max_lag, -wait)
+                self.requests += 1
+                if self.in_flight >= self.max_in_flight:
+                    self.fail('overload')  # Server too far behind, the schedule goes on without this request
+                    continue
+                self.in_flight += 1
+                task = asyncio.create_task(self.request(body, readings, due, content_type))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                _, unanswered = await asyncio.wait(tasks, timeout=sum(self.timeout))
+                for _ in unanswered:
+                    self.fail('unanswered')
+            elapsed = time.monotonic() - started
+        finally:
+            for task in tasks:
+                task.cancel()
+            while not self.clients.empty():
+                self.clients.get_nowait().close()
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        """Achieved throughput, latency percentiles in seconds and error counts"""
+        failed = sum(self.errors.values())
+        latencies = np.array(self.latencies)
+        return {
+            'seconds': elapsed,
+            'target_readings_per_sec': self.rate,
+            'readings_per_sec': self.readings / elapsed,
+            'requests_per_sec': self.requests / elapsed,
+            'requests': self.requests,
+            'readings': self.readings,
+            'error_rate': failed / self.requests if self.requests else 0,
+            'errors': dict(self.errors),
+            'latency': {f'p{p:g}': float(np.percentile(latencies, p)) for p in LOAD_PERCENTILES} if len(latencies) else {},
+            'max_latency': float(latencies.max()) if len(latencies) else None,
+            'max_generator_lag': self.max_lag
+        }
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="BeeHive sensor data simulator")
+    parser.add_argument('--clock', choices=[SimulationClock.REALTIME, SimulationClock.ACCELERATED, SimulationClock.FAST],
+                        default=SimulationClock.REALTIME, help="How simulated time is paced against the wall clock")
+    parser.add_argument('--speed', type=float, default=60,
+                        help="Speed-up factor for the accelerated clock (default: 60, one simulated hour per minute)")
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                        help="Simulated start time in ISO format (default: now)")
+    parser.add_argument('--steps', type=int, default=None,
+                        help="Stop after this many one-minute ticks (default: run forever)")
+    parser.add_argument('--missed', choices=[SimulationClock.CATCH_UP, SimulationClock.SKIP],
+                        default=SimulationClock.CATCH_UP,
+                        help="After falling behind the wall clock, run missed ticks back to back or skip them")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Seed for reproducible runs; each hive and subsystem gets its own stream")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Take many-minute steps through quiet stretches: one reading per step in the single-hive "
+                             "loop, exact hive state only for --runs")
+    parser.add_argument('--adaptive-tolerance', type=float, default=ADAPTIVE_TOLERANCE,
+                        help=f"Most a reading may change over the minutes a step skips (default: {ADAPTIVE_TOLERANCE})")
+    parser.add_argument('--adaptive-max-step', type=int, default=ADAPTIVE_MAX_STEP,
+                        help=f"Longest adaptive step in minutes (default: {ADAPTIVE_MAX_STEP})")
+    parser.add_argument('--runs', type=int, default=None,
+                        help="Run this many independent Monte Carlo runs and print outcome percentiles")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="Worker processes for Monte Carlo runs (default: one per CPU)")
+    parser.add_argument('--chunk-size', type=int, default=None, help="Monte Carlo runs handed to a worker at once")
+    parser.add_argument('--no-upload', action='store_true', help="Do not send readings to ThingSpeak")
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help=f"Readings per bulk upload (default: 1 in real time, {UPLOAD_BATCH_SIZE} otherwise)")
+    parser.add_argument('--upload-url', default=None, help="Override the ThingSpeak bulk-update URL")
+    parser.add_argument('--channels', default=None,
+                        help="JSON file mapping hives to ThingSpeak channels, write keys and rate limits")
+    parser.add_argument('--channel-interval', type=float, default=CHANNEL_MIN_INTERVAL,
+                        help=f"Seconds between requests to one channel (default: {CHANNEL_MIN_INTERVAL})")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Upload from concurrent asyncio workers instead of inside the tick loop")
+    parser.add_argument('--hives', type=int, default=None,
+                        help=f"Number of hives simulated by the async runtime (default: 1) or the load generator "
+                             f"(default: {LOAD_HIVES})")
+    parser.add_argument('--regions', type=int, default=1,
+                        help="Weather regions shared by the async runtime's hives, assigned round-robin (default: 1)")
+    parser.add_argument('--region-spacing', type=float, default=10,
+                        help="Distance in km between neighbouring weather regions (default: 10)")
+    parser.add_argument('--no-stagger', action='store_true',
+                        help="Tick all hives at the start of each interval instead of spreading them over it")
+    parser.add_argument('--coordinator', action='store_true',
+                        help="Split --hives over worker processes connecting to --shard-address, advancing in step")
+    parser.add_argument('--worker', action='store_true',
+                        help="Advance the hives a coordinator at --shard-address assigns to this process")
+    parser.add_argument('--shard-address', default=f'127.0.0.1:{SHARD_PORT}',
+                        help=f"HOST:PORT the coordinator listens on and workers connect to (default: 127.0.0.1:{SHARD_PORT})")
+    parser.add_argument('--worker-name', default=None,
+                        help="Name the worker's hive assignment is derived from (default: host name and process id)")
+    parser.add_argument('--min-workers', type=int, default=1,
+                        help="Workers the coordinator waits for before starting (default: 1)")
+    parser.add_argument('--max-skew', type=int, default=SHARD_MAX_SKEW,
+                        help=f"Ticks a worker may run ahead of the slowest one (default: {SHARD_MAX_SKEW}, lock-step)")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent upload requests for the async runtime")
+    parser.add_argument('--queue-size', type=int, default=10000, help="Readings buffered between simulation and upload")
+    parser.add_argument('--outbox', default=OUTBOX_DIR,
+                        help=f"Directory spooling undelivered readings across restarts (default: {OUTBOX_DIR})")
+    parser.add_argument('--store', default=None,
+                        help="Also keep every reading and active event in a columnar series store in this directory")
+    parser.add_argument('--aggregates', default=None,
+                        help="Append hourly and daily summaries of every hive to this NDJSON file")
+    parser.add_argument('--upload-summaries', choices=list(RollingAggregates.WINDOWS), default=None,
+                        help="Upload and write to sinks one summary per hive and hour or day instead of raw readings")
+    parser.add_argument('--no-outbox', action='store_true', help="Keep undelivered readings in memory only")
+    parser.add_argument('--sink', action='append', default=[],
+                        help="Also write readings to ndjson:PATH, csv:PATH, line:PATH, unix:PATH, tcp:HOST:PORT "
+                             "or udp:HOST:PORT; repeat for several outputs")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Snapshot file; resume from it at startup and keep it up to date while running")
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY,
+                        help=f"Ticks between snapshots (default: {CHECKPOINT_EVERY})")
+    parser.add_argument('--journal', default=None,
+                        help="Append event starts and ends and uploads to this binary event journal")
+    parser.add_argument('--event-index', default=None,
+                        help="Keep an interval index of every event in this .npz file for time-range queries")
+    parser.add_argument('--log-level', choices=list(EventJournal.LEVELS), default='info',
+                        help="Lowest level kept in the journal (default: info, every event)")
+    parser.add_argument('--console-level', choices=list(EventJournal.LEVELS), default='warning',
+                        help="Lowest level also printed (default: warning, failed uploads; info shows every event)")
+    parser.add_argument('--load', default=None, metavar='URL',
+                        help="Load-test this endpoint with open-loop bulk requests instead of simulating in time")
+    parser.add_argument('--load-rate', type=float, default=LOAD_RATE,
+                        help=f"Target readings per second for --load (default: {LOAD_RATE})")
+    parser.add_argument('--load-duration', type=float, default=LOAD_DURATION,
+                        help=f"Seconds of load (default: {LOAD_DURATION})")
+    parser.add_argument('--load-format', choices=list(LoadGenerator.FORMATS), default='thingspeak',
+                        help="Request body format for --load (default: thingspeak bulk JSON)")
+    parser.add_argument('--load-connections', type=int, default=LOAD_CONNECTIONS,
+                        help=f"Keep-alive connections used by --load (default: {LOAD_CONNECTIONS})")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Record stage timings and counters, serve them for Prometheus and log a summary")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help=f"Local port of the /metrics endpoint (default: {METRICS_PORT})")
+    parser.add_argument('--metrics-interval', type=float, default=METRICS_LOG_INTERVAL,
+                        help=f"Seconds between metrics summary lines (default: {METRICS_LOG_INTERVAL})")
+    parser.add_argument('--backpressure', choices=[AsyncRuntime.BLOCK, AsyncRuntime.DROP_OLDEST, AsyncRuntime.SPILL],
+                        default=AsyncRuntime.BLOCK, help="What to do when the upload queue is full")
+    args = parser.parse_args(argv)
+    if args.coordinator and args.event_index:
+        # Events happen in the workers, each of which keeps its own index
+        parser.error("--event-index is recorded by each --worker, not by the --coordinator")
+    if args.adaptive and (args.store or args.aggregates or args.upload_summaries):
+        # Both expect one reading per minute; an adaptive step would leave gaps and weigh as one minute
+        parser.error("--adaptive cannot be combined with --store, --aggregates or --upload-summaries")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("Starting BeeHive Simulator...")
+    print("Press Ctrl+C to stop")
+    
+    global clock, weather, hive_weight, metrics, journal
+    clock = SimulationClock(args.clock, args.speed, args.start, missed=args.missed)
+    if args.runs:
+        runner = MonteCarloRunner(args.runs, args.steps or MONTE_CARLO_STEPS, args.start, args.seed,
+                                  args.processes, args.chunk_size, args.adaptive)
+        records, summary = runner.run()
+        for field, stats in summary.items():
+            if stats is None:
+                print(f"{field}: no runs")
+                continue
+            percentiles = ', '.join(f"{name}={value:.2f}" for name, value in stats.items() if name.startswith('p'))
+            print(f"{field}: mean={stats['mean']:.2f}, {percentiles}")
+        return
+    
+    if args.metrics:
+        metrics = Metrics(args.metrics_interval)
+        port = metrics.serve(args.metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+    
+    if args.load:
+        generator = LoadGenerator(args.load, args.load_rate, args.hives or LOAD_HIVES, args.load_duration,
+                                  args.batch_size or LOAD_BATCH_SIZE, args.load_connections,
+                                  payload_format=args.load_format, seed=args.seed, start=args.start)
+        report = asyncio.run(generator.run())
+        print(f"Sent {report['requests']} requests in {report['seconds']:.1f}s: "
+              f"{report['readings_per_sec']:,.0f} readings/s accepted (target {report['target_readings_per_sec']:,.0f}), "
+              f"{report['requests_per_sec']:,.0f} requests/s")
+        if report['latency']:
+            latency = ', '.join(f"{name}={value * 1e3:.1f}ms" for name, value in report['latency'].items())
+            print(f"Latency from due time: {latency}, max={report['max_latency'] * 1e3:.1f}ms")
+        print(f"Errors: {report['error_rate']:.2%} {report['errors'] or ''}")
+        if report['max_generator_lag'] > 0.1:
+            print(f"The generator itself ran up to {report['max_generator_lag']:.2f}s behind schedule")
+        return
+    
+    journal = EventJournal(args.journal, EventJournal.LEVELS[args.log_level], EventJournal.LEVELS[args.console_level])
+    if args.event_index:
+        # Continue an existing index; events that were still active are recorded again when they end
+        if os.path.exists(args.event_index):
+            journal.index = EventIndex.load(args.event_index, keep_open=False)
+        else:
+            journal.index = EventIndex(args.event_index)
+    
+    sinks = [Sink.from_spec(spec) for spec in args.sink]
+    sink = FanOutSink(sinks) if len(sinks) > 1 else (sinks[0] if sinks else None)
+    
+    checkpoint = Checkpointer(args.checkpoint, args.checkpoint_every) if args.checkpoint else None
+    keep_time = args.clock == SimulationClock.REALTIME  # Real time cannot jump back to the snapshot
+    
+    if args.coordinator or args.worker:
+        host, _, port = args.shard_address.rpartition(':')
+        if args.coordinator:
+            runner = ShardCoordinator(args.hives or 1, seed=args.seed, regions=args.regions,
+                                      region_spacing=args.region_spacing, steps=args.steps, max_skew=args.max_skew,
+                                      host=host, port=int(port), min_workers=args.min_workers,
+                                      snapshot_every=args.checkpoint_every, checkpoint=checkpoint, keep_time=keep_time)
+        else:
+            runner = ShardWorker(host, int(port), name=args.worker_name, sink=sink)
+        try:
+            asyncio.run(runner.run())
+        finally:
+            if journal.index:
+                journal.index.save(runner.hives.values())  # Events of the hives this worker held
+            journal.close()
+        return
+    
+    batch_size = args.batch_size or (1 if args.clock == SimulationClock.REALTIME else UPLOAD_BATCH_SIZE)
+    outbox = None if args.no_upload or args.no_outbox else Outbox(args.outbox)
+    
+    if args.channels:
+        channels = ChannelRegistry.load(args.channels, args.channel_interval)
+    else:
+        channels = ChannelRegistry(interval=args.channel_interval)
+    
+    aggregates = None
+    if args.aggregates or args.upload_summaries:
+        windows = (args.upload_summaries,) if args.upload_summaries and not args.aggregates else ('hour', 'day')
+        aggregates = RollingAggregates(range(args.hives or 1) if args.use_async else [0], windows, args.aggregates)
+    
+    if args.use_async:
+        # Hives of one region share its sky, regions are spaced along a line
+        regional_weather = RegionalWeather({region: (region * args.region_spacing, 0) for region in range(args.regions)},
+                                           seed=args.seed)
+        n_hives = args.hives or 1
+        hives = [Hive(i, *channels.channel(i), seed=args.seed, weather=regional_weather.region(i % args.regions))
+                 for i in range(n_hives)]
+        if checkpoint:
+            checkpoint.resume(hives, keep_time)
+        runtime = AsyncRuntime(hives, workers=args.workers,
+                               queue_size=args.queue_size, policy=args.backpressure, batch_size=batch_size,
+                               url=args.upload_url, outbox=outbox, steps=args.steps,
+                               store=SeriesStore(args.store, range(n_hives)) if args.store else None,
+                               checkpoint=checkpoint, stagger=not args.no_stagger, channels=channels, sink=sink,
+                               aggregates=aggregates, summaries=args.upload_summaries)
+        try:
+            asyncio.run(runtime.run())
+        finally:
+            if journal.index:
+                journal.index.save(hives)
+            journal.close()
+        return
+    
+    hive = Hive(0, *channels.channel(0), seed=args.seed)
+    weather = hive.weather
+    hive_weight = hive.weight
+    stepper = AdaptiveStepper(hive, args.adaptive_tolerance, args.adaptive_max_step) if args.adaptive else None
+    store = SeriesStore(args.store, [hive.hive_id]) if args.store else None
+    if checkpoint:
+        checkpoint.resume([hive], keep_time)
+    
+    uploader = None
+    if not args.no_upload:
+        uploader = ThingSpeakUploader(hive.api_key, hive.channel_id, batch_size=batch_size, url=args.upload_url,
+                                      outbox=outbox, bucket=channels.bucket(Channel(hive.channel_id, hive.api_key)))
+        uploader.replay()
+    
+    def publish(reading):
+        if sink:
+            sink.write(reading)
+        if uploader:
+            uploader.add(reading.data, reading.created_at)
+    
+    ticks_before = clock.ticks
+    clock.start()
+    try:
+        while args.steps is None or clock.ticks < args.steps:
+            ticks_before = clock.ticks
+            if stepper:
+                # A reading for the last minute of each step, which may be many minutes long
+                reading, minutes = stepper.step(clock.now(), None if args.steps is None else args.steps - clock.ticks)
+            else:
+                reading, minutes = hive.tick(TickContext()), None
+            if store:
+                store.append(reading, hive.events.active_mask)
+            closed = ()
+            if aggregates:
+                closed = aggregates.add(reading.hive_id, reading.created_at, reading.data, hive.events.active_mask)
+            if args.upload_summaries:
+                for summary in closed:
+                    if summary.window == args.upload_summaries:
+                        publish(RollingAggregates.as_reading(summary))
+            else:
+                publish(reading)
+            if metrics:
+                metrics.maybe_log()
+            clock.tick(minutes)  # Wait for the next simulated minute, or the end of the step
+            if checkpoint and checkpoint.due():
+                checkpoint.save(Checkpointer.capture([hive]))
+    finally:
+        if aggregates:
+            for summary in aggregates.close():
+                if summary.window == args.upload_summaries:
+                    publish(RollingAggregates.as_reading(summary))  # Partial window cut short by the end of the run
+        if uploader:
+            uploader.close()
+        if store:
+            store.close()
+        if sink:
+            sink.close()
+        if journal.index:
+            journal.index.save([hive])
+        journal.close()
+        if checkpoint:
+            # A tick cut short by Ctrl+C is not saved, the last periodic snapshot stays
+            checkpoint.close(Checkpointer.capture([hive]) if clock.ticks != ticks_before else None)
 
 if __name__ == "__main__":
-    main() 
+    main()
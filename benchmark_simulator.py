@@ -0,0 +1,272 @@
+"""Benchmarks for the simulation hot path, compared against a stored baseline
+
+Runs without network access or sleeping. Results can be compared against a baseline written
+earlier as JSON, on the same machine and environment:
+
+    python benchmark_simulator.py --output bench.json
+    python benchmark_simulator.py --baseline bench.json --tolerance 0.2
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import beehive_simulator as sim
+
+SUMMER_NOON = datetime(2025, 7, 1, 12, 0)
+SPRING_MORNING = datetime(2025, 4, 15, 8, 0)
+YEAR_START = datetime(2025, 1, 1)
+
+# Reference results committed with the code, only compared against when --baseline names them;
+# recorded on one machine, so other machines and environments need a baseline of their own
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Events that can all be active together in spring
+SPRING_EVENTS = ['spring_buildup', 'brood_rearing', 'pollen_collection', 'nectar_flow',
+                 'propolis_collection', 'ventilation', 'varroa_infestation', 'nosema']
+
+def contexts(start, minutes):
+    """TickContexts for consecutive minutes, built before timing starts"""
+    return [sim.TickContext(start + timedelta(minutes=i)) for i in range(minutes)]
+
+def busy_hive(start, seed=1):
+    """Hive whose SPRING_EVENTS never end"""
+    hive = sim.Hive(0, seed=seed, start=start)
+    hive.events.check_seasonal_transition(sim.TickContext(start))
+    for event in SPRING_EVENTS:
+        if hive.events.is_event_compatible(event):
+            hive.events.add_event(event)
+            hive.events.event_durations[event] = 10 ** 9
+    return hive
+
+# Every benchmark does its setup and returns (operations, run); only run() is timed.
+# Hives and weather start at the benchmark's first tick, so their weather updates as it would in a run
+
+def bench_simulate_sensors():
+    hive = sim.Hive(0, seed=1, start=SUMMER_NOON)
+    ctxs = contexts(SUMMER_NOON, 20000)
+    def run():
+        for ctx in ctxs:
+            sim.simulate_sensors(hive.events, hive.weather, hive.weight, ctx, hive.streams.sensors)
+    return len(ctxs), run
+
+def bench_get_event_effects():
+    events = busy_hive(SPRING_MORNING).events
+    n = 100000
+    def run():
+        for _ in range(n):
+            events.get_event_effects()
+    return n, run
+
+def bench_check_for_new_event():
+    events = sim.Hive(0, seed=1, start=SUMMER_NOON).events
+    ctxs = contexts(SUMMER_NOON, 50000)
+    def run():
+        for ctx in ctxs:
+            events.check_for_new_event(ctx)
+            events.update()
+    return len(ctxs), run
+
+def bench_update_weight():
+    weight = sim.HiveWeight()
+    events = busy_hive(SPRING_MORNING).events.current_events
+    n = 100000
+    def run():
+        for _ in range(n):
+            weight.update_weight(events, sim.WeatherPattern.CLEAR, 0.8, sim.Season.SPRING)
+    return n, run
+
+def bench_hive_tick():
+    hive = sim.Hive(0, seed=1, start=SUMMER_NOON)
+    ctxs = contexts(SUMMER_NOON, 20000)
+    def run():
+        for ctx in ctxs:
+            hive.tick(ctx)
+    return len(ctxs), run
+
+def bench_hive_tick_spring_busy():
+    hive = busy_hive(SPRING_MORNING)
+    ctxs = contexts(SPRING_MORNING, 20000)
+    def run():
+        for ctx in ctxs:
+            hive.tick(ctx)
+    return len(ctxs), run
+
+def fleet_benchmark(n_hives, ticks):
+    def bench():
+        fleet = sim.HiveFleet(n_hives, seed=1)
+        weather = sim.WeatherConditions(sim.RandomStream(np.random.SeedSequence(1)), start=SUMMER_NOON)
+        ctxs = contexts(SUMMER_NOON, ticks)
+        def run():
+            for ctx in ctxs:
+                fleet.step(weather, ctx)
+        return n_hives * ticks, run  # Hive-ticks
+    return bench
+
+def sink_benchmark(sink_class):
+    def bench():
+        # Formatting only, written to the null device
+        fleet = sim.HiveFleet(10000, seed=1)
+        weather = sim.WeatherConditions(sim.RandomStream(np.random.SeedSequence(1)), start=SUMMER_NOON)
+        ctx = sim.TickContext(SUMMER_NOON)
+        readings = fleet.step(weather, ctx)
+        ticks = 20
+        def run():
+            sink = sink_class(os.devnull)
+            for _ in range(ticks):
+                sink.write_fleet(ctx.now, fleet.hive_ids, readings)
+            sink.close()
+        return fleet.n_hives * ticks, run  # Readings
+    return bench
+
+def bench_sink_readings():
+    hive = sim.Hive(0, seed=1, start=SUMMER_NOON)
+    readings = [hive.tick(ctx) for ctx in contexts(SUMMER_NOON, 1000)] * 100
+    def run():
+        sink = sim.NDJSONSink(os.devnull)
+        for reading in readings:
+            sink.write(reading)
+        sink.close()
+    return len(readings), run
+
+def bench_aggregates_fleet():
+    fleet = sim.HiveFleet(10000, seed=1)
+    weather = sim.WeatherConditions(sim.RandomStream(np.random.SeedSequence(1)), start=SUMMER_NOON)
+    readings = fleet.step(weather, sim.TickContext(SUMMER_NOON))
+    masks = fleet.event_masks()
+    ctxs = contexts(SUMMER_NOON, 100)
+    def run():
+        aggregates = sim.RollingAggregates(fleet.hive_ids)
+        for ctx in ctxs:
+            aggregates.add_fleet(ctx.now, readings, masks)
+        aggregates.close()
+    return fleet.n_hives * len(ctxs), run  # Readings
+
+def bench_full_year():
+    hive = sim.Hive(0, seed=1, start=YEAR_START)
+    minutes = (datetime(YEAR_START.year + 1, 1, 1) - YEAR_START) // timedelta(minutes=1)
+    def run():
+        # TickContexts are built inside the loop, like the real main loop
+        now = YEAR_START
+        step = timedelta(minutes=1)
+        for _ in range(minutes):
+            hive.tick(sim.TickContext(now))
+            now += step
+    return minutes, run
+
+def bench_full_year_adaptive():
+    stepper = sim.AdaptiveStepper(sim.Hive(0, seed=1, start=YEAR_START))
+    minutes = (datetime(YEAR_START.year + 1, 1, 1) - YEAR_START) // timedelta(minutes=1)
+    def run():
+        now = YEAR_START
+        done = 0
+        while done < minutes:
+            _, step = stepper.step(now, minutes - done)
+            now += timedelta(minutes=step)
+            done += step
+    return minutes, run  # Simulated minutes, like full_year
+
+BENCHMARKS = {
+    'simulate_sensors': bench_simulate_sensors,
+    'get_event_effects_spring_busy': bench_get_event_effects,
+    'check_for_new_event': bench_check_for_new_event,
+    'update_weight_spring_busy': bench_update_weight,
+    'hive_tick': bench_hive_tick,
+    'hive_tick_spring_busy': bench_hive_tick_spring_busy,
+    'fleet_1': fleet_benchmark(1, 2000),
+    'fleet_1k': fleet_benchmark(1000, 500),
+    'fleet_100k': fleet_benchmark(100000, 20),
+    'sink_ndjson_fleet': sink_benchmark(sim.NDJSONSink),
+    'sink_csv_fleet': sink_benchmark(sim.CSVSink),
+    'sink_line_protocol_fleet': sink_benchmark(sim.LineProtocolSink),
+    'sink_ndjson_readings': bench_sink_readings,
+    'aggregates_fleet': bench_aggregates_fleet,
+    'full_year': bench_full_year,
+    'full_year_adaptive': bench_full_year_adaptive,
+}
+
+# Too slow to repeat
+SINGLE_RUN = {'full_year', 'full_year_adaptive'}
+
+def run_benchmark(name, repeat):
+    """Best of repeat timed runs, each on fresh state"""
+    best = None
+    for _ in range(1 if name in SINGLE_RUN else repeat):
+        operations, run = BENCHMARKS[name]()
+        started = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - started
+        if best is None or seconds < best:
+            best = seconds
+    return {'operations': operations, 'seconds': best, 'ops_per_sec': operations / best}
+
+def compare(results, baseline, tolerance):
+    """Names of benchmarks slower than their baseline by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get('results', {}).get(name)
+        if not expected:
+            continue
+        ratio = result['ops_per_sec'] / expected['ops_per_sec']
+        result['baseline_ops_per_sec'] = expected['ops_per_sec']
+        result['ratio'] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the BeeHive simulator hot path")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument('--skip', nargs='+', choices=list(BENCHMARKS), default=[], help="Leave out these benchmarks")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark, the best one counts")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file")
+    parser.add_argument('--baseline', default=None,
+                        help="Compare against results saved earlier with --output on the same machine")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed slowdown against the baseline as a fraction (default: 0.2)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name for name in (args.only or BENCHMARKS) if name not in args.skip]
+
+    results = {}
+    for name in names:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):  # Mute console messages
+            results[name] = run_benchmark(name, args.repeat)
+        print(f"{name:32} {results[name]['ops_per_sec']:>14,.0f} ops/s  ({results[name]['seconds']:.3f}s)")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name in names:
+            if 'ratio' in results[name]:
+                status = 'REGRESSION' if name in regressions else 'ok'
+                print(f"{name:32} {results[name]['ratio']:6.2f}x baseline  {status}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+                'results': results
+            }, f, indent=2)
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
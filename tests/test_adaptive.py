@@ -0,0 +1,73 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1)
+
+def minute_readings(seed, minutes):
+    hive = sim.Hive(0, seed=seed, start=START)
+    readings = {}
+    for i in range(minutes):
+        reading = hive.tick(sim.TickContext(START + timedelta(minutes=i)))
+        readings[reading.created_at] = reading.data
+    return hive, readings
+
+@pytest.mark.parametrize('tolerance', [sim.ADAPTIVE_TOLERANCE, math.inf])
+def test_steps_land_on_the_minute_run(tolerance):
+    minutes = 3 * 1440
+    hive, expected = minute_readings(7, minutes)
+    stepper = sim.AdaptiveStepper(sim.Hive(0, seed=7, start=START), tolerance)
+    now = START
+    done = 0
+    while done < minutes:
+        reading, step = stepper.step(now, minutes - done)
+        now += timedelta(minutes=step)
+        done += step
+        for field, value in reading.data.items():
+            assert value == pytest.approx(expected[reading.created_at][field], abs=0.011)
+    assert done == minutes and stepper.steps < minutes / 2
+    assert stepper.hive.weight.honey_stores == pytest.approx(hive.weight.honey_stores)
+    assert stepper.hive.weather.current_temp == pytest.approx(hive.weather.current_temp)
+
+def test_adaptive_refuses_per_minute_outputs():
+    for flag in (['--store', 'store'], ['--aggregates', 'aggregates.ndjson'], ['--upload-summaries', 'hour']):
+        with pytest.raises(SystemExit):
+            sim.parse_args(['--adaptive'] + flag)
+    assert sim.parse_args(['--adaptive', '--sink', 'csv:out.csv']).adaptive
+
+def day_end_state(hive):
+    """Everything a hive carries into the next day, split into exact and floating-point parts"""
+    events = hive.events
+    exact = (sorted(events.current_events), dict(events.event_times), dict(events.event_durations),
+             dict(events.daily_event_checks), events.minutes_to_next_event, events.last_season,
+             hive.weather.weather_pattern.current_pattern, hive.weather.last_target_update,
+             hive.streams.get_state())
+    floats = [getattr(hive.weight, name) for name in sim.HiveFleet.WEIGHT_STATE]
+    floats += [hive.weather.current_temp, hive.weather.current_humidity,
+               hive.weather.target_temp, hive.weather.target_humidity]
+    return exact, floats
+
+@pytest.mark.parametrize('tolerance', [sim.ADAPTIVE_TOLERANCE, math.inf])
+def test_state_at_every_midnight_matches_minute_ticks(tolerance):
+    start = datetime(2025, 5, 26)  # Spring into summer
+    hive = sim.Hive(0, seed=11, start=start)
+    stepper = sim.AdaptiveStepper(sim.Hive(0, seed=11, start=start), tolerance)
+    now = start
+    for day in range(10):
+        midnight = start + timedelta(days=day + 1)
+        while now < midnight:
+            hive.tick(sim.TickContext(now))
+            now += timedelta(minutes=1)
+        stepped = midnight - timedelta(days=1)
+        while stepped < midnight:
+            _, step = stepper.step(stepped, (midnight - stepped) // timedelta(minutes=1))
+            stepped += timedelta(minutes=step)
+        assert stepped == midnight
+        exact, floats = day_end_state(hive)
+        stepper_exact, stepper_floats = day_end_state(stepper.hive)
+        assert stepper_exact == exact
+        assert stepper_floats == pytest.approx(floats, rel=1e-9, abs=1e-9)
+    assert stepper.steps < 10 * 1440 / 3
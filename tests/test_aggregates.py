@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1, 22, 30)
+MINUTES = 4 * 60  # Across midnight, into 02:30
+MINUTE = timedelta(minutes=1)
+
+def run(buffer_size):
+    """Summaries emitted while two hives' readings are added, and every reading with its event mask"""
+    hives = [sim.Hive(i, seed=9, start=START) for i in range(2)]
+    aggregates = sim.RollingAggregates([0, 1], buffer_size=buffer_size)
+    summaries, readings = [], []
+    for i in range(MINUTES):
+        ctx = sim.TickContext(START + i * MINUTE)
+        for hive in hives:
+            reading = hive.tick(ctx)
+            readings.append((reading, hive.events.active_mask))
+            summaries.extend(aggregates.add(hive.hive_id, reading.created_at, reading.data, hive.events.active_mask))
+    return summaries, aggregates.close(), readings
+
+def expected(readings, hive_id, window, start):
+    """Summary of one window computed from the raw readings"""
+    length = sim.RollingAggregates.WINDOWS[window]
+    inside = [(r, mask) for r, mask in readings if r.hive_id == hive_id and start <= r.created_at < start + length]
+    before = [r for r, _ in readings if r.hive_id == hive_id and r.created_at < start]
+    values = np.array([[r.data[f] for f in sim.RollingAggregates.FIELDS] for r, _ in inside])
+    weight = inside[-1][0].data['field5']
+    base = before[-1].data['field5'] if before else inside[0][0].data['field5']
+    minutes = {}
+    for _, mask in inside:
+        for event, bit in sim.EVENT_REGISTRY.bits.items():
+            if mask & bit:
+                minutes[event] = minutes.get(event, 0) + 1
+    return len(inside), values.min(axis=0), values.max(axis=0), values.mean(axis=0), weight, weight - base, minutes
+
+@pytest.mark.parametrize('buffer_size', [1, 7, 10000])
+def test_windows_match_the_raw_readings(buffer_size):
+    summaries, partial, readings = run(buffer_size)
+    # Hours closed at 23:00, 00:00, 01:00 and 02:00, the day at midnight; 02:00 and the new day are partial
+    closed = sorted((s.window, s.start, s.hive_id) for s in summaries)
+    hours = [datetime(2025, 5, 1, 22), datetime(2025, 5, 1, 23), datetime(2025, 5, 2, 0), datetime(2025, 5, 2, 1)]
+    assert closed == sorted([('hour', h, i) for h in hours for i in (0, 1)] +
+                            [('day', datetime(2025, 5, 1), i) for i in (0, 1)])
+    assert sorted((s.window, s.start, s.hive_id) for s in partial) == sorted(
+        [('hour', datetime(2025, 5, 2, 2), i) for i in (0, 1)] + [('day', datetime(2025, 5, 2), i) for i in (0, 1)])
+    for s in summaries + partial:
+        count, low, high, mean, weight, delta, minutes = expected(readings, s.hive_id, s.window, s.start)
+        assert s.minutes == count
+        assert s.min == pytest.approx(tuple(low)) and s.max == pytest.approx(tuple(high))
+        assert s.mean == pytest.approx(tuple(mean))
+        assert s.weight == pytest.approx(weight) and s.weight_delta == pytest.approx(delta, abs=1e-9)
+        assert s.event_minutes == minutes
+    assert any(s.event_minutes for s in summaries)
+
+def test_a_reading_on_the_hour_opens_the_next_window():
+    aggregates = sim.RollingAggregates([0], windows=('hour',))
+    data = {'field1': 1, 'field2': 2, 'field3': 3, 'field4': 4, 'field5': 30}
+    assert aggregates.add(0, datetime(2025, 5, 1, 10, 59), data) == []
+    closed = aggregates.add(0, datetime(2025, 5, 1, 11, 0), data)
+    assert [(s.start, s.minutes) for s in closed] == [(datetime(2025, 5, 1, 10), 1)]
+    assert [(s.start, s.minutes) for s in aggregates.close()] == [(datetime(2025, 5, 1, 11), 1)]
+
+def test_fleet_ticks_match_single_readings():
+    fleet = sim.HiveFleet(3, seed=4)
+    weather = sim.WeatherConditions(sim.RandomStream(np.random.SeedSequence(4)), start=START)
+    by_fleet = sim.RollingAggregates(fleet.hive_ids.tolist())
+    by_reading = sim.RollingAggregates(fleet.hive_ids.tolist(), buffer_size=5)
+    summaries = [], []
+    for i in range(MINUTES):
+        now = START + i * MINUTE
+        readings = fleet.step(weather, sim.TickContext(now))
+        masks = fleet.event_masks()
+        summaries[0].extend(by_fleet.add_fleet(now, readings, masks))
+        for row, hive_id in enumerate(fleet.hive_ids.tolist()):
+            data = {field: float(np.broadcast_to(values, fleet.n_hives)[row]) for field, values in readings.items()}
+            summaries[1].extend(by_reading.add(hive_id, now, data, int(masks[row])))
+    summaries[0].extend(by_fleet.close())
+    summaries[1].extend(by_reading.close())
+    assert len(summaries[0]) == len(summaries[1]) == 3 * 7
+    for a, b in zip(*summaries):
+        assert a[:4] == b[:4] and a.event_minutes == b.event_minutes
+        assert a.mean == pytest.approx(b.mean) and a.weight_delta == pytest.approx(b.weight_delta)
@@ -0,0 +1,30 @@
+import json
+
+import benchmark_simulator as bench
+
+NAME = 'get_event_effects_spring_busy'
+
+def baseline_file(tmp_path, ops_per_sec):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps({'results': {NAME: {'ops_per_sec': ops_per_sec}}}))
+    return str(path)
+
+def test_committed_baseline_covers_every_benchmark():
+    with open(bench.BASELINE) as f:
+        baseline = json.load(f)
+    assert set(baseline['results']) == set(bench.BENCHMARKS)
+
+def test_regression_against_the_baseline_fails(tmp_path):
+    assert bench.main(['--only', NAME, '--repeat', '1', '--baseline', baseline_file(tmp_path, 1e12)]) == 1
+
+def test_no_regression_passes(tmp_path):
+    assert bench.main(['--only', NAME, '--repeat', '1', '--baseline', baseline_file(tmp_path, 1)]) == 0
+
+def test_nothing_is_compared_without_a_baseline(monkeypatch):
+    monkeypatch.setattr(bench, 'compare', lambda *args: [NAME])
+    assert bench.main(['--only', NAME, '--repeat', '1']) == 0
+
+def test_compare_ignores_benchmarks_missing_from_the_baseline():
+    results = {NAME: {'ops_per_sec': 10}, 'hive_tick': {'ops_per_sec': 10}}
+    assert bench.compare(results, {'results': {NAME: {'ops_per_sec': 20}}}, 0.2) == [NAME]
+    assert results[NAME]['ratio'] == 0.5 and 'ratio' not in results['hive_tick']
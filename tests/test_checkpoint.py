@@ -0,0 +1,60 @@
+import pickle
+from datetime import datetime, timedelta
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1)
+
+def run(hives, first, minutes):
+    readings = []
+    for i in range(first, first + minutes):
+        ctx = sim.TickContext(START + timedelta(minutes=i))
+        readings.extend(hive.tick(ctx).data for hive in hives)
+    return readings
+
+def regional_hives(n):
+    weather = sim.RegionalWeather({region: (region * 10, 0) for region in range(3)}, seed=4, start=START)
+    return [sim.Hive(i, seed=4, weather=weather.region(i % 3)) for i in range(n)]
+
+def test_snapshot_is_compact():
+    hives = [sim.Hive(i, seed=1, start=START) for i in range(200)]
+    run(hives, 0, 30)
+    data = pickle.dumps(sim.Checkpointer.capture(hives), protocol=pickle.HIGHEST_PROTOCOL)
+    assert len(data) < 1000 * len(hives)
+
+def test_restored_run_matches_uninterrupted_run():
+    # Long enough for every random stream to draw new blocks after the restore
+    hives = [sim.Hive(i, seed=2, start=START) for i in range(5)]
+    run(hives, 0, 700)
+    state = pickle.loads(pickle.dumps(sim.Checkpointer.capture(hives)))
+    expected = run(hives, 700, 1500)
+
+    restored = [sim.Hive(i, seed=2, start=START) for i in range(5)]
+    assert sim.Checkpointer.restore(state, restored) == 5
+    assert run(restored, 700, 1500) == expected
+
+def test_restored_regional_run_matches_uninterrupted_run(monkeypatch):
+    hives = regional_hives(6)
+    run(hives, 0, 500)
+    state = pickle.loads(pickle.dumps(sim.Checkpointer.capture(hives)))
+    expected = run(hives, 500, 1000)
+
+    restored = regional_hives(6)
+    calls = []
+    set_state = sim.RegionalWeather.set_state
+    monkeypatch.setattr(sim.RegionalWeather, 'set_state', lambda self, state: calls.append(self) or set_state(self, state))
+    sim.Checkpointer.restore(state, restored)
+    assert len(calls) == 1
+    assert run(restored, 500, 1000) == expected
+
+def test_skip_after_restore_matches_skip_without_one():
+    stream = sim.RandomStream(sim.np.random.SeedSequence(3))
+    for _ in range(1500):
+        stream.random()
+    restored = sim.RandomStream(sim.np.random.SeedSequence(3))
+    restored.set_state(stream.get_state())
+    for n in (0, 10, 2000):
+        stream.skip(n)
+        restored.skip(n)
+        assert restored.get_state() == stream.get_state()
+        assert restored.random() == stream.random()
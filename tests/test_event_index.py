@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1)
+MINUTE = timedelta(minutes=1)
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    journal = sim.EventJournal(str(tmp_path / 'events.journal'))
+    journal.index = sim.EventIndex()
+    monkeypatch.setattr(sim, 'journal', journal)
+    yield journal
+    journal.close()
+
+def test_simulated_events_are_active_up_to_their_last_minute(journal):
+    hive = sim.Hive(0, seed=2, start=START)
+    for i in range(3 * 1440):
+        hive.tick(sim.TickContext(START + i * MINUTE))
+    journal.close()
+    from_journal = sim.EventIndex.from_journal(journal.path)
+    starts = sim.EventJournal.read(journal.path, kind=sim.EventJournal.EVENT_START)
+    ends = sim.EventJournal.read(journal.path, kind=sim.EventJournal.EVENT_END)
+    assert len(ends) > 5
+    for index in (journal.index, from_journal):
+        for record in ends:
+            event = sim.EVENT_REGISTRY.events[record['code']]
+            start, end = record['start'].astype(datetime), record['end'].astype(datetime)
+            assert list(index.active_at(event, end - MINUTE)) == [0]
+            assert list(index.active_at(event, end)) == []
+            assert len(index.intervals(event, end - MINUTE, end)) == 1
+            assert len(index.intervals(event, end, end + MINUTE)) == 0
+            started = starts[(starts['code'] == record['code']) & (starts['start'] == record['start'])]
+            assert started['end'][0].astype(datetime) == end
+
+def test_overlap_needs_a_shared_minute():
+    t = datetime(2025, 6, 1, 10, 0)
+    index = sim.EventIndex()
+    index.add(1, 'nectar_flow', t, t + 30 * MINUTE)
+    index.add(1, 'pollen_collection', t + 30 * MINUTE, t + 60 * MINUTE)  # Starts as nectar_flow ends
+    index.add(2, 'nectar_flow', t, t + 30 * MINUTE)
+    index.add(2, 'pollen_collection', t + 29 * MINUTE, t + 60 * MINUTE)  # Shares nectar_flow's last minute
+    assert list(index.overlapping('nectar_flow', 'pollen_collection')) == [2]
+    assert list(index.overlapping('pollen_collection', 'nectar_flow')) == [2]
+    assert list(index.active_at('nectar_flow', t + 29 * MINUTE)) == [1, 2]
+    assert list(index.active_at('nectar_flow', t + 30 * MINUTE)) == []
+    assert list(index.hives(['pollen_collection'], t, t + 30 * MINUTE)) == [2]
+
+def test_fleet_events_are_indexed_like_hive_events(journal):
+    fleet = sim.HiveFleet(20, seed=3)
+    weather = sim.WeatherConditions(sim.RandomStream(sim.np.random.SeedSequence(3)), start=START)
+    shown = {}  # (hive, event code) -> minutes whose readings show the event
+    for i in range(2 * 1440):
+        now = START + i * MINUTE
+        fleet.step(weather, sim.TickContext(now))
+        for row, column in zip(*sim.np.nonzero(fleet.active)):
+            code = sim.EVENT_REGISTRY.events.index(sim.HiveFleet.EVENT_TYPES[column])
+            shown.setdefault((int(fleet.hive_ids[row]), code), set()).add(now)
+    journal.close()
+    ends = sim.EventJournal.read(journal.path, kind=sim.EventJournal.EVENT_END)
+    starts = sim.EventJournal.read(journal.path, kind=sim.EventJournal.EVENT_START)
+    assert len(ends) > 20 and len(starts) >= len(ends)
+    for record in ends:
+        event = sim.EVENT_REGISTRY.events[record['code']]
+        start, end = record['start'].astype(datetime), record['end'].astype(datetime)
+        minutes = shown[int(record['hive']), int(record['code'])]
+        assert all(start + k * MINUTE in minutes for k in range(int(record['duration'])))
+        assert end not in minutes
+        assert int(record['hive']) in journal.index.active_at(event, end - MINUTE)
+        started = starts[(starts['hive'] == record['hive']) & (starts['code'] == record['code']) &
+                         (starts['start'] == record['start'])]
+        assert started['end'][0].astype(datetime) == end
+
+def test_save_needs_a_path(tmp_path):
+    index = sim.EventIndex()
+    index.add(1, 'nectar_flow', START, START + MINUTE)
+    with pytest.raises(ValueError):
+        index.save()
+    index.save(path=str(tmp_path / 'index.npz'))
+    assert len(sim.EventIndex.load(str(tmp_path / 'index.npz')).intervals('nectar_flow')) == 1
@@ -0,0 +1,88 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1)
+MINUTES = 3 * 1440
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    journal = sim.EventJournal(str(tmp_path / 'events.journal'))
+    monkeypatch.setattr(sim, 'journal', journal)
+    yield journal
+    journal.close()
+
+def run_hive(seed=2):
+    """Names of the active events after every minute's reading, keyed by time"""
+    hive = sim.Hive(0, seed=seed, start=START)
+    active = {}
+    for i in range(MINUTES):
+        reading = hive.tick(sim.TickContext(START + timedelta(minutes=i)))
+        active[reading.created_at] = set(hive.events.current_events)
+    return active
+
+def test_start_and_end_records_agree_with_the_readings(journal):
+    active = run_hive()
+    journal.close()
+    starts = sim.EventJournal.read(journal.path, kind=sim.EventJournal.EVENT_START)
+    ends = sim.EventJournal.read(journal.path, kind=sim.EventJournal.EVENT_END)
+    assert len(ends) > 5
+    started = {(int(r['code']), r['start']): (r['end'], int(r['duration'])) for r in starts}
+    for record in ends:
+        assert started[int(record['code']), record['start']] == (record['end'], int(record['duration']))
+        event = sim.EVENT_REGISTRY.events[record['code']]
+        start, end = record['start'].astype(datetime), record['end'].astype(datetime)
+        shown = [t for t, events in active.items() if start <= t < end]
+        assert len(shown) == record['duration']
+        assert all(event in active[t] for t in shown)
+        assert event not in active.get(end, ())
+
+def wait_for_records(path, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(sim.EventJournal.read(path)) >= count:
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_quiet_journal_is_written_without_further_records(tmp_path):
+    journal = sim.EventJournal(str(tmp_path / 'quiet.journal'), flush_interval=0.05)
+    journal.event_end(0, 'swarming', START, START + timedelta(minutes=5))
+    try:
+        assert wait_for_records(journal.path, 1)
+    finally:
+        journal.close()
+
+def test_close_writes_buffered_records(tmp_path):
+    journal = sim.EventJournal(str(tmp_path / 'events.journal'), flush_interval=3600)
+    journal.event_end(0, 'swarming', START, START + timedelta(minutes=5))
+    assert len(sim.EventJournal.read(journal.path)) == 0
+    journal.close()
+    assert len(sim.EventJournal.read(journal.path)) == 1
+
+def test_dropped_readings_are_journaled_and_filtered(tmp_path, monkeypatch, capsys):
+    journal = sim.EventJournal(str(tmp_path / 'events.journal'), console_level=sim.EventJournal.ERROR + 1)
+    monkeypatch.setattr(sim, 'journal', journal)
+    uploader = sim.ThingSpeakUploader(batch_size=100, max_buffer=5, url='http://127.0.0.1:9/')
+    for i in range(7):
+        uploader.add({'field1': i}, START + timedelta(minutes=i))
+    journal.close()
+    records = sim.EventJournal.read(journal.path, kind=sim.EventJournal.DELIVERY)
+    assert [(int(r['code']), int(r['duration'])) for r in records] == [(sim.EventJournal.DROPPED, 1)] * 2
+    assert records['level'][0] == sim.EventJournal.ERROR
+    assert capsys.readouterr().out == ''
+
+def test_sink_errors_are_journaled_and_printed(tmp_path, monkeypatch, capsys):
+    journal = sim.EventJournal(str(tmp_path / 'events.journal'))
+    monkeypatch.setattr(sim, 'journal', journal)
+    sink = sim.SocketSink(str(tmp_path / 'missing.sock'), batch_size=3)
+    for i in range(3):
+        sink.write(sim.Reading(i, START, {field: 1.0 for field in sim.Sink.FIELDS}))
+    sink.close()
+    journal.close()
+    records = sim.EventJournal.read(journal.path, kind=sim.EventJournal.SINK)
+    assert len(records) == 1 and records['duration'][0] == 3 and sink.dropped_count == 3
+    assert 'missing.sock' in capsys.readouterr().out
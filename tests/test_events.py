@@ -0,0 +1,65 @@
+import math
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 6, 10)
+
+class CoinFlipEvents(sim.HiveEvent):
+    """The engine before the registry: one coin flip per event type every minute"""
+
+    def check_for_new_event(self, ctx=None):
+        self.reset_daily_checks(ctx)
+        self.check_seasonal_transition(ctx)
+        probabilities = self.get_base_probabilities(ctx.season)
+        for booster, targets in self.probability_boosts.items():
+            if booster in self.current_events:
+                for event, factor in targets.items():
+                    probabilities[event] *= factor
+        for event, probability in probabilities.items():
+            if self.daily_event_checks.get(event) or event in self.current_events:
+                continue
+            if self.rng.random() < probability and self.is_event_compatible(event):
+                self.add_event(event, ctx.now)
+                if event in self.daily_event_checks:
+                    self.daily_event_checks[event] = True
+
+def event_starts(engines, minutes):
+    starts = dict.fromkeys(sim.EVENT_REGISTRY.events, 0)
+    for i in range(minutes):
+        ctx = sim.TickContext(START + timedelta(minutes=i))
+        for events in engines:
+            before = set(events.current_events)
+            events.check_for_new_event(ctx)
+            for event in set(events.current_events) - before:
+                starts[event] += 1
+            events.update(ctx)
+    return starts
+
+def test_event_frequencies_match_per_minute_coin_flips():
+    n, minutes = 200, 2 * 1440
+    sampled = event_starts([sim.HiveEvent(rng=sim.RandomStreams(1, i).events, start=START) for i in range(n)], minutes)
+    flipped = event_starts([CoinFlipEvents(rng=random.Random(i), start=START) for i in range(n)], minutes)
+    assert sum(sampled.values()) > 2000
+    for event in sim.EVENT_REGISTRY.events:
+        # Start counts are roughly Poisson, so they may differ by a few standard deviations
+        assert abs(sampled[event] - flipped[event]) <= 4 * math.sqrt(sampled[event] + flipped[event]) + 2, event
+
+def test_waits_are_geometric():
+    rng = np.random.default_rng(1)
+    hazard = 0.01
+    waits = np.array([sim.EventRegistry.sample_wait(hazard, u) for u in rng.random(20000)])
+    assert waits.min() >= 1
+    assert abs(waits.mean() - 1 / hazard) < 3 * math.sqrt(1 - hazard) / hazard / math.sqrt(len(waits))
+    assert abs((waits == 1).mean() - hazard) < 0.003
+    assert sim.EventRegistry.sample_wait(0, 0.5) == math.inf
+
+def test_first_success_follows_event_order():
+    candidates = (('a', 0.5), ('b', 0.5), ('c', 0.2))
+    # Given at least one success: a first with 0.5, b with 0.25, c with 0.05, out of 0.8
+    picks = [sim.EventRegistry.pick_first(candidates, u) for u in np.linspace(0, 1, 8001)[:-1]]
+    assert np.bincount(picks, minlength=3) / len(picks) == pytest.approx([0.625, 0.3125, 0.0625], abs=1e-3)
@@ -0,0 +1,103 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 4, 20)  # Spring, with buildup, brood and foraging events
+
+def hive_with_events(events, rng):
+    hive_events = sim.HiveEvent(rng=rng, start=START)
+    for event in events:
+        hive_events.add_event(event, START)
+        hive_events.event_times[event] = rng.randint(0, hive_events.event_durations[event])
+    return hive_events
+
+def copy_events(fleet, row, events):
+    """Give one fleet row the active events, timers and durations of a HiveEvent"""
+    fleet.active[row] = False
+    for event in events.current_events:
+        column = sim.HiveFleet.EVENT_INDEX[event]
+        fleet.active[row, column] = True
+        fleet.event_times[row, column] = events.event_times[event]
+        fleet.event_durations[row, column] = events.event_durations[event]
+
+def test_event_effects_match_hive_event():
+    rng = random.Random(1)
+    hives = [hive_with_events(rng.sample(sim.HiveFleet.EVENT_TYPES, rng.randint(0, 5)), rng) for _ in range(200)]
+    fleet = sim.HiveFleet(len(hives), seed=1)
+    for row, events in enumerate(hives):
+        copy_events(fleet, row, events)
+    effects = fleet.get_event_effects()
+    for row, events in enumerate(hives):
+        for mod_type, value in events.get_event_effects().items():
+            assert effects[mod_type][row] == pytest.approx(value, abs=1e-12)
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_fleet_readings_match_hives(seed):
+    """A fleet row following a Hive's events and weather gives the same readings up to sensor noise"""
+    hive = sim.Hive(0, seed=seed, start=START)
+    fleet = sim.HiveFleet.from_hive(hive)
+    # The fleet's own copy of the hive's weather, drawing the same random numbers
+    streams = sim.RandomStreams(seed, 0)
+    weather = sim.WeatherConditions(streams.weather, streams.weather_pattern, streams.weather_trend, START)
+    events_seen = set()
+    for i in range(2 * 1440):
+        ctx = sim.TickContext(START + timedelta(minutes=i))
+        hive.events.check_for_new_event(ctx)
+        hive.events.update(ctx)
+        events_seen.update(hive.events.current_events)
+        copy_events(fleet, 0, hive.events)
+        fleet.ticks += 1
+        expected = sim.simulate_sensors(hive.events, hive.weather, hive.weight, ctx, hive.streams.sensors)
+        # Outside conditions come back as one value for the whole fleet
+        readings = {field: np.ravel(values)[0] for field, values in fleet.simulate_sensors(weather, ctx).items()}
+        for field in ('field3', 'field4', 'field5'):
+            assert readings[field] == pytest.approx(expected[field], abs=1e-9)
+        assert abs(readings['field1'] - expected['field1']) <= 0.61  # Noise of +-0.3 in each engine
+        assert abs(readings['field2'] - expected['field2']) <= 1.01  # Noise of +-0.5 in each engine
+    assert len(events_seen) >= 3
+    for name in sim.HiveFleet.WEIGHT_STATE:
+        assert getattr(fleet, name)[0] == pytest.approx(getattr(hive.weight, name), abs=1e-9)
+
+def test_events_started_this_tick_do_not_boost_others(monkeypatch):
+    """nectar_flow starting on a tick leaves that tick's pollen_collection chance unboosted"""
+    fleet = sim.HiveFleet(1, seed=1)
+    fleet.last_season = sim.Season.SUMMER
+    events = list(sim.HiveFleet.RANDOM_EVENTS)
+    def draws(tick, slots, rows=None):
+        if rows is not None:  # Event durations
+            return np.full(len(rows), 0.5)
+        values = np.full((fleet.n_hives, len(slots)), 0.99)
+        values[:, list(slots).index(events.index('nectar_flow'))] = 0
+        values[:, list(slots).index(events.index('pollen_collection'))] = 0.0025  # Above 0.002, below 0.002 * 1.5
+        return values
+    monkeypatch.setattr(fleet.random, 'random', draws)
+    fleet.check_for_new_events(sim.TickContext(datetime(2025, 7, 1, 12)))
+    assert fleet.active[0, sim.HiveFleet.EVENT_INDEX['nectar_flow']]
+    assert not fleet.active[0, sim.HiveFleet.EVENT_INDEX['pollen_collection']]
+
+def test_event_frequencies_match_hive_events():
+    start = datetime(2025, 6, 10)
+    n, minutes = 400, 2 * 1440
+    fleet = sim.HiveFleet(n, seed=1)
+    hives = [sim.HiveEvent(rng=sim.RandomStreams(1, i).events, start=start) for i in range(n)]
+    fleet_starts = np.zeros(len(sim.HiveFleet.EVENT_TYPES), dtype=int)
+    hive_starts = np.zeros_like(fleet_starts)
+    for i in range(minutes):
+        ctx = sim.TickContext(start + timedelta(minutes=i))
+        before = fleet.active.copy()
+        fleet.check_for_new_events(ctx)
+        fleet_starts += (fleet.active & ~before).sum(axis=0)
+        fleet.update()
+        for events in hives:
+            before = set(events.current_events)
+            events.check_for_new_event(ctx)
+            for event in set(events.current_events) - before:
+                hive_starts[sim.HiveFleet.EVENT_INDEX[event]] += 1
+            events.update(ctx)
+    assert fleet_starts.sum() > 4000
+    # Start counts are roughly Poisson, so they may differ by a few standard deviations
+    assert (np.abs(fleet_starts - hive_starts) <= 4 * np.sqrt(fleet_starts + hive_starts) + 2).all()
@@ -0,0 +1,26 @@
+import json
+from datetime import datetime
+from itertools import islice
+
+import beehive_simulator as sim
+
+def test_bodies_from_a_past_start_carry_changing_weather():
+    generator = sim.LoadGenerator('http://127.0.0.1:9/update', hives=10, batch_size=100, seed=1,
+                                  start=datetime(2025, 7, 1))
+    temperatures = set()
+    readings = 0
+    for body, count in islice(generator.bodies(), 300):
+        updates = json.loads(body)['updates']
+        assert len(updates) == count == 100
+        temperatures.update(update['field3'] for update in updates)
+        readings += count
+    assert readings == 30000
+    assert len(temperatures) > 100
+
+def test_bodies_of_every_format_are_complete():
+    for payload_format in sim.LoadGenerator.FORMATS:
+        generator = sim.LoadGenerator('http://127.0.0.1:9/update', hives=5, batch_size=5, seed=1,
+                                      payload_format=payload_format, start=datetime(2025, 7, 1))
+        bodies = list(islice(generator.bodies(), 4))
+        assert [count for _, count in bodies] == [5, 5, 5, 5]
+        assert len(set(body for body, _ in bodies)) == 4
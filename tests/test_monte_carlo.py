@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+import beehive_simulator as sim
+
+START = datetime(2025, 1, 1)  # In the past, so the global clock reads a later time
+
+def test_weather_changes_over_a_day_from_a_past_start():
+    hive = sim.Hive(0, seed=1, start=START)
+    temperatures = {hive.tick(sim.TickContext(START + timedelta(minutes=i))).data['field3'] for i in range(1440)}
+    assert len(temperatures) > 100
+
+def test_runs_update_the_weather(monkeypatch):
+    hives = []
+    class RecordedHive(sim.Hive):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            hives.append(self)
+    monkeypatch.setattr(sim, 'Hive', RecordedHive)
+    sim.simulate_runs(0, 2, 1440, START, 3)
+    sim.simulate_runs(2, 1, 1440, START, 3, adaptive=True)
+    assert len(hives) == 3
+    for hive in hives:
+        assert hive.weather.last_target_update >= START + timedelta(hours=23)
+
+def test_adaptive_runs_match_minute_runs():
+    fixed = sim.simulate_runs(0, 2, 3 * 1440, START, 5)
+    adaptive = sim.simulate_runs(0, 2, 3 * 1440, START, 5, adaptive=True)
+    for a, b in zip(fixed, adaptive):
+        assert a[0] == b[0] and a[2:4] == b[2:4]
+        assert abs(a[4] - b[4]) < 0.05
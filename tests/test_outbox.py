@@ -0,0 +1,90 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+from datetime import datetime, timedelta
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def reading(i):
+    return sim.Reading(i % 3, START + timedelta(minutes=i), {'field1': float(i)})
+
+def fill(outbox, first, count):
+    return [outbox.append(reading(i)) for i in range(first, first + count)]
+
+def segment_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith('.seg'))
+
+def test_synced_readings_survive_a_kill(tmp_path):
+    path = str(tmp_path / 'outbox')
+    script = textwrap.dedent(f"""
+        import os, signal
+        from datetime import datetime, timedelta
+        import beehive_simulator as sim
+        outbox = sim.Outbox({path!r}, segment_records=40, sync_every=10, sync_interval=3600)
+        for i in range(55):
+            outbox.append(sim.Reading(i % 3, datetime(2025, 5, 1) + timedelta(minutes=i), {{'field1': float(i)}}))
+        outbox.ack(range(20))
+        outbox.sync()
+        outbox.file.write('{{"seq": 55, "hive_id"')  # Torn by the kill
+        outbox.file.flush()
+        os.kill(os.getpid(), signal.SIGKILL)
+    """)
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT)
+    assert result.returncode == -signal.SIGKILL
+    outbox = sim.Outbox(path)
+    pending = list(outbox.pending())
+    assert [seq for seq, _ in pending] == list(range(20, 55))
+    assert pending[0][1] == reading(20)
+    assert outbox.next_seq == 55
+    # Later readings go to a new segment rather than after the torn line
+    assert outbox.append(reading(55)) == 55
+    assert [seq for seq, _ in outbox.pending()] == list(range(20, 56))
+    outbox.close()
+
+def test_replay_starts_at_the_cursor_in_order(tmp_path):
+    path = str(tmp_path / 'outbox')
+    outbox = sim.Outbox(path, segment_records=10)
+    fill(outbox, 0, 25)
+    outbox.ack([0, 1, 2, 4])  # 4 is delivered but the cursor stops at the gap before it
+    outbox.close()
+
+    reopened = sim.Outbox(path, segment_records=10)
+    assert reopened.cursor == 3
+    assert [seq for seq, _ in reopened.pending()] == list(range(3, 25))
+    assert [r.data['field1'] for _, r in reopened.pending(skip={5, 6})] == [3.0, 4.0] + [float(i) for i in range(7, 25)]
+    assert reopened.pending_count() == 22
+    reopened.close()
+
+def test_delivered_segments_are_compacted(tmp_path):
+    path = str(tmp_path / 'outbox')
+    outbox = sim.Outbox(path, segment_records=10)
+    fill(outbox, 0, 35)
+    assert len(segment_files(path)) == 4
+    outbox.ack(range(25))
+    outbox.sync()
+    assert segment_files(path) == ['000000000020.seg', '000000000030.seg']
+    outbox.close()
+
+    # A run that appends nothing still removes segments delivered by the time it closes
+    reopened = sim.Outbox(path, segment_records=10)
+    assert [seq for seq, _ in reopened.pending()] == list(range(25, 35))
+    reopened.ack(range(25, 35))
+    reopened.close()
+    assert segment_files(path) == []
+    assert sim.Outbox(path).pending_count() == 0
+
+def test_open_segment_is_kept_until_sealed(tmp_path):
+    path = str(tmp_path / 'outbox')
+    outbox = sim.Outbox(path, segment_records=10)
+    fill(outbox, 0, 5)
+    outbox.ack(range(5))
+    outbox.sync()
+    assert segment_files(path) == ['000000000000.seg']
+    assert outbox.append(reading(5)) == 5
+    assert [seq for seq, _ in outbox.pending()] == [5]
+    outbox.close()
@@ -0,0 +1,66 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1)
+
+def conditions(weather, minutes):
+    """(temperature, humidity) of every region after each minute"""
+    series = []
+    for i in range(minutes):
+        weather.advance(sim.TickContext(START + timedelta(minutes=i)))
+        series.append([(c['temperature'], c['humidity']) for c in weather.conditions.values()])
+    return np.array(series)
+
+def regions(n):
+    return {region: (region * 10, 0) for region in range(n)}
+
+def test_same_seed_gives_the_same_weather():
+    first = conditions(sim.RegionalWeather(regions(3), seed=7, start=START), 600)
+    second = conditions(sim.RegionalWeather(regions(3), seed=7, start=START), 600)
+    other = conditions(sim.RegionalWeather(regions(3), seed=8, start=START), 600)
+    assert np.array_equal(first, second)
+    assert not np.array_equal(first, other)
+
+def test_advanced_once_per_tick_for_all_hives():
+    weather = sim.RegionalWeather(regions(2), seed=1, start=START)
+    hives = [sim.Hive(i, seed=1, weather=weather.region(i % 2)) for i in range(10)]
+    for i in range(30):
+        ctx = sim.TickContext(START + timedelta(minutes=i))
+        readings = [hive.tick(ctx) for hive in hives]
+        assert len({r.data['field3'] for r in readings[0::2]}) == 1
+    assert weather.advances == 30
+
+def test_offsets_are_ar1_in_time():
+    weather = sim.RegionalWeather(regions(1), seed=3, start=START)
+    offsets = []
+    for i in range(20000):
+        weather.advance(sim.TickContext(START + timedelta(minutes=i)))
+        offsets.append(weather.offsets[0].copy())
+    offsets = np.array(offsets)
+    for k in range(2):
+        x = offsets[:, k]
+        lag1 = np.corrcoef(x[:-1], x[1:])[0, 1]
+        assert lag1 == pytest.approx(math.exp(-1 / sim.WEATHER_LOCAL_MINUTES), abs=0.005)
+        # The innovations left after removing the AR(1) part are uncorrelated white noise
+        innovations = x[1:] - weather.persistence * x[:-1]
+        assert abs(np.corrcoef(innovations[:-1], innovations[1:])[0, 1]) < 0.05
+
+@pytest.mark.parametrize('distance', [10, 50, 100])
+def test_offsets_decorrelate_with_distance(distance):
+    # Pairs of regions distance km apart, each pair far from every other
+    pairs = 300
+    positions = {}
+    for pair in range(pairs):
+        positions[2 * pair] = (pair * 10000, 0)
+        positions[2 * pair + 1] = (pair * 10000 + distance, 0)
+    weather = sim.RegionalWeather(positions, seed=distance, start=START)
+    conditions(weather, 10)
+    a, b = weather.offsets[0::2].ravel(), weather.offsets[1::2].ravel()
+    expected = math.exp(-distance / sim.WEATHER_CORRELATION_KM)
+    assert np.corrcoef(a, b)[0, 1] == pytest.approx(expected, abs=0.1)
+    assert np.std(np.concatenate([a, b])) == pytest.approx(1, abs=0.1)
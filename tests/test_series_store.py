@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1, 22, 0)  # Two hours before midnight
+MINUTES = 3 * 60
+MINUTE = timedelta(minutes=1)
+
+def write_run(path):
+    """Three hives written minute by minute across midnight, returns readings and event masks as written"""
+    hives = [sim.Hive(i, seed=5, start=START) for i in range(3)]
+    store = sim.SeriesStore(path, [hive.hive_id for hive in hives])
+    written = {}
+    for i in range(MINUTES):
+        ctx = sim.TickContext(START + i * MINUTE)
+        for hive in hives:
+            reading = hive.tick(ctx)
+            store.append(reading, hive.events.active_mask)
+            written[hive.hive_id, reading.created_at] = (reading.data, hive.events.active_mask)
+    store.close()
+    return written
+
+def test_reads_across_day_files_match_what_was_written(tmp_path):
+    path = str(tmp_path / 'store')
+    written = write_run(path)
+    store = sim.SeriesStore(path)  # Reopened from its index
+    assert sorted(store.days) == ['2025-05-01', '2025-05-02']
+    begin, end = START + 30 * MINUTE, START + 150 * MINUTE
+    times = [begin + k * MINUTE for k in range(150 - 30)]
+    for field in sim.SeriesStore.FIELDS:
+        values = store.read(field, begin, end, [2, 0])
+        assert values.shape == (2, len(times))
+        for row, hive_id in enumerate([2, 0]):
+            expected = [written[hive_id, t][0][field] for t in times]
+            assert np.array_equal(values[row], np.array(expected, dtype=np.float32))
+    masks = store.read_hive(1, begin, end)['events']
+    assert masks.tolist() == [written[1, t][1] for t in times]
+
+def test_unwritten_minutes_read_as_missing(tmp_path):
+    path = str(tmp_path / 'store')
+    write_run(path)
+    store = sim.SeriesStore(path)
+    before = store.read('field1', START - 10 * MINUTE, START + 10 * MINUTE)
+    assert np.isnan(before[:, :10]).all() and not np.isnan(before[:, 10:]).any()
+    later = store.read('events', START + 2 * 1440 * MINUTE, START + (2 * 1440 + 5) * MINUTE)
+    assert later.shape == (3, 5) and not later.any()
+
+def test_transitions_across_midnight(tmp_path):
+    path = str(tmp_path / 'store')
+    written = write_run(path)
+    store = sim.SeriesStore(path)
+    changes = 0
+    for hive_id in range(3):
+        expected = []
+        for i in range(1, MINUTES):
+            now = START + i * MINUTE
+            before, after = written[hive_id, now - MINUTE][1], written[hive_id, now][1]
+            for event, bit in sim.EVENT_REGISTRY.bits.items():
+                if (before ^ after) & bit:
+                    expected.append((now, event, bool(after & bit)))
+        assert store.transitions(hive_id, START + MINUTE, START + MINUTES * MINUTE) == expected
+        changes += len(expected)
+    assert changes > 0
+    # Events already active at the first written minute start there
+    first = store.transitions(0, START, START + MINUTE)
+    assert {event for _, event, started in first if started} == {
+        event for event, bit in sim.EVENT_REGISTRY.bits.items() if written[0, START][1] & bit}
+
+def test_fleet_rows_are_stored_in_hive_order(tmp_path):
+    path = str(tmp_path / 'store')
+    fleet = sim.HiveFleet(4, seed=2)
+    weather = sim.WeatherConditions(sim.RandomStream(np.random.SeedSequence(2)), start=START)
+    store = sim.SeriesStore(path, fleet.hive_ids.tolist())
+    weights = []
+    for i in range(MINUTES):
+        now = START + i * MINUTE
+        readings = fleet.step(weather, sim.TickContext(now))
+        store.append_fleet(now, readings, fleet.event_masks())
+        weights.append(np.asarray(readings['field5'], dtype=np.float32))
+    store.close()
+    assert np.array_equal(sim.SeriesStore(path).read('field5', START, START + MINUTES * MINUTE), np.array(weights).T)
@@ -0,0 +1,78 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import beehive_simulator as sim
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'beehive_simulator.py')
+START = datetime(2025, 7, 1)
+HIVES, REGIONS, STEPS, SEED = 20, 2, 120, 5
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def simulator(*args, cwd):
+    return subprocess.Popen([sys.executable, SCRIPT, '--clock', 'fast', '--no-upload', *args], cwd=cwd,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, process.stdout.read()
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Coordinator not listening on port {port}")
+
+def single_process_readings():
+    weather = sim.RegionalWeather({region: (region * 10, 0) for region in range(REGIONS)}, seed=SEED, start=START)
+    hives = [sim.Hive(i, seed=SEED, weather=weather.region(i % REGIONS)) for i in range(HIVES)]
+    readings = {}
+    for t in range(STEPS):
+        ctx = sim.TickContext(START + timedelta(minutes=t))
+        for hive in hives:
+            readings[hive.hive_id, ctx.now.isoformat()] = hive.tick(ctx).data
+    return readings
+
+def test_coordinator_and_workers_match_a_single_process(tmp_path):
+    # wait_for_port's probe connects without joining, which the coordinator ignores
+    port = free_port()
+    address = f'127.0.0.1:{port}'
+    coordinator = simulator('--coordinator', '--hives', str(HIVES), '--regions', str(REGIONS), '--seed', str(SEED),
+                            '--steps', str(STEPS), '--start', START.isoformat(), '--shard-address', address,
+                            '--min-workers', '2', cwd=tmp_path)
+    wait_for_port(port, coordinator)
+    workers = [simulator('--worker', '--shard-address', address, '--worker-name', name,
+                         '--sink', f'ndjson:{name}.ndjson', '--event-index', f'{name}.npz', cwd=tmp_path)
+               for name in ('w1', 'w2')]
+    for process in [coordinator] + workers:
+        output, _ = process.communicate(timeout=120)
+        assert process.returncode == 0, output
+
+    expected = single_process_readings()
+    seen = {}
+    for name in ('w1', 'w2'):
+        assert os.path.exists(tmp_path / f'{name}.npz')
+        with open(tmp_path / f'{name}.ndjson') as f:
+            for line in f:
+                row = json.loads(line)
+                seen[row['hive_id'], row['created_at']] = row
+    assert set(seen) == set(expected)
+    for key, row in seen.items():
+        for field, value in expected[key].items():
+            assert row[field] == pytest.approx(value, abs=0.006)
+    assert len({row['field3'] for row in seen.values()}) > 10
+
+def test_coordinator_refuses_event_index():
+    with pytest.raises(SystemExit):
+        sim.parse_args(['--coordinator', '--event-index', 'events.npz'])
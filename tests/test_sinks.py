@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 5, 1)
+HIVE_IDS = ['hive-1', 'north, row "2"', 'south\nfield']
+
+def readings():
+    """One reading per hive id and minute, every fifth value missing"""
+    result = []
+    for i in range(12):
+        values = [math.nan if (i + k) % 5 == 0 else i + k / 8 for k in range(len(sim.Sink.FIELDS))]
+        result.append(sim.Reading(HIVE_IDS[i % 3], START + timedelta(minutes=i // 3), dict(zip(sim.Sink.FIELDS, values))))
+    return result
+
+def expected(value):
+    return None if math.isnan(value) else round(value, 2)
+
+def written(sink_class, path, rows, batch_size=5):
+    sink = sink_class(str(path), batch_size=batch_size)
+    for reading in rows:
+        sink.write(reading)
+    sink.close()
+    with open(path, newline='') as f:
+        return f.read()
+
+def test_ndjson_round_trip(tmp_path):
+    rows = readings()
+    lines = written(sim.NDJSONSink, tmp_path / 'readings.ndjson', rows).splitlines()
+    assert len(lines) == len(rows)
+    for line, reading in zip(lines, rows):
+        record = json.loads(line)
+        assert record['hive_id'] == reading.hive_id
+        assert record['created_at'] == reading.created_at.isoformat()
+        assert [record[field] for field in sim.Sink.FIELDS] == [expected(reading.data[f]) for f in sim.Sink.FIELDS]
+
+def test_csv_round_trip(tmp_path):
+    rows = readings()
+    records = list(csv.reader(io.StringIO(written(sim.CSVSink, tmp_path / 'readings.csv', rows))))
+    assert records[0] == ['hive_id', 'created_at', *sim.Sink.FIELDS]
+    assert len(records) == len(rows) + 1
+    for record, reading in zip(records[1:], rows):
+        assert record[:2] == [str(reading.hive_id), reading.created_at.isoformat()]
+        assert [float(value) if value else None for value in record[2:]] == [expected(reading.data[f]) for f in sim.Sink.FIELDS]
+
+@pytest.mark.parametrize('sink_class', [sim.NDJSONSink, sim.CSVSink])
+def test_fleet_rows_without_missing_values_keep_two_decimals(tmp_path, sink_class):
+    sink = sink_class(str(tmp_path / 'fleet'), batch_size=10)
+    sink.write_fleet(START, np.arange(2), {field: np.array([1.005, 2.5]) for field in sim.Sink.FIELDS})
+    sink.close()
+    text = (tmp_path / 'fleet').read_text()
+    assert '2.50' in text and 'nan' not in text and 'null' not in text
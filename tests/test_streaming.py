@@ -0,0 +1,25 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+import beehive_simulator as sim
+
+START = datetime(2025, 7, 1)  # In the past, so the global clock reads a later time
+
+def test_readings_weather_changes_from_a_past_start():
+    readings = list(sim.stream_readings(hives=2, start=START, steps=3000, seed=1))
+    assert len(readings) == 6000
+    assert readings[0].created_at == START
+    assert len({reading.field3 for reading in readings}) > 100
+
+def test_blocks_weather_changes_from_a_past_start():
+    blocks = list(sim.stream_blocks(hives=10, block_ticks=1000, start=START, steps=3000, seed=1))
+    assert [len(block.times) for block in blocks] == [1000, 1000, 1000]
+    field3 = np.concatenate([block.fields['field3'] for block in blocks])
+    assert len(np.unique(field3)) > 100
+
+def test_async_readings_match_sync_readings():
+    async def collect():
+        return [reading async for reading in sim.astream_readings(hives=2, start=START, steps=100, seed=1)]
+    assert asyncio.run(collect()) == list(sim.stream_readings(hives=2, start=START, steps=100, seed=1))
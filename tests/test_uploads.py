@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import beehive_simulator as sim
+
+START = datetime(2025, 7, 1)
+CHANNEL = sim.Channel('1', 'KEY')
+
+class StubServer:
+    """Local stand-in for ThingSpeak's bulk-update endpoint, answering 200 unless told otherwise"""
+
+    def __init__(self):
+        self.statuses = []  # (status, Retry-After or None) to answer before going back to 200
+        self.requests = []  # (monotonic time, path, readings, status)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                status, retry_after = stub.statuses.pop(0) if stub.statuses else (200, None)
+                stub.requests.append((time.monotonic(), self.path, len(body['updates']), status))
+                self.send_response(status)
+                if retry_after is not None:
+                    self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/channels/{{channel_id}}/bulk_update.json'
+
+    def sizes(self, status=200):
+        return [readings for _, _, readings, answered in self.requests if answered == status]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+def readings(n):
+    return [({'field1': 30.0 + i % 7, 'field2': 60.0, 'field3': 20.0, 'field4': 65.0, 'field5': 50.0},
+             START + timedelta(minutes=i)) for i in range(n)]
+
+def uploader(stub, **kwargs):
+    return sim.ThingSpeakUploader(CHANNEL.api_key, CHANNEL.channel_id, url=stub.url.format(channel_id=1), **kwargs)
+
+def test_sync_uploads_in_batches(stub):
+    upload = uploader(stub, batch_size=60)
+    for data, created_at in readings(300):
+        assert upload.add(data, created_at)
+    upload.close()
+    assert stub.sizes() == [60] * 5
+    assert upload.sent_count == 300 and upload.request_count == 5
+
+def test_sync_waits_for_retry_after(stub):
+    stub.statuses = [(429, 0.3)]
+    upload = uploader(stub, batch_size=60)
+    batch = readings(62)
+    for data, created_at in batch[:61]:
+        upload.add(data, created_at)
+    assert [status for *_, status in stub.requests] == [429]  # The 61st reading waits for Retry-After
+    time.sleep(0.35)
+    assert upload.add(*batch[61])
+    upload.close()
+    assert stub.sizes(429) == [60] and stub.sizes() == [60, 2]
+    assert stub.requests[1][0] - stub.requests[0][0] >= 0.3
+    assert upload.sent_count == 62 and upload.dropped_count == 0
+
+def test_sync_backs_off_after_failures(stub):
+    stub.statuses = [(500, None), (500, None)]
+    upload = uploader(stub, batch_size=60, backoff=0.2, max_backoff=10)
+    batch = readings(63)
+    for data, created_at in batch[:61]:
+        upload.add(data, created_at)
+    assert len(stub.requests) == 1
+    time.sleep(0.35)  # Past the first backoff of 0.1 to 0.3 seconds
+    upload.add(*batch[61])
+    assert len(stub.requests) == 2
+    upload.add(*batch[62])  # The second backoff is twice as long
+    assert len(stub.requests) == 2
+    upload.close()
+    assert stub.sizes(500) == [60, 60] and stub.sizes() == [60, 3]
+
+def test_sync_outbox_spills_and_replays(stub, tmp_path):
+    stub.statuses = [(503, None)] * 10
+    upload = uploader(stub, batch_size=60, outbox=sim.Outbox(str(tmp_path / 'outbox')))
+    for data, created_at in readings(120):
+        upload.add(data, created_at)
+    upload.close()
+    assert upload.sent_count == 0
+    assert sim.Outbox(str(tmp_path / 'outbox')).pending_count() == 120
+
+    stub.statuses = []
+    upload = uploader(stub, batch_size=60, outbox=sim.Outbox(str(tmp_path / 'outbox')))
+    assert upload.replay() == 120
+    upload.close()
+    assert upload.sent_count == 120 and stub.sizes() == [60, 60]
+    assert sim.Outbox(str(tmp_path / 'outbox')).pending_count() == 0
+
+def run_async(stub, monkeypatch, hives=2, steps=300, **kwargs):
+    monkeypatch.setattr(sim, 'clock', sim.SimulationClock(sim.SimulationClock.FAST, start=START))
+    channels = sim.ChannelRegistry(default=CHANNEL, interval=0.01)
+    runtime = sim.AsyncRuntime([sim.Hive(i, *channels.channel(i), seed=1, start=START) for i in range(hives)],
+                               url=stub.url, steps=steps, batch_size=100, channels=channels, backoff=0.01,
+                               stagger=False, **kwargs)
+    asyncio.run(runtime.run())
+    return runtime
+
+def test_async_waits_for_retry_after(stub, monkeypatch):
+    stub.statuses = [(429, 0.3)]
+    runtime = run_async(stub, monkeypatch)
+    assert runtime.sent_count == 600 and runtime.dropped_count == 0
+    assert sum(stub.sizes()) == 600 and max(stub.sizes()) <= sim.MAX_BULK_SIZE
+    assert {path for _, path, _, _ in stub.requests} == {'/channels/1/bulk_update.json'}
+    assert stub.requests[1][0] - stub.requests[0][0] >= 0.3
+
+def test_async_spilled_readings_are_replayed(stub, monkeypatch, tmp_path):
+    outbox = sim.Outbox(str(tmp_path / 'outbox'))
+    runtime = run_async(stub, monkeypatch, policy=sim.AsyncRuntime.SPILL, queue_size=50, outbox=outbox)
+    assert runtime.spilled_count > 0
+    assert runtime.sent_count == 600 and sum(stub.sizes()) == 600
+    assert sim.Outbox(str(tmp_path / 'outbox')).pending_count() == 0